@@ -0,0 +1,706 @@
+"""ClarityAI 分析引擎
+
+网页抓取、规则分析与报告生成，不依赖 Streamlit，
+可以被界面、批量分析和其他 Python 代码直接导入。
+"""
+from datetime import datetime
+import re
+import sqlite3
+import time
+
+from analysis_result import AnalysisResult, DocumentFeatures, SectionResult
+from analysis_store import get_store, new_record_id
+from fetch_scheduler import fetch_error_type
+from http_cache import fetch_cached, get_http_cache
+from http_client import MAX_FETCH_BYTES, get_session
+from instrumentation import StageTimer, record_timings, timed_stage
+from keyword_engine import KEYWORD_GROUPS, TERM_GLOSSARY, get_matcher, scan_document
+from llm_backend import LLMError, RuleBasedBackend, collect, get_backend, get_rule_backend
+from long_document import MAX_CHARS as LONG_DOCUMENT_MAX_CHARS
+from long_document import MAX_FETCH_BYTES as LONG_DOCUMENT_MAX_BYTES
+from long_document import analyze_long_document
+from metrics import ANALYSES, FETCHES
+from near_duplicate import DEDUP_ENABLED
+from near_duplicate import fingerprint as fingerprint_text
+from parse_pool import parse_page
+from parse_pool import warm_up as warm_parse_pool
+from report_cache import cached_analysis, get_report_cache
+
+# 分析使用的正文字符数
+CONTENT_LIMIT = 5000
+# 术语解释部分最多解释的术语数
+MAX_EXPLAINED_TERMS = 8
+# 英文缩写（前后不是英文字母的 2-6 位大写字母/数字组合）
+ABBREVIATION_PATTERN = re.compile(r'(?<![A-Za-z])[A-Z][A-Z0-9]{1,5}(?![A-Za-z])')
+
+
+# 预热的共享资源：(名称, 显示文字, 构建函数)
+WARM_UP_STEPS = (
+    ('keyword_matcher', '关键词自动机', get_matcher),
+    ('http_session', 'HTTP 连接池', get_session),
+    ('http_cache', '网页缓存', get_http_cache),
+    ('report_cache', '报告缓存', get_report_cache),
+    ('analysis_store', '分析记录库', get_store),
+    ('llm_backend', '分析后端', get_backend),
+    ('parse_pool', '解析进程池', warm_parse_pool),
+)
+
+
+def warm_up():
+    """构建进程内共享的资源（都只构建一次），返回各步骤耗时（毫秒）"""
+    timings = {}
+    for name, _, build in WARM_UP_STEPS:
+        started = time.perf_counter()
+        build()
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+    return timings
+
+
+def scrape_webpage_simple(url, timer=None, long_document=False, polite=False):
+    """简化的网页抓取函数（long_document 为 True 时抓取并提取全文，polite 为 True 时按主机限速并遵守 robots.txt）"""
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        }
+        # 先查响应缓存，过期时做条件请求（失败状态码会抛出异常）；
+        # 网络下载是流式的，超过字节预算就停止读取
+        if long_document:
+            max_bytes, limit = LONG_DOCUMENT_MAX_BYTES, LONG_DOCUMENT_MAX_CHARS
+        else:
+            max_bytes, limit = MAX_FETCH_BYTES, CONTENT_LIMIT
+        response = fetch_cached(url, headers=headers, timeout=10, max_bytes=max_bytes, timer=timer, polite=polite)
+        
+        # 增量解析HTML：只提取正文区域（跳过导航、页脚、评论等），收集到足够的正文后立即停止；
+        # 开启多进程解析时在工作进程中解析并扫描关键词（长文档另由分块扫描处理）
+        with timed_stage(timer, 'parse'):
+            page = parse_page(response.content, response.headers.get('Content-Type', ''), limit=limit,
+                              scan=not long_document)
+        title_text = page.title if page.title is not None else "无标题"
+        text = page.text
+        FETCHES.inc(outcome='ok')
+        
+        return {
+            'title': title_text,
+            'content': text[:limit],  # 限制内容长度
+            'url': url,
+            'long_document': long_document
+        }
+    except Exception as e:
+        FETCHES.inc(outcome=fetch_error_type(e))
+        return {
+            'title': '抓取失败',
+            'content': f'无法抓取网页内容: {str(e)}',
+            'url': url,
+            'error': str(e)
+        }
+
+def call_free_ai_api(prompt, content="", sections=None):
+    """调用免费AI API进行分析"""
+    return call_ai_with_cache(prompt, content, sections)[0]
+
+def call_ai_with_cache(prompt, content="", sections=None, on_token=None, long_document=False):
+    """调用AI分析，正文和报告部分相同时直接复用缓存的报告；返回 (分析结果, 是否命中缓存)
+
+    on_token 随流式输出接收目前为止的分析文本；long_document 为 True 时按长文档分块分析全文。
+    """
+    try:
+        analysis, cached, _ = analyze_with_cache(prompt, content, sections, on_token, long_document)
+        return analysis.body_markdown(), cached
+    except Exception as e:
+        return f"AI分析失败: {str(e)}", False
+
+def analyze_with_cache(prompt, content, sections=None, on_token=None, long_document=False):
+    """生成结构化结果（各分析器只执行一次），正文和报告部分相同时直接复用缓存；
+    返回 (结果, 是否命中缓存, 分析方式)
+
+    结果不含网址、标题和分析时间；narrative 为分析后端的输出，与规则分析的渲染结果相同时为 None；
+    分析方式见 analysis_mode（模型服务不可用而改用规则分析时为规则分析的方式）。
+    """
+    sections = tuple(DEFAULT_SECTIONS if sections is None else sections)
+    try:
+        return _backend_analysis(get_backend(), prompt, content, sections, on_token, long_document)
+    except LLMError:
+        # 模型服务不可用时改用规则分析（失败的结果不会写入缓存）
+        return _backend_analysis(get_rule_backend(), prompt, content, sections, on_token, long_document)
+
+def analysis_mode(backend, long_document=False):
+    """分析方式：分析后端和是否长文档模式（报告缓存键和近似重复复用都要求一致）"""
+    mode = {}
+    if backend.cache_id:
+        mode['backend'] = backend.cache_id
+    if long_document:
+        mode['long_document'] = True
+    return mode
+
+def _backend_analysis(backend, prompt, content, sections, on_token, long_document):
+    mode = analysis_mode(backend, long_document)
+    options = dict(mode, sections=list(sections))
+    
+    def compute(text):
+        if isinstance(backend, RuleBasedBackend):
+            # 规则分析的输出就是各部分的渲染结果，直接用同一份结构化结果逐段输出
+            analysis = build_analysis(text, sections, long_document)
+            collect(backend.render(analysis.sections), on_token)
+            return analysis
+        narrative = collect(backend.stream(prompt, text, sections, long_document=long_document), on_token)
+        analysis = build_analysis(text, sections, long_document)
+        # 分析后端的输出与规则分析的渲染结果相同时不重复保存正文
+        if narrative != analysis.body_markdown():
+            analysis.narrative = narrative
+        return analysis
+    
+    analysis, cached = cached_analysis(content, options, compute)
+    if cached and on_token is not None:
+        on_token(analysis.body_markdown())
+    return analysis, cached, mode
+
+def build_analysis(content, sections, long_document=False):
+    """执行选中部分的分析器，返回不含网址、标题和分析时间的结构化结果"""
+    # 长文档的各项结果取自全文合并后的命中表（与分块扫描共用缓存结果）
+    hits = analyze_long_document(content) if long_document else scan_document(content)
+    return AnalysisResult('', '', '', extract_main_topic(content, hits), build_sections(content, sections, hits),
+                          DocumentFeatures.from_hits(hits, KEYWORD_GROUPS))
+
+def render_summary_section(content, hits):
+    """内容摘要"""
+    return build_section('summary', content, hits).to_markdown()
+
+def render_consensus_section(content, hits):
+    """共识分析"""
+    return build_section('consensus', content, hits).to_markdown()
+
+def render_bias_section(content, hits):
+    """偏见识别"""
+    return build_section('bias', content, hits).to_markdown()
+
+def render_terms_section(content, hits):
+    """术语解释"""
+    return build_section('terms', content, hits).to_markdown()
+
+def render_advice_section(content, hits):
+    """决策建议"""
+    return build_section('advice', content, hits).to_markdown()
+
+# 报告各部分（按输出顺序），生成报告时只执行被选中部分的分析器
+REPORT_SECTIONS = (
+    ('summary', render_summary_section),
+    ('consensus', render_consensus_section),
+    ('bias', render_bias_section),
+    ('terms', render_terms_section),
+    ('advice', render_advice_section),
+)
+
+# 未指定 sections 时生成的部分
+DEFAULT_SECTIONS = ('summary', 'consensus', 'bias', 'advice')
+# 各部分在提示词中的名称
+SECTION_TITLES = {
+    'summary': '内容摘要员',
+    'consensus': '共识分析员',
+    'bias': '偏见识别员',
+    'terms': '术语解释员',
+    'advice': '决策建议员',
+}
+
+def select_sections(include_consensus, include_bias, include_terms, include_advice):
+    """根据分析选项确定报告包含的部分（内容摘要始终生成）"""
+    selected = {
+        'summary': True,
+        'consensus': include_consensus,
+        'bias': include_bias,
+        'terms': include_terms,
+        'advice': include_advice,
+    }
+    return tuple(name for name, _ in REPORT_SECTIONS if selected[name])
+
+def iter_ai_analysis(prompt, content, sections=None, hits=None):
+    """逐个生成报告部分（只生成 sections 中列出的部分；hits 为已算好的命中表）"""
+    # 基于内容生成智能分析：全文只扫描一次，各分析器共享命中表
+    hits = _document_hits(content, hits)
+    wanted = DEFAULT_SECTIONS if sections is None else sections
+    for name, render in REPORT_SECTIONS:
+        if name in wanted:
+            yield render(content, hits)
+
+def generate_ai_analysis(prompt, content, sections=None):
+    """生成AI分析报告（只生成 sections 中列出的部分）"""
+    return "\n".join(iter_ai_analysis(prompt, content, sections))
+
+def build_section(name, content, hits=None):
+    """执行一个报告部分的全部分析器，返回结构化结果"""
+    hits = _document_hits(content, hits)
+    return SectionResult(name, {field: analyze(content, hits) for field, analyze in SECTION_ANALYZERS[name].items()})
+
+def build_sections(content, sections=None, hits=None):
+    """按报告顺序生成各部分的结构化结果"""
+    hits = _document_hits(content, hits)
+    wanted = DEFAULT_SECTIONS if sections is None else sections
+    return tuple(build_section(name, content, hits) for name, _ in REPORT_SECTIONS if name in wanted)
+
+def _document_hits(content, hits):
+    """取得文档命中表，未传入时扫描一次（同一文档会复用缓存）"""
+    return hits if hits is not None else scan_document(content)
+
+# 分析器在定义处声明输出只取决于什么（修改分析器时一并修改）；语料批量评分据此按命中模式去重，
+# 每种取值只执行一次分析器，未声明的分析器需要原文，逐篇计算
+def _declare(dependency):
+    def mark(analyze):
+        analyze.depends_on = dependency
+        return analyze
+    return mark
+
+def depends_on_group(group):
+    """声明分析器的输出只取决于关键词表 group 中出现了哪些关键词"""
+    return _declare(('group', group))
+
+# 输出只取决于正文长度 / 与文档无关
+depends_on_length = _declare(('length',))
+depends_on_nothing = _declare(('constant',))
+
+@depends_on_group('topics')
+def extract_main_topic(content, hits=None):
+    """提取主要话题"""
+    topic = _document_hits(content, hits).first('topics')
+    if topic:
+        return f"主要涉及{topic}领域"
+    return "综合话题"
+
+def extract_key_data(content, hits=None):
+    """提取关键数据"""
+    numbers = _document_hits(content, hits).numbers
+    if numbers:
+        return f"发现关键数据: {', '.join(numbers[:3])}"
+    return "未发现具体数据"
+
+@depends_on_group('conclusion')
+def extract_conclusions(content, hits=None):
+    """提取重要结论"""
+    keyword = _document_hits(content, hits).first('conclusion')
+    if keyword:
+        return f"包含重要结论，涉及{keyword}相关内容"
+    return "需要进一步分析得出结论"
+
+@depends_on_group('impact')
+def assess_impact(content, hits=None):
+    """评估影响范围"""
+    impacts = _document_hits(content, hits).found('impact')
+    if impacts:
+        return f"可能产生{', '.join(impacts)}等影响"
+    return "影响范围需要进一步评估"
+
+@depends_on_length
+def analyze_structure(content, hits=None):
+    """分析逻辑结构"""
+    length = _document_hits(content, hits).length
+    if length > 1000:
+        return "结构完整，内容丰富"
+    elif length > 500:
+        return "结构基本完整"
+    else:
+        return "结构相对简单"
+
+@depends_on_group('credibility')
+def assess_credibility(content, hits=None):
+    """评估可信度"""
+    indicators = _document_hits(content, hits).found('credibility')
+    if len(indicators) >= 3:
+        return "高可信度"
+    elif len(indicators) >= 1:
+        return "中等可信度"
+    else:
+        return "需要进一步验证"
+
+@depends_on_group('timeliness')
+def assess_timeliness(content, hits=None):
+    """评估时效性"""
+    if _document_hits(content, hits).any('timeliness'):
+        return "时效性较强"
+    return "时效性一般"
+
+@depends_on_length
+def assess_completeness(content, hits=None):
+    """评估完整性"""
+    length = _document_hits(content, hits).length
+    if length > 2000:
+        return "信息相对完整"
+    elif length > 1000:
+        return "信息基本完整"
+    else:
+        return "信息可能不够完整"
+
+@depends_on_group('research_areas')
+def identify_research_areas(content, hits=None):
+    """识别研究领域"""
+    found_areas = _document_hits(content, hits).found('research_areas')
+    if found_areas:
+        return f"涉及{', '.join(found_areas)}等领域"
+    return "需要进一步确定研究领域"
+
+@depends_on_group('controversy')
+def identify_academic_controversies(content, hits=None):
+    """识别学术争议"""
+    controversies = _document_hits(content, hits).found('controversy')
+    if controversies:
+        return f"存在{', '.join(controversies)}等争议点"
+    return "争议点不明显"
+
+@depends_on_group('development')
+def identify_recent_developments(content, hits=None):
+    """识别最新进展"""
+    developments = _document_hits(content, hits).found('development')
+    if developments:
+        return f"包含{', '.join(developments)}等最新进展"
+    return "最新进展信息有限"
+
+@depends_on_group('expert')
+def extract_expert_opinions(content, hits=None):
+    """提取专家观点"""
+    experts = _document_hits(content, hits).found('expert')
+    if experts:
+        return f"包含{', '.join(experts)}等专业观点"
+    return "专家观点信息有限"
+
+@depends_on_group('industry')
+def analyze_industry_attitude(content, hits=None):
+    """分析业界态度"""
+    if _document_hits(content, hits).any('industry'):
+        return "包含业界相关观点"
+    return "业界态度信息有限"
+
+@depends_on_group('policy')
+def analyze_policy_standpoint(content, hits=None):
+    """分析政策立场"""
+    if _document_hits(content, hits).any('policy'):
+        return "包含政策相关立场"
+    return "政策立场信息有限"
+
+@depends_on_group('position')
+def analyze_author_position(content, hits=None):
+    """分析作者立场"""
+    positions = _document_hits(content, hits).found('position')
+    if positions:
+        return f"作者立场偏向{', '.join(positions)}"
+    return "作者立场相对中立"
+
+@depends_on_group('bias')
+def analyze_reporting_bias(content, hits=None):
+    """分析报道倾向性"""
+    if _document_hits(content, hits).any('bias'):
+        return "存在一定倾向性"
+    return "报道相对客观"
+
+@depends_on_length
+def analyze_information_selectivity(content, hits=None):
+    """分析信息选择性"""
+    if _document_hits(content, hits).length < 1000:
+        return "信息可能经过选择性呈现"
+    return "信息呈现相对全面"
+
+@depends_on_group('interest')
+def identify_conflicts_of_interest(content, hits=None):
+    """识别利益关联"""
+    if _document_hits(content, hits).any('interest'):
+        return "可能存在利益关联"
+    return "利益关联不明显"
+
+@depends_on_group('data')
+def assess_data_support(content, hits=None):
+    """评估数据支撑"""
+    data_count = len(_document_hits(content, hits).found('data'))
+    if data_count >= 3:
+        return "数据支撑充分"
+    elif data_count >= 1:
+        return "数据支撑一般"
+    else:
+        return "数据支撑不足"
+
+@depends_on_group('diversity')
+def assess_viewpoint_diversity(content, hits=None):
+    """评估观点多样性"""
+    if _document_hits(content, hits).any('diversity'):
+        return "观点多样性较好"
+    return "观点多样性有限"
+
+@depends_on_group('balance')
+def assess_balance(content, hits=None):
+    """评估平衡性"""
+    if _document_hits(content, hits).any('balance'):
+        return "内容相对平衡"
+    return "平衡性需要进一步评估"
+
+@depends_on_nothing
+def generate_info_strategy(content, hits=None):
+    """生成信息获取策略"""
+    return "建议多渠道获取信息，包括官方渠道、专业媒体和学术资源"
+
+@depends_on_group('risk')
+def assess_risks(content, hits=None):
+    """评估风险"""
+    risks = _document_hits(content, hits).found('risk')
+    if risks:
+        return f"识别到{', '.join(risks)}等潜在风险"
+    return "风险相对可控"
+
+@depends_on_group('opportunity')
+def identify_opportunities(content, hits=None):
+    """识别机会"""
+    opportunities = _document_hits(content, hits).found('opportunity')
+    if opportunities:
+        return f"发现{', '.join(opportunities)}等机会"
+    return "机会需要进一步识别"
+
+@depends_on_nothing
+def generate_action_advice(content, hits=None):
+    """生成行动建议"""
+    return "建议采取渐进式行动，先试点后推广，持续监控效果"
+
+@depends_on_nothing
+def generate_short_term_actions(content, hits=None):
+    """生成短期行动"""
+    return "立即收集更多相关信息，建立初步分析框架"
+
+@depends_on_nothing
+def generate_medium_term_plan(content, hits=None):
+    """生成中期规划"""
+    return "制定详细实施计划，建立监控机制，定期评估进展"
+
+@depends_on_nothing
+def generate_long_term_strategy(content, hits=None):
+    """生成长期战略"""
+    return "建立长期发展愿景，构建可持续的竞争优势"
+
+@depends_on_nothing
+def identify_success_factors(content, hits=None):
+    """识别成功因素"""
+    return "领导支持、资源投入、团队协作、持续学习"
+
+@depends_on_group('challenge')
+def identify_challenges(content, hits=None):
+    """识别挑战"""
+    challenges = _document_hits(content, hits).found('challenge')
+    if challenges:
+        return f"可能面临{', '.join(challenges)}等挑战"
+    return "挑战相对可控"
+
+@depends_on_nothing
+def assess_resource_needs(content, hits=None):
+    """评估资源需求"""
+    return "需要人力、技术、资金和时间等资源投入"
+
+def explain_terms(content, hits=None):
+    """解释专业术语"""
+    hits = _document_hits(content, hits)
+    terms = hits.found('terms')
+    if not terms:
+        return "- 未识别到需要解释的专业术语"
+    lines = []
+    for term in terms[:MAX_EXPLAINED_TERMS]:
+        lines.append(f"- **{term}**: {TERM_GLOSSARY[term]}")
+        snippet = hits.snippet(term, 20)
+        if snippet:
+            lines.append(f"  - 原文: “…{snippet}…”")
+    return "\n".join(lines)
+
+def identify_abbreviations(content, hits=None):
+    """识别文中的英文缩写"""
+    glossary_terms = set(_document_hits(content, hits).found('terms'))
+    abbreviations = [abbr for abbr in dict.fromkeys(ABBREVIATION_PATTERN.findall(content)) if abbr not in glossary_terms]
+    if abbreviations:
+        return f"{', '.join(abbreviations[:8])}（建议结合上下文确认含义）"
+    return "未发现其他英文缩写"
+
+# 各部分的字段及对应的分析器（字段与 analysis_result.SECTION_TEMPLATES 的占位符一致）
+SECTION_ANALYZERS = {
+    'summary': {
+        'main_topic': extract_main_topic,
+        'key_data': extract_key_data,
+        'conclusions': extract_conclusions,
+        'impact': assess_impact,
+        'structure': analyze_structure,
+        'credibility': assess_credibility,
+        'timeliness': assess_timeliness,
+        'completeness': assess_completeness,
+    },
+    'consensus': {
+        'research_areas': identify_research_areas,
+        'academic_controversies': identify_academic_controversies,
+        'recent_developments': identify_recent_developments,
+        'expert_opinions': extract_expert_opinions,
+        'industry_attitude': analyze_industry_attitude,
+        'policy_standpoint': analyze_policy_standpoint,
+    },
+    'bias': {
+        'author_position': analyze_author_position,
+        'reporting_bias': analyze_reporting_bias,
+        'information_selectivity': analyze_information_selectivity,
+        'conflicts_of_interest': identify_conflicts_of_interest,
+        'data_support': assess_data_support,
+        'viewpoint_diversity': assess_viewpoint_diversity,
+        'balance': assess_balance,
+    },
+    'terms': {
+        'terms': explain_terms,
+        'abbreviations': identify_abbreviations,
+    },
+    'advice': {
+        'info_strategy': generate_info_strategy,
+        'risks': assess_risks,
+        'opportunities': identify_opportunities,
+        'action_advice': generate_action_advice,
+        'short_term_actions': generate_short_term_actions,
+        'medium_term_plan': generate_medium_term_plan,
+        'long_term_strategy': generate_long_term_strategy,
+        'success_factors': identify_success_factors,
+        'challenges': identify_challenges,
+        'resource_needs': assess_resource_needs,
+    },
+}
+
+def analyze_content_with_ai(url, include_consensus, include_bias, include_terms, include_advice, progress=None,
+                            on_token=None, long_document=False, polite=False):
+    """使用AI分析网页内容（progress 接收各阶段的开始/结束事件，on_token 接收流式输出的分析文本，
+    long_document 为 True 时分析全文而不是前几千字，polite 为 True 时经过按主机限速的调度器抓取）"""
+    timer = StageTimer(on_event=progress)
+    # 抓取网页内容
+    webpage_data = scrape_webpage_simple(url, timer=timer, long_document=long_document, polite=polite)
+    return analyze_webpage_data(webpage_data, include_consensus, include_bias, include_terms, include_advice,
+                                timer=timer, on_token=on_token)
+
+def analyze_webpage_data(webpage_data, include_consensus, include_bias, include_terms, include_advice, timer=None,
+                         on_token=None, reuse_duplicates=True):
+    """分析已抓取的网页内容（批量模式中抓取和分析分开执行；reuse_duplicates 为 False 时不复用近似重复的历史分析）"""
+    if timer is None:
+        timer = StageTimer()
+    try:
+        url = webpage_data['url']
+        # 只生成选中的部分，未选中部分的分析器不会执行
+        sections = select_sections(include_consensus, include_bias, include_terms, include_advice)
+        long_mode = webpage_data.get('long_document', False)
+        
+        # 近似重复：正文与之前分析过的网页高度相似时（例如多处转载的同一篇通稿），复用那次的分析并记录关联；
+        # 只复用分析方式相同（同一分析后端、同为长文档或普通模式）的记录
+        mode = analysis_mode(get_backend(), long_mode)
+        with timer.stage('features'):
+            fingerprint = fingerprint_text(webpage_data['content']) if DEDUP_ENABLED else None
+            duplicate = find_near_duplicate(webpage_data, sections, fingerprint, mode) if reuse_duplicates else None
+        if duplicate is not None:
+            original_id, original = duplicate
+            with timer.stage('render'):
+                analysis = AnalysisResult(url, webpage_data['title'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                          original.topic, original.sections, original.features, original.narrative)
+                report = analysis.to_markdown()
+            if on_token is not None:
+                on_token(analysis.body_markdown())
+            return _finish_analysis(webpage_data, analysis, report, sections, timer, fingerprint, mode, cached=True,
+                                    duplicate_of=original_id)
+        
+        # 构建AI分析提示
+        analysis_prompt = f"""你是专业的内容分析专家，请对以下内容进行四智能体协作分析。
+
+网页标题：{webpage_data['title']}
+网页URL：{webpage_data['url']}
+
+内容：
+{webpage_data['content'][:3000]}
+
+请以四个专业智能体的身份进行分析：
+
+## 📋 内容摘要员
+作为信息提取专家，请分析：
+- 核心事件的关键细节和背景
+- 重要数据、统计和事实
+- 关键人物、机构及其角色
+- 事件影响范围和程度
+
+## 🎯 共识分析员
+作为观点分析专家，请分析：
+- 不同利益相关者的立场
+- 专家学者的专业意见
+- 政府部门的政策立场
+- 公众舆论的反应
+
+## ⚠️ 偏见识别员
+作为批判性分析专家，请分析：
+- 作者的立场和可能的利益关联
+- 报道的倾向性和选择性呈现
+- 信息的不平衡性和误导性
+- 潜在的利益冲突和偏见
+
+## 💡 决策建议员
+作为策略分析专家，请提供：
+- 基于分析的具体行动建议
+- 不同利益相关者的应对策略
+- 风险评估和预防措施
+- 发展趋势预测
+
+要求：每个智能体提供深入、专业、具体的分析，避免表面化，基于事实进行客观分析。
+本次只需输出以下部分：{'、'.join(SECTION_TITLES[name] for name in sections)}。"""
+
+        # 调用AI分析（记录首段输出的等待时间）
+        started = time.perf_counter()
+        first_output = []
+        
+        def on_text(text):
+            if not first_output:
+                first_output.append(text)
+                timer.add('first_token', time.perf_counter() - started)
+            if on_token is not None:
+                on_token(text)
+        
+        with timer.stage('features'):
+            result, cached, mode = analyze_with_cache(analysis_prompt, webpage_data['content'], sections, on_token=on_text,
+                                                long_document=long_mode)
+        
+        # 构建完整报告：结构化结果（分析时已生成或取自缓存）补上网址、标题和分析时间后渲染
+        with timer.stage('render'):
+            analysis = AnalysisResult(url, webpage_data['title'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                      result.topic, result.sections, result.features, result.narrative)
+            report = analysis.to_markdown()
+        
+        return _finish_analysis(webpage_data, analysis, report, sections, timer, fingerprint, mode, cached=cached)
+        
+    except Exception as e:
+        ANALYSES.inc(outcome='failed')
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+def find_near_duplicate(webpage_data, sections, fingerprint, mode):
+    """查找正文近似重复、分析方式相同的历史分析，返回 (原始记录ID, 结构化结果) 或 None"""
+    if fingerprint is None or webpage_data.get('error'):
+        return None
+    try:
+        found = get_store().find_near_duplicate(fingerprint, sections, mode)
+    except (sqlite3.Error, OSError):
+        return None
+    if found is None or found[0].get('result') is None:
+        return None
+    record = found[0]
+    return record['id'], AnalysisResult.from_dict(record['result'])
+
+def _finish_analysis(webpage_data, analysis, report, sections, timer, fingerprint, mode, cached=False,
+                     duplicate_of=None):
+    """记录耗时、保存分析记录并返回结果"""
+    url = webpage_data['url']
+    timings = timer.as_dict()
+    record_timings(url, timings)
+    
+    # 保存分析记录（存储不可用时仍然返回报告）
+    record_id = new_record_id()
+    try:
+        get_store().save(url, webpage_data['content'], webpage_data['title'], report,
+                         sections=sections, timings=timings, record_id=record_id, result=analysis,
+                         fingerprint=fingerprint, duplicate_of=duplicate_of, mode=mode)
+    except (sqlite3.Error, OSError):
+        pass
+    ANALYSES.inc(outcome='duplicate' if duplicate_of else 'cached' if cached else 'computed')
+    
+    return {
+        'success': True,
+        'report': report,
+        'result': analysis,
+        'record_id': record_id,
+        'timings': timings,
+        'cached': cached,
+        'duplicate_of': duplicate_of
+    }
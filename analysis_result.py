@@ -0,0 +1,252 @@
+"""ClarityAI 结构化分析结果
+
+每个分析器的输出和文档的原始特征（长度、关键数据、各关键词表的命中次数）
+保存在基于 __slots__ 的结果对象中：界面渲染为 Markdown，
+API 输出为 JSON，存储时序列化为按字段位置编码、压缩后的紧凑字节。
+"""
+import json
+import zlib
+from string import Formatter
+
+# 紧凑字节格式版本
+FORMAT_VERSION = 1
+
+# 报告各部分的 Markdown 模板，占位符即该部分的字段名
+SECTION_TEMPLATES = {
+    'summary': """
+## 📋 内容摘要员分析
+
+### 核心信息提取
+- **主要话题**: {main_topic}
+- **关键数据**: {key_data}
+- **重要结论**: {conclusions}
+- **影响范围**: {impact}
+
+### 信息结构分析
+- **逻辑结构**: {structure}
+- **可信度评估**: {credibility}
+- **时效性分析**: {timeliness}
+- **完整性评估**: {completeness}
+""",
+    'consensus': """
+## 🎯 共识分析员分析
+
+### 学术界主流观点
+- **相关研究领域**: {research_areas}
+- **学术争议焦点**: {academic_controversies}
+- **最新研究进展**: {recent_developments}
+
+### 业界专家共识
+- **行业专家观点**: {expert_opinions}
+- **企业界态度**: {industry_attitude}
+- **政策制定者立场**: {policy_standpoint}
+""",
+    'bias': """
+## ⚠️ 偏见识别员分析
+
+### 潜在偏见检测
+- **作者立场**: {author_position}
+- **报道倾向性**: {reporting_bias}
+- **信息选择性**: {information_selectivity}
+- **利益关联**: {conflicts_of_interest}
+
+### 客观性评估
+- **数据支撑**: {data_support}
+- **观点多样性**: {viewpoint_diversity}
+- **平衡性**: {balance}
+""",
+    'terms': """
+## 📚 术语解释员分析
+
+### 专业术语
+{terms}
+
+### 英文缩写
+- **文中缩写**: {abbreviations}
+""",
+    'advice': """
+## 💡 决策建议员分析
+
+### 战略建议
+1. **信息获取策略**: {info_strategy}
+2. **风险评估**: {risks}
+3. **机会识别**: {opportunities}
+4. **行动建议**: {action_advice}
+
+### 实施路径
+- **短期行动 (1-3个月)**: {short_term_actions}
+- **中期规划 (3-12个月)**: {medium_term_plan}
+- **长期战略 (1-3年)**: {long_term_strategy}
+
+### 成功要素
+- **关键成功因素**: {success_factors}
+- **潜在挑战**: {challenges}
+- **资源需求**: {resource_needs}
+""",
+}
+# 各部分的字段（按模板中出现的顺序，也是紧凑字节中的编码顺序）
+SECTION_FIELDS = {
+    name: tuple(field for _, field, _, _ in Formatter().parse(template) if field)
+    for name, template in SECTION_TEMPLATES.items()
+}
+
+REPORT_TEMPLATE = """
+## 📊 ClarityAI 智能分析报告
+
+### 🌐 网页信息
+- **URL**: {url}
+- **标题**: {title}
+- **分析时间**: {analyzed_at}
+- **分析状态**: ✅ 完成
+
+### 🤖 智能体分析结果
+
+{body}
+
+### 📈 综合评估
+- **可信度**: 85%
+- **重要性**: 高
+- **时效性**: 高
+- **实用性**: 高
+
+### 🎯 总结
+此网页内容提供了关于{topic}的全面视角，包含了主流观点、潜在偏见、专业术语解释和实用建议。建议将此分析作为决策参考，同时结合其他信息源进行综合判断。
+
+---
+*报告生成时间: {analyzed_at}*
+*ClarityAI 智能分析系统*
+"""
+
+# 保存的关键数据条数
+MAX_FEATURE_NUMBERS = 20
+
+
+class SectionResult:
+    """报告中一个部分的各分析器输出"""
+
+    __slots__ = ('name', 'findings')
+
+    def __init__(self, name, findings):
+        self.name = name
+        self.findings = findings
+
+    def to_markdown(self):
+        return SECTION_TEMPLATES[self.name].format(**self.findings)
+
+    def to_dict(self):
+        return dict(self.findings)
+
+
+class DocumentFeatures:
+    """文档的原始特征：正文长度、关键数据、各关键词表中命中的关键词及次数"""
+
+    __slots__ = ('length', 'numbers', 'keyword_counts')
+
+    def __init__(self, length, numbers, keyword_counts):
+        self.length = length
+        self.numbers = numbers
+        self.keyword_counts = keyword_counts
+
+    @classmethod
+    def from_hits(cls, hits, groups):
+        keyword_counts = {}
+        for group in groups:
+            found = hits.found(group)
+            if found:
+                keyword_counts[group] = {kw: hits.count(kw) for kw in found}
+        return cls(hits.length, list(hits.numbers[:MAX_FEATURE_NUMBERS]), keyword_counts)
+
+    def to_dict(self):
+        return {'length': self.length, 'numbers': self.numbers, 'keyword_counts': self.keyword_counts}
+
+
+class AnalysisResult:
+    """一次分析的结构化结果
+
+    narrative 为分析后端输出的正文（例如模型生成的文本）；
+    为 None 时报告正文由各部分的分析器输出渲染。
+    """
+
+    __slots__ = ('url', 'title', 'analyzed_at', 'topic', 'sections', 'features', 'narrative')
+
+    def __init__(self, url, title, analyzed_at, topic, sections, features, narrative=None):
+        self.url = url
+        self.title = title
+        self.analyzed_at = analyzed_at
+        self.topic = topic
+        self.sections = tuple(sections)
+        self.features = features
+        self.narrative = narrative
+
+    def section(self, name):
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def body_markdown(self):
+        """智能体分析部分的 Markdown"""
+        if self.narrative is not None:
+            return self.narrative
+        return "\n".join(section.to_markdown() for section in self.sections)
+
+    def to_markdown(self):
+        """完整报告的 Markdown"""
+        return REPORT_TEMPLATE.format(url=self.url, title=self.title, analyzed_at=self.analyzed_at,
+                                      body=self.body_markdown(), topic=self.topic)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'title': self.title,
+            'analyzed_at': self.analyzed_at,
+            'topic': self.topic,
+            'sections': {section.name: section.to_dict() for section in self.sections},
+            'features': self.features.to_dict(),
+            'narrative': self.narrative,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        features = data['features']
+        return cls(
+            data['url'], data['title'], data['analyzed_at'], data['topic'],
+            [SectionResult(name, dict(findings)) for name, findings in data['sections'].items()],
+            DocumentFeatures(features['length'], features['numbers'], features['keyword_counts']),
+            data.get('narrative'),
+        )
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_bytes(self):
+        """紧凑字节：字段按位置编码（不重复保存字段名和模板文字），再压缩"""
+        packed = [
+            FORMAT_VERSION,
+            self.url,
+            self.title,
+            self.analyzed_at,
+            self.topic,
+            self.narrative,
+            [[section.name, [section.findings[field] for field in SECTION_FIELDS[section.name]]]
+             for section in self.sections],
+            [self.features.length, self.features.numbers, self.features.keyword_counts],
+        ]
+        return zlib.compress(json.dumps(packed, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+    @classmethod
+    def from_bytes(cls, data):
+        packed = json.loads(zlib.decompress(data).decode('utf-8'))
+        version, url, title, analyzed_at, topic, narrative, sections, features = packed
+        if version != FORMAT_VERSION:
+            raise ValueError(f'不支持的结果格式版本: {version}')
+        return cls(
+            url, title, analyzed_at, topic,
+            [SectionResult(name, dict(zip(SECTION_FIELDS[name], values))) for name, values in sections],
+            DocumentFeatures(*features),
+            narrative,
+        )
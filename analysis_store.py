@@ -0,0 +1,259 @@
+"""ClarityAI 分析记录存储
+
+用 SQLite 持久化每次分析：唯一记录ID、结构化结果的紧凑字节（或压缩后的报告正文），
+并按 URL、正文哈希和时间建立索引，支持历史列表、查询和分页导出。
+正文指纹的分段建立 LSH 索引，用于查找内容近似重复的历史分析（见 near_duplicate）。
+"""
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+from analysis_result import AnalysisResult
+from http_cache import normalize_url
+from near_duplicate import MAX_DISTANCE, MIN_SIMILARITY, bands, distance, from_signed, similarity, to_signed
+from report_cache import normalize_content
+
+DB_PATH = os.environ.get(
+    'CLARITY_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'clarity.db'),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    normalized_url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    sections TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    report BLOB NOT NULL,
+    timings TEXT NOT NULL DEFAULT '{}',
+    result BLOB,
+    simhash INTEGER,
+    minhash BLOB,
+    duplicate_of TEXT,
+    mode TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_url ON analyses (normalized_url, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_content ON analyses (content_hash, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    record_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_simhash_bands ON simhash_bands (band, value);
+"""
+
+# 每个指纹分段最多比较的候选记录数（按时间倒序）
+MAX_CANDIDATES_PER_BAND = 200
+
+# 列表查询不读取报告正文
+SUMMARY_COLUMNS = 'id, url, title, sections, created_at, content_hash, duplicate_of'
+FULL_COLUMNS = SUMMARY_COLUMNS + ', report, timings, result'
+
+
+def new_record_id():
+    """生成唯一记录ID（毫秒时间戳 + 随机后缀，按时间排序）"""
+    return f"ANALYSIS_{int(time.time() * 1000)}_{secrets.token_hex(4)}"
+
+
+def content_hash(content):
+    """规范化正文的哈希，用于识别内容相同的分析"""
+    return hashlib.sha256(normalize_content(content).encode('utf-8')).hexdigest()
+
+
+def _mode_key(mode):
+    # 分析方式的规范化表示（与报告缓存键中的分析选项一致）
+    return json.dumps(mode or {}, sort_keys=True, ensure_ascii=False)
+
+
+def _row_to_dict(row):
+    record = dict(row)
+    record['sections'] = json.loads(record['sections'])
+    if 'report' in record:
+        record['timings'] = json.loads(record['timings'])
+        if record['result'] is not None:
+            # 保存了结构化结果的记录由结果渲染报告
+            result = AnalysisResult.from_bytes(record['result'])
+            record['report'] = result.to_markdown()
+            record['result'] = result.to_dict()
+        else:
+            record['report'] = zlib.decompress(record['report']).decode('utf-8')
+    return record
+
+
+class AnalysisStore:
+    """分析记录存储（线程安全）"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        # 旧版本的数据库没有 result 列、指纹列和分析方式列
+        # （旧记录没有指纹或分析方式，不参与近似重复查找）
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(analyses)')}
+        for name, column_type in (('result', 'BLOB'), ('simhash', 'INTEGER'), ('minhash', 'BLOB'),
+                                  ('duplicate_of', 'TEXT'), ('mode', 'TEXT')):
+            if name not in columns:
+                self._conn.execute(f'ALTER TABLE analyses ADD COLUMN {name} {column_type}')
+
+    def save(self, url, content, title, report, sections=(), timings=None, record_id=None, result=None,
+             fingerprint=None, duplicate_of=None, mode=None):
+        """保存一次分析，返回记录ID；传入结构化结果时只保存结果，报告在读取时由结果渲染
+
+        fingerprint 为正文指纹；duplicate_of 为复用了其分析的原始记录ID（复用的记录不进入近似重复索引）；
+        mode 为分析方式（分析后端、是否长文档模式等），近似重复只复用分析方式相同的记录。
+        """
+        record_id = record_id or new_record_id()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO analyses (id, url, normalized_url, content_hash, title, sections, created_at, report, '
+                'timings, result, simhash, minhash, duplicate_of, mode) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    record_id,
+                    url,
+                    normalize_url(url),
+                    content_hash(content),
+                    title or '',
+                    json.dumps(list(sections)),
+                    time.time(),
+                    b'' if result is not None else zlib.compress(report.encode('utf-8'), 6),
+                    json.dumps(timings or {}),
+                    result.to_bytes() if result is not None else None,
+                    to_signed(fingerprint.simhash) if fingerprint is not None else None,
+                    fingerprint.minhash if fingerprint is not None else None,
+                    duplicate_of,
+                    _mode_key(mode),
+                ),
+            )
+            if fingerprint is not None and duplicate_of is None and result is not None:
+                self._conn.executemany(
+                    'INSERT INTO simhash_bands (band, value, record_id) VALUES (?, ?, ?)',
+                    [(band, to_signed(value), record_id) for band, value in bands(fingerprint.simhash)],
+                )
+        return record_id
+
+    def find_near_duplicate(self, fingerprint, sections=None, mode=None):
+        """查找正文近似重复、包含相同报告部分且分析方式相同的最相似的历史分析，返回 (记录, 相似度) 或 None
+
+        候选记录是指纹至少有一段相同的记录，再按汉明距离和 MinHash 相似度确认。
+        """
+        wanted = None if sections is None else sorted(sections)
+        wanted_mode = _mode_key(mode)
+        with self._lock:
+            candidates = {}
+            for band, value in bands(fingerprint.simhash):
+                rows = self._conn.execute(
+                    'SELECT a.id, a.simhash, a.minhash, a.sections, a.created_at FROM simhash_bands b '
+                    'JOIN analyses a ON a.id = b.record_id WHERE b.band = ? AND b.value = ? AND a.mode = ? '
+                    'ORDER BY b.rowid DESC LIMIT ?',
+                    (band, to_signed(value), wanted_mode, MAX_CANDIDATES_PER_BAND),
+                ).fetchall()
+                for row in rows:
+                    candidates[row['id']] = row
+        best = None
+        for row in candidates.values():
+            if distance(from_signed(row['simhash']), fingerprint.simhash) > MAX_DISTANCE:
+                continue
+            if wanted is not None and sorted(json.loads(row['sections'])) != wanted:
+                continue
+            score = similarity(row['minhash'], fingerprint.minhash)
+            if score >= MIN_SIMILARITY and (best is None or (score, row['created_at']) > best[:2]):
+                best = (score, row['created_at'], row['id'])
+        if best is None:
+            return None
+        record = self.get(best[2])
+        return (record, best[0]) if record is not None else None
+
+    def get(self, record_id):
+        """按记录ID读取完整记录（含报告），不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {FULL_COLUMNS} FROM analyses WHERE id = ?', (record_id,)
+            ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def latest_for_url(self, url):
+        """某个 URL 最近一次的分析记录"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {FULL_COLUMNS} FROM analyses WHERE normalized_url = ? ORDER BY created_at DESC LIMIT 1',
+                (normalize_url(url),),
+            ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def latest_for_content(self, content):
+        """正文相同的最近一次分析记录"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT {FULL_COLUMNS} FROM analyses WHERE content_hash = ? ORDER BY created_at DESC LIMIT 1',
+                (content_hash(content),),
+            ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def _page(self, columns, limit, before):
+        # 按 (created_at, id) 做键集分页，翻页代价与页码无关
+        with self._lock:
+            if before is None:
+                rows = self._conn.execute(
+                    f'SELECT {columns} FROM analyses ORDER BY created_at DESC, id DESC LIMIT ?',
+                    (limit,),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    f'SELECT {columns} FROM analyses WHERE (created_at, id) < (?, ?) '
+                    'ORDER BY created_at DESC, id DESC LIMIT ?',
+                    (before[0], before[1], limit),
+                ).fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def list_recent(self, limit=20, before=None):
+        """按时间倒序列出记录摘要；before 为上一页最后一条的 (created_at, id)"""
+        return self._page(SUMMARY_COLUMNS, limit, before)
+
+    def iter_pages(self, page_size=500, include_report=True):
+        """分页导出全部记录（按时间倒序），每次产出一页"""
+        columns = FULL_COLUMNS if include_report else SUMMARY_COLUMNS
+        before = None
+        while True:
+            page = self._page(columns, page_size, before)
+            if not page:
+                return
+            yield page
+            before = (page[-1]['created_at'], page[-1]['id'])
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM analyses').fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """进程内共享的分析记录存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AnalysisStore()
+    return _store
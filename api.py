@@ -0,0 +1,296 @@
+"""ClarityAI HTTP API
+
+与 Streamlit 界面并行的无界面分析服务：
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+抓取在 IO 线程池中执行，解析和分析在独立的计算线程池中执行，
+事件循环只负责调度，不会被单个慢网站或大页面阻塞。
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
+
+from analysis_engine import analyze_webpage_data, scrape_webpage_simple, select_sections
+from analysis_store import get_store
+from feed_ingest import BACKFILL, get_feed_store, get_ingestor, start_ingestor
+from feed_ingest import DEFAULT_INTERVAL as FEED_DEFAULT_INTERVAL
+from fetch_scheduler import get_scheduler, interleave_by_host
+from http_cache import get_http_cache
+from llm_backend import get_backend
+from instrumentation import StageTimer
+from metrics import render_prometheus
+from report_cache import get_report_cache
+from watchlist import DEFAULT_INTERVAL, MIN_INTERVAL, get_monitor, get_watch_store, start_monitor
+
+# 线程池配置（可通过环境变量调整）
+FETCH_WORKERS = int(os.environ.get('CLARITY_API_FETCH_WORKERS', 64))
+ANALYZE_WORKERS = int(os.environ.get('CLARITY_API_ANALYZE_WORKERS', os.cpu_count() or 4))
+MAX_BATCH_URLS = int(os.environ.get('CLARITY_API_MAX_BATCH', 500))
+
+_executors = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    _executors['fetch'] = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='api-fetch')
+    _executors['analyze'] = ThreadPoolExecutor(max_workers=ANALYZE_WORKERS, thread_name_prefix='api-analyze')
+    pollers = [poller for poller in (start_monitor(), start_ingestor()) if poller is not None]
+    try:
+        yield
+    finally:
+        for poller in pollers:
+            poller.stop()
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _executors.clear()
+
+
+app = FastAPI(title="ClarityAI API", description="智能内容分析服务", lifespan=lifespan)
+
+
+class AnalysisOptions(BaseModel):
+    include_consensus: bool = True
+    include_bias: bool = True
+    include_terms: bool = True
+    include_advice: bool = True
+    long_document: bool = False
+
+
+def _check_url(url):
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError('URL必须以 http:// 或 https:// 开头')
+    return url
+
+
+class AnalyzeRequest(AnalysisOptions):
+    url: str
+
+    @field_validator('url')
+    @classmethod
+    def validate_url(cls, url):
+        return _check_url(url)
+
+
+class BatchAnalyzeRequest(AnalysisOptions):
+    urls: List[str] = Field(min_length=1, max_length=MAX_BATCH_URLS)
+
+    @field_validator('urls')
+    @classmethod
+    def validate_urls(cls, urls):
+        return [_check_url(url) for url in urls]
+
+
+class WatchRequest(BaseModel):
+    url: str
+    # 检查间隔（秒）
+    interval: float = Field(default=DEFAULT_INTERVAL, ge=MIN_INTERVAL)
+    include_consensus: bool = True
+    include_bias: bool = True
+    include_terms: bool = True
+    include_advice: bool = True
+
+    @field_validator('url')
+    @classmethod
+    def validate_url(cls, url):
+        return _check_url(url)
+
+
+class FeedRequest(WatchRequest):
+    interval: float = Field(default=FEED_DEFAULT_INTERVAL, ge=MIN_INTERVAL)
+    # 第一次采集时提交分析的最新条目数
+    backfill: int = Field(default=BACKFILL, ge=0)
+
+
+class AnalyzeResponse(BaseModel):
+    url: str
+    success: bool
+    title: str = ''
+    record_id: Optional[str] = None
+    report: Optional[str] = None
+    # 结构化结果：各分析器的输出和文档特征，无需解析 Markdown
+    result: Optional[Dict[str, Any]] = None
+    cached: bool = False
+    # 正文与历史分析近似重复时，复用的原始记录ID
+    duplicate_of: Optional[str] = None
+    timings: Dict[str, Dict[str, float]] = {}
+    error: Optional[str] = None
+
+
+class BatchAnalyzeResponse(BaseModel):
+    total: int
+    succeeded: int
+    results: List[AnalyzeResponse]
+
+
+async def analyze_url(url, options, polite=False):
+    """抓取并分析一个 URL（抓取和计算都在线程池中执行；polite 为 True 时按主机限速并遵守 robots.txt）"""
+    loop = asyncio.get_running_loop()
+    timer = StageTimer()
+    webpage_data = await loop.run_in_executor(
+        _executors['fetch'],
+        partial(scrape_webpage_simple, url, timer=timer, long_document=options.long_document, polite=polite),
+    )
+    if webpage_data.get('error'):
+        return AnalyzeResponse(url=url, success=False, title=webpage_data['title'], error=webpage_data['error'])
+    result = await loop.run_in_executor(
+        _executors['analyze'],
+        partial(
+            analyze_webpage_data, webpage_data,
+            options.include_consensus, options.include_bias, options.include_terms, options.include_advice,
+            timer=timer,
+        ),
+    )
+    if not result['success']:
+        return AnalyzeResponse(url=url, success=False, title=webpage_data['title'], error=result['error'])
+    return AnalyzeResponse(
+        url=url,
+        success=True,
+        title=webpage_data['title'],
+        record_id=result['record_id'],
+        report=result['report'],
+        result=result['result'].to_dict(),
+        cached=result['cached'],
+        duplicate_of=result['duplicate_of'],
+        timings=result['timings'],
+    )
+
+
+@app.post('/analyze', response_model=AnalyzeResponse)
+async def analyze(request: AnalyzeRequest):
+    """分析单个网页"""
+    return await analyze_url(request.url, request)
+
+
+@app.post('/analyze/batch', response_model=BatchAnalyzeResponse)
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """批量分析网页（并发抓取，结果顺序与请求一致）"""
+    # 按主机交错启动：同一站点受限速排队时不占满抓取线程，结果仍按请求顺序返回
+    order = interleave_by_host(request.urls)
+    tasks = {index: asyncio.ensure_future(analyze_url(request.urls[index], request, polite=True)) for index in order}
+    results = [await tasks[index] for index in range(len(request.urls))]
+    return BatchAnalyzeResponse(
+        total=len(results),
+        succeeded=sum(1 for result in results if result.success),
+        results=results,
+    )
+
+
+@app.get('/analyses')
+def list_analyses(limit: int = 20, before_time: Optional[float] = None, before_id: Optional[str] = None):
+    """按时间倒序列出历史分析；用上一页最后一条的 created_at/id 作为 before_time/before_id 翻页"""
+    before = (before_time, before_id) if before_time is not None and before_id else None
+    return {'items': get_store().list_recent(limit=max(1, min(limit, 200)), before=before)}
+
+
+@app.get('/analyses/{record_id}')
+def get_analysis(record_id: str):
+    """按记录ID读取历史分析"""
+    record = get_store().get(record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail='记录不存在')
+    return record
+
+
+@app.get('/watches')
+def list_watches():
+    """监控中的网页及最近一次检查的结果"""
+    return {'items': get_watch_store().list_watches()}
+
+
+@app.post('/watches')
+def add_watch(request: WatchRequest):
+    """登记监控（同一网页已登记时更新间隔和报告部分）"""
+    sections = select_sections(request.include_consensus, request.include_bias, request.include_terms,
+                               request.include_advice)
+    watch_id = get_watch_store().add(request.url, request.interval, sections)
+    get_monitor().wake()
+    return {'id': watch_id}
+
+
+@app.delete('/watches/{watch_id}')
+def remove_watch(watch_id: int):
+    if not get_watch_store().remove(watch_id):
+        raise HTTPException(status_code=404, detail='监控不存在')
+    return {'id': watch_id}
+
+
+@app.post('/watches/{watch_id}/check')
+def check_watch_now(watch_id: int):
+    """立即检查一次"""
+    if not get_watch_store().check_now(watch_id):
+        raise HTTPException(status_code=404, detail='监控不存在')
+    get_monitor().wake()
+    return {'id': watch_id}
+
+
+@app.get('/watches/{watch_id}/changes')
+def list_watch_changes(watch_id: int, limit: int = 50):
+    """监控发现的内容变化（结论有变化的报告部分、新增/删除的句子数）"""
+    return {'items': get_watch_store().list_changes(watch_id, limit=max(1, min(limit, 200)))}
+
+
+@app.get('/feeds')
+def list_feeds():
+    """订阅源及最近一次采集的结果"""
+    return {'items': get_feed_store().list_feeds()}
+
+
+@app.post('/feeds')
+def add_feed(request: FeedRequest):
+    """登记 RSS/Atom 订阅源或站点地图，新发现的条目自动提交分析"""
+    sections = select_sections(request.include_consensus, request.include_bias, request.include_terms,
+                               request.include_advice)
+    feed_id = get_feed_store().add(request.url, request.interval, sections, backfill=request.backfill)
+    get_ingestor().wake()
+    return {'id': feed_id}
+
+
+@app.delete('/feeds/{feed_id}')
+def remove_feed(feed_id: int):
+    if not get_feed_store().remove(feed_id):
+        raise HTTPException(status_code=404, detail='订阅源不存在')
+    return {'id': feed_id}
+
+
+@app.post('/feeds/{feed_id}/check')
+def check_feed_now(feed_id: int):
+    """立即采集一次"""
+    if not get_feed_store().check_now(feed_id):
+        raise HTTPException(status_code=404, detail='订阅源不存在')
+    get_ingestor().wake()
+    return {'id': feed_id}
+
+
+@app.get('/feeds/{feed_id}/items')
+def list_feed_items(feed_id: int, limit: int = 50):
+    """订阅源最近发现的条目"""
+    return {'items': get_feed_store().recent_items(feed_id, limit=max(1, min(limit, 200)))}
+
+
+@app.get('/health')
+def health():
+    """健康检查及缓存状态"""
+    return {
+        'status': 'ok',
+        'http_cache': get_http_cache().stats(),
+        'report_cache': get_report_cache().stats(),
+        'llm_backend': get_backend().stats(),
+        'fetch_scheduler': get_scheduler().stats(),
+        'watch_monitor': get_monitor().stats(),
+        'feed_ingestor': get_ingestor().stats(),
+    }
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics():
+    """Prometheus 格式的运行指标（阶段耗时直方图、抓取错误、缓存命中率、进程内存/CPU）"""
+    return PlainTextResponse(render_prometheus(), media_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,10 +1,8 @@
 import streamlit as st
-import requests
-import json
-import pandas as pd
 from datetime import datetime
 import time
-import re
+
+from instrumentation import STAGE_LABELS, STAGE_NAMES, STAGE_TITLES
 
 # 页面配置
 st.set_page_config(
@@ -70,445 +68,92 @@ if 'logged_in' not in st.session_state:
 if 'last_analysis_id' not in st.session_state:
     st.session_state.last_analysis_id = None
 
-def scrape_webpage_simple(url):
-    """简化的网页抓取函数"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # 简单的HTML解析
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # 提取标题
-        title = soup.find('title')
-        title_text = title.get_text() if title else "无标题"
-        
-        # 提取正文内容
-        # 移除脚本和样式
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # 获取文本内容
-        text = soup.get_text()
-        
-        # 清理文本
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        return {
-            'title': title_text,
-            'content': text[:5000],  # 限制内容长度
-            'url': url
-        }
-    except Exception as e:
-        return {
-            'title': '抓取失败',
-            'content': f'无法抓取网页内容: {str(e)}',
-            'url': url
-        }
-
-def call_free_ai_api(prompt, content=""):
-    """调用免费AI API进行分析"""
-    try:
-        # 使用免费的AI API服务
-        # 这里使用一个简化的AI分析逻辑
-        analysis_result = generate_ai_analysis(prompt, content)
-        return analysis_result
-    except Exception as e:
-        return f"AI分析失败: {str(e)}"
-
-def generate_ai_analysis(prompt, content):
-    """生成AI分析报告"""
-    # 基于内容生成智能分析
-    analysis_parts = []
-    
-    # 内容摘要
-    summary = f"""
-## 📋 内容摘要员分析
-
-### 核心信息提取
-- **主要话题**: {extract_main_topic(content)}
-- **关键数据**: {extract_key_data(content)}
-- **重要结论**: {extract_conclusions(content)}
-- **影响范围**: {assess_impact(content)}
-
-### 信息结构分析
-- **逻辑结构**: {analyze_structure(content)}
-- **可信度评估**: {assess_credibility(content)}
-- **时效性分析**: {assess_timeliness(content)}
-- **完整性评估**: {assess_completeness(content)}
-"""
-    analysis_parts.append(summary)
-    
-    # 共识分析
-    consensus = f"""
-## 🎯 共识分析员分析
-
-### 学术界主流观点
-- **相关研究领域**: {identify_research_areas(content)}
-- **学术争议焦点**: {identify_academic_controversies(content)}
-- **最新研究进展**: {identify_recent_developments(content)}
-
-### 业界专家共识
-- **行业专家观点**: {extract_expert_opinions(content)}
-- **企业界态度**: {analyze_industry_attitude(content)}
-- **政策制定者立场**: {analyze_policy_standpoint(content)}
-"""
-    analysis_parts.append(consensus)
-    
-    # 偏见识别
-    bias = f"""
-## ⚠️ 偏见识别员分析
-
-### 潜在偏见检测
-- **作者立场**: {analyze_author_position(content)}
-- **报道倾向性**: {analyze_reporting_bias(content)}
-- **信息选择性**: {analyze_information_selectivity(content)}
-- **利益关联**: {identify_conflicts_of_interest(content)}
-
-### 客观性评估
-- **数据支撑**: {assess_data_support(content)}
-- **观点多样性**: {assess_viewpoint_diversity(content)}
-- **平衡性**: {assess_balance(content)}
-"""
-    analysis_parts.append(bias)
-    
-    # 决策建议
-    advice = f"""
-## 💡 决策建议员分析
-
-### 战略建议
-1. **信息获取策略**: {generate_info_strategy(content)}
-2. **风险评估**: {assess_risks(content)}
-3. **机会识别**: {identify_opportunities(content)}
-4. **行动建议**: {generate_action_advice(content)}
-
-### 实施路径
-- **短期行动 (1-3个月)**: {generate_short_term_actions(content)}
-- **中期规划 (3-12个月)**: {generate_medium_term_plan(content)}
-- **长期战略 (1-3年)**: {generate_long_term_strategy(content)}
-
-### 成功要素
-- **关键成功因素**: {identify_success_factors(content)}
-- **潜在挑战**: {identify_challenges(content)}
-- **资源需求**: {assess_resource_needs(content)}
-"""
-    analysis_parts.append(advice)
-    
-    return "\n".join(analysis_parts)
-
-def extract_main_topic(content):
-    """提取主要话题"""
-    topics = ["技术", "经济", "政治", "社会", "环境", "健康", "教育", "文化"]
-    for topic in topics:
-        if topic in content:
-            return f"主要涉及{topic}领域"
-    return "综合话题"
-
-def extract_key_data(content):
-    """提取关键数据"""
-    numbers = re.findall(r'\d+%|\d+\.\d+%|\d+万|\d+亿', content)
-    if numbers:
-        return f"发现关键数据: {', '.join(numbers[:3])}"
-    return "未发现具体数据"
-
-def extract_conclusions(content):
-    """提取重要结论"""
-    conclusion_keywords = ["结论", "发现", "表明", "显示", "证明"]
-    for keyword in conclusion_keywords:
-        if keyword in content:
-            return f"包含重要结论，涉及{keyword}相关内容"
-    return "需要进一步分析得出结论"
-
-def assess_impact(content):
-    """评估影响范围"""
-    impact_keywords = ["影响", "改变", "推动", "促进", "阻碍"]
-    impacts = [kw for kw in impact_keywords if kw in content]
-    if impacts:
-        return f"可能产生{', '.join(impacts)}等影响"
-    return "影响范围需要进一步评估"
-
-def analyze_structure(content):
-    """分析逻辑结构"""
-    if len(content) > 1000:
-        return "结构完整，内容丰富"
-    elif len(content) > 500:
-        return "结构基本完整"
-    else:
-        return "结构相对简单"
-
-def assess_credibility(content):
-    """评估可信度"""
-    credibility_indicators = ["研究", "数据", "专家", "报告", "调查"]
-    indicators = [ind for ind in credibility_indicators if ind in content]
-    if len(indicators) >= 3:
-        return "高可信度"
-    elif len(indicators) >= 1:
-        return "中等可信度"
+# 正在等待的后台分析任务ID，以及刚完成、待显示结果的任务ID
+if 'active_job' not in st.session_state:
+    st.session_state.active_job = None
+
+if 'finished_job' not in st.session_state:
+    st.session_state.finished_job = None
+
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+
+if 'history_cursors' not in st.session_state:
+    st.session_state.history_cursors = [None]
+
+@st.cache_resource(show_spinner="⚙️ 正在加载分析引擎...")
+def load_engine():
+    """每个进程只加载一次分析引擎并预热共享资源，返回启动耗时（毫秒）"""
+    # 分析引擎在登录后才导入，登录页不承担这部分启动时间
+    started = time.perf_counter()
+    import analysis_engine
+    import batch  # noqa: F401
+    import feed_ingest
+    import job_queue
+    import watchlist
+    # 任务队列和工作线程由所有会话共享；网页监控和订阅源采集在后台线程中按间隔检查
+    job_queue.get_job_queue()
+    watchlist.start_monitor()
+    feed_ingest.start_ingestor()
+    timings = {'import': round((time.perf_counter() - started) * 1000, 2)}
+    timings.update(analysis_engine.warm_up())
+    return timings
+
+def startup_report(timings):
+    """启动耗时明细"""
+    from analysis_engine import WARM_UP_STEPS
+    titles = {'import': '导入分析引擎'}
+    titles.update((name, title) for name, title, _ in WARM_UP_STEPS)
+    with st.expander("🚀 启动耗时"):
+        for name, elapsed in timings.items():
+            st.caption(f"{titles.get(name, name)}: {elapsed:.1f} ms")
+        st.caption(f"合计: {sum(timings.values()):.1f} ms")
+
+@st.fragment(run_every=5)
+def ops_panel():
+    """运维面板：进程资源、各阶段耗时分位数、缓存命中率和抓取结果（每 5 秒刷新）"""
+    from metrics import ANALYSES, FETCHES, REGISTRY, process_snapshot, stage_summary
+    snapshot = process_snapshot()
+    if snapshot is not None:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("内存", f"{snapshot['rss_bytes'] / 1024 / 1024:.0f} MB")
+        col2.metric("CPU", f"{snapshot['cpu_percent']:.0f}%")
+        col3.metric("线程", snapshot['threads'])
     else:
-        return "需要进一步验证"
-
-def assess_timeliness(content):
-    """评估时效性"""
-    time_indicators = ["最新", "近期", "今年", "本月", "最近"]
-    if any(ind in content for ind in time_indicators):
-        return "时效性较强"
-    return "时效性一般"
-
-def assess_completeness(content):
-    """评估完整性"""
-    if len(content) > 2000:
-        return "信息相对完整"
-    elif len(content) > 1000:
-        return "信息基本完整"
-    else:
-        return "信息可能不够完整"
-
-def identify_research_areas(content):
-    """识别研究领域"""
-    areas = ["人工智能", "机器学习", "数据分析", "社会科学", "自然科学"]
-    found_areas = [area for area in areas if area in content]
-    if found_areas:
-        return f"涉及{', '.join(found_areas)}等领域"
-    return "需要进一步确定研究领域"
-
-def identify_academic_controversies(content):
-    """识别学术争议"""
-    controversy_keywords = ["争议", "分歧", "不同观点", "争论"]
-    controversies = [kw for kw in controversy_keywords if kw in content]
-    if controversies:
-        return f"存在{', '.join(controversies)}等争议点"
-    return "争议点不明显"
-
-def identify_recent_developments(content):
-    """识别最新进展"""
-    development_keywords = ["最新", "突破", "进展", "发展", "创新"]
-    developments = [kw for kw in development_keywords if kw in content]
-    if developments:
-        return f"包含{', '.join(developments)}等最新进展"
-    return "最新进展信息有限"
-
-def extract_expert_opinions(content):
-    """提取专家观点"""
-    expert_keywords = ["专家", "学者", "教授", "研究员", "分析师"]
-    experts = [kw for kw in expert_keywords if kw in content]
-    if experts:
-        return f"包含{', '.join(experts)}等专业观点"
-    return "专家观点信息有限"
-
-def analyze_industry_attitude(content):
-    """分析业界态度"""
-    industry_keywords = ["企业", "公司", "行业", "市场", "商业"]
-    if any(kw in content for kw in industry_keywords):
-        return "包含业界相关观点"
-    return "业界态度信息有限"
-
-def analyze_policy_standpoint(content):
-    """分析政策立场"""
-    policy_keywords = ["政策", "政府", "法规", "规定", "制度"]
-    if any(kw in content for kw in policy_keywords):
-        return "包含政策相关立场"
-    return "政策立场信息有限"
-
-def analyze_author_position(content):
-    """分析作者立场"""
-    position_keywords = ["支持", "反对", "赞成", "批评", "质疑"]
-    positions = [kw for kw in position_keywords if kw in content]
-    if positions:
-        return f"作者立场偏向{', '.join(positions)}"
-    return "作者立场相对中立"
-
-def analyze_reporting_bias(content):
-    """分析报道倾向性"""
-    bias_indicators = ["明显", "强烈", "绝对", "完全"]
-    if any(ind in content for ind in bias_indicators):
-        return "存在一定倾向性"
-    return "报道相对客观"
-
-def analyze_information_selectivity(content):
-    """分析信息选择性"""
-    if len(content) < 1000:
-        return "信息可能经过选择性呈现"
-    return "信息呈现相对全面"
-
-def identify_conflicts_of_interest(content):
-    """识别利益关联"""
-    interest_keywords = ["利益", "投资", "合作", "赞助"]
-    if any(kw in content for kw in interest_keywords):
-        return "可能存在利益关联"
-    return "利益关联不明显"
-
-def assess_data_support(content):
-    """评估数据支撑"""
-    data_indicators = ["数据", "统计", "数字", "百分比", "图表"]
-    data_count = sum(1 for ind in data_indicators if ind in content)
-    if data_count >= 3:
-        return "数据支撑充分"
-    elif data_count >= 1:
-        return "数据支撑一般"
+        st.caption("未安装 psutil，无法读取进程资源")
+
+    families = {name: samples for name, _, _, samples in REGISTRY.collect()}
+    ratios = [
+        f"{dict(labels).get('cache', '')} {value:.0%}"
+        for _, labels, value in families.get('clarity_cache_hit_ratio', [])
+    ]
+    if ratios:
+        st.caption("缓存命中率: " + " / ".join(ratios))
+    fetches = {outcome: count for (outcome,), count in FETCHES.values().items()}
+    if fetches:
+        total = sum(fetches.values())
+        errors = ", ".join(f"{outcome} {count}" for outcome, count in sorted(fetches.items()) if outcome != 'ok')
+        st.caption(
+            f"网页抓取: {total} 次, 失败率 {1 - fetches.get('ok', 0) / total:.0%}" + (f" ({errors})" if errors else "")
+        )
+    analyses = {outcome: count for (outcome,), count in ANALYSES.values().items()}
+    if analyses:
+        st.caption("分析结果: " + ", ".join(f"{outcome} {count}" for outcome, count in sorted(analyses.items())))
+
+    summary = stage_summary()
+    if summary:
+        st.dataframe(
+            [
+                {'阶段': STAGE_TITLES.get(stage, stage), '次数': row['count'],
+                 'p50(ms)': row['p50_ms'], 'p95(ms)': row['p95_ms'], '平均(ms)': row['mean_ms']}
+                for stage, row in summary.items()
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
     else:
-        return "数据支撑不足"
-
-def assess_viewpoint_diversity(content):
-    """评估观点多样性"""
-    diversity_indicators = ["不同", "多种", "各方", "各种"]
-    if any(ind in content for ind in diversity_indicators):
-        return "观点多样性较好"
-    return "观点多样性有限"
-
-def assess_balance(content):
-    """评估平衡性"""
-    balance_indicators = ["平衡", "客观", "中立", "全面"]
-    if any(ind in content for ind in balance_indicators):
-        return "内容相对平衡"
-    return "平衡性需要进一步评估"
-
-def generate_info_strategy(content):
-    """生成信息获取策略"""
-    return "建议多渠道获取信息，包括官方渠道、专业媒体和学术资源"
-
-def assess_risks(content):
-    """评估风险"""
-    risk_keywords = ["风险", "挑战", "问题", "困难", "威胁"]
-    risks = [kw for kw in risk_keywords if kw in content]
-    if risks:
-        return f"识别到{', '.join(risks)}等潜在风险"
-    return "风险相对可控"
-
-def identify_opportunities(content):
-    """识别机会"""
-    opportunity_keywords = ["机会", "机遇", "优势", "潜力", "前景"]
-    opportunities = [kw for kw in opportunity_keywords if kw in content]
-    if opportunities:
-        return f"发现{', '.join(opportunities)}等机会"
-    return "机会需要进一步识别"
-
-def generate_action_advice(content):
-    """生成行动建议"""
-    return "建议采取渐进式行动，先试点后推广，持续监控效果"
-
-def generate_short_term_actions(content):
-    """生成短期行动"""
-    return "立即收集更多相关信息，建立初步分析框架"
-
-def generate_medium_term_plan(content):
-    """生成中期规划"""
-    return "制定详细实施计划，建立监控机制，定期评估进展"
-
-def generate_long_term_strategy(content):
-    """生成长期战略"""
-    return "建立长期发展愿景，构建可持续的竞争优势"
-
-def identify_success_factors(content):
-    """识别成功因素"""
-    return "领导支持、资源投入、团队协作、持续学习"
-
-def identify_challenges(content):
-    """识别挑战"""
-    challenge_keywords = ["挑战", "困难", "障碍", "问题"]
-    challenges = [kw for kw in challenge_keywords if kw in content]
-    if challenges:
-        return f"可能面临{', '.join(challenges)}等挑战"
-    return "挑战相对可控"
-
-def assess_resource_needs(content):
-    """评估资源需求"""
-    return "需要人力、技术、资金和时间等资源投入"
-
-def analyze_content_with_ai(url, include_consensus, include_bias, include_terms, include_advice):
-    """使用AI分析网页内容"""
-    try:
-        # 抓取网页内容
-        webpage_data = scrape_webpage_simple(url)
-        
-        # 构建AI分析提示
-        analysis_prompt = f"""你是专业的内容分析专家，请对以下内容进行四智能体协作分析。
-
-网页标题：{webpage_data['title']}
-网页URL：{webpage_data['url']}
-
-内容：
-{webpage_data['content'][:3000]}
-
-请以四个专业智能体的身份进行分析：
-
-## 📋 内容摘要员
-作为信息提取专家，请分析：
-- 核心事件的关键细节和背景
-- 重要数据、统计和事实
-- 关键人物、机构及其角色
-- 事件影响范围和程度
-
-## 🎯 共识分析员
-作为观点分析专家，请分析：
-- 不同利益相关者的立场
-- 专家学者的专业意见
-- 政府部门的政策立场
-- 公众舆论的反应
-
-## ⚠️ 偏见识别员
-作为批判性分析专家，请分析：
-- 作者的立场和可能的利益关联
-- 报道的倾向性和选择性呈现
-- 信息的不平衡性和误导性
-- 潜在的利益冲突和偏见
-
-## 💡 决策建议员
-作为策略分析专家，请提供：
-- 基于分析的具体行动建议
-- 不同利益相关者的应对策略
-- 风险评估和预防措施
-- 发展趋势预测
-
-要求：每个智能体提供深入、专业、具体的分析，避免表面化，基于事实进行客观分析。"""
-
-        # 调用AI分析
-        result = call_free_ai_api(analysis_prompt, webpage_data['content'])
-        
-        # 构建完整报告
-        report = f"""
-## 📊 ClarityAI 智能分析报告
-
-### 🌐 网页信息
-- **URL**: {url}
-- **标题**: {webpage_data['title']}
-- **分析时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-- **分析状态**: ✅ 完成
-
-### 🤖 智能体分析结果
-
-{result}
-
-### 📈 综合评估
-- **可信度**: 85%
-- **重要性**: 高
-- **时效性**: 高
-- **实用性**: 高
-
-### 🎯 总结
-此网页内容提供了关于{extract_main_topic(webpage_data['content'])}的全面视角，包含了主流观点、潜在偏见、专业术语解释和实用建议。建议将此分析作为决策参考，同时结合其他信息源进行综合判断。
-
----
-*报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
-*ClarityAI 智能分析系统*
-"""
-        
-        return {
-            'success': True,
-            'report': report,
-            'record_id': f"ANALYSIS_{int(time.time())}"
-        }
-        
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+        st.caption("暂无分析耗时数据")
+    st.caption(f"更新于 {datetime.now().strftime('%H:%M:%S')}")
 
 def login_page():
     st.markdown("""
@@ -547,6 +192,8 @@ def login_page():
                 st.rerun()
 
 def main_page():
+    startup_timings = load_engine()
+    
     st.markdown("""
     <div class="main-header">
         <h1>👤 ClarityAI - 智能内容分析</h1>
@@ -575,13 +222,40 @@ def main_page():
         include_bias = st.checkbox("🔍 偏见识别", value=True, help="识别潜在偏见和立场倾向")
         include_terms = st.checkbox("📚 术语解释", value=True, help="解释专业术语和概念")
         include_advice = st.checkbox("💡 决策建议", value=True, help="提供实用的决策建议")
+        st.caption("内容摘要始终生成；只生成选中的部分，全部取消即为最快的仅摘要模式")
+        long_document = st.checkbox("📖 长文档模式", value=False,
+                                    help="分析全文而不是前5000字（分块并行分析），适合长报告和白皮书")
         
         st.markdown("---")
         st.markdown("### 📊 系统信息")
-        st.info(f"当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        st.success("✅ 系统正常运行")
+        ops_panel()
+        startup_report(startup_timings)
     
     # 主要内容
+    tab_single, tab_batch, tab_feeds, tab_watch, tab_history = st.tabs(
+        ["🔍 单个分析", "📦 批量分析", "📡 订阅源", "👁️ 网页监控", "🗂️ 历史记录"]
+    )
+    
+    with tab_single:
+        single_analysis_panel(include_consensus, include_bias, include_terms, include_advice, long_document)
+    
+    with tab_batch:
+        batch_analysis_panel(include_consensus, include_bias, include_terms, include_advice, long_document)
+    
+    with tab_feeds:
+        feed_panel(include_consensus, include_bias, include_terms, include_advice)
+    
+    with tab_watch:
+        watch_panel(include_consensus, include_bias, include_terms, include_advice)
+    
+    with tab_history:
+        history_panel()
+
+def single_analysis_panel(include_consensus, include_bias, include_terms, include_advice, long_document=False):
+    """单个URL分析"""
+    from analysis_store import get_store
+    from job_queue import get_job_queue
+    
     col1, col2 = st.columns([3, 1])
     
     with col1:
@@ -594,52 +268,38 @@ def main_page():
             help="支持新闻、博客、技术文档等各类网页"
         )
         
+        # 已分析过的网页可以直接查看历史报告
+        if url.startswith(('http://', 'https://')):
+            previous = get_store().latest_for_url(url)
+            if previous:
+                analyzed_at = datetime.fromtimestamp(previous['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+                st.info(f"📁 该网页已于 {analyzed_at} 分析过（记录ID: {previous['id']}）")
+                if st.button("📄 查看历史报告", key="view_previous"):
+                    st.session_state.last_analysis_id = previous['id']
+        
         # 分析按钮
         if st.button("🔍 开始分析", type="primary", use_container_width=True):
             if url:
                 if not url.startswith(('http://', 'https://')):
                     st.error("❌ 请输入完整的URL，包括 http:// 或 https://")
                 else:
-                    # 显示分析进度
-                    with st.spinner("🔄 正在分析网页内容..."):
-                        # 创建进度条
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        # 更新进度
-                        progress_bar.progress(20)
-                        status_text.text("📡 正在连接网页...")
-                        time.sleep(0.5)
-                        
-                        progress_bar.progress(40)
-                        status_text.text("🌐 正在抓取网页内容...")
-                        time.sleep(0.5)
-                        
-                        progress_bar.progress(60)
-                        status_text.text("🤖 正在调用AI分析...")
-                        time.sleep(0.5)
-                        
-                        progress_bar.progress(80)
-                        status_text.text("📊 正在生成分析报告...")
-                        time.sleep(0.5)
-                        
-                        progress_bar.progress(100)
-                        status_text.text("✅ 分析完成！")
-                        
-                        # 执行AI分析
-                        result = analyze_content_with_ai(url, include_consensus, include_bias, include_terms, include_advice)
-                        
-                        if result['success']:
-                            st.session_state.last_analysis_id = result['record_id']
-                            st.success(f"✅ 分析完成！记录ID: {result['record_id']}")
-                            
-                            # 显示分析报告
-                            st.markdown("### 📊 分析报告")
-                            st.markdown(result['report'])
-                        else:
-                            st.error(f"❌ 分析失败: {result['error']}")
+                    # 分析在后台任务中执行，页面定时刷新任务进度
+                    st.session_state.active_job = get_job_queue().submit(
+                        url, include_consensus, include_bias, include_terms, include_advice,
+                        long_document=long_document,
+                    )
+                    st.session_state.finished_job = None
             else:
                 st.warning("⚠️ 请输入网页URL")
+        
+        if st.session_state.active_job:
+            job_progress(st.session_state.active_job)
+        
+        if st.session_state.finished_job:
+            job = get_job_queue().get(st.session_state.finished_job)
+            st.session_state.finished_job = None
+            if job is not None:
+                show_analysis_result(job.result)
     
     with col2:
         st.markdown("### 📋 使用指南")
@@ -663,8 +323,377 @@ def main_page():
         st.markdown("### 📊 最近分析")
         st.info(f"记录ID: {st.session_state.last_analysis_id}")
         
-        if st.button("🔄 重新分析", key="reanalyze"):
+        record = get_store().get(st.session_state.last_analysis_id)
+        if record:
+            with st.expander(f"📄 {record['title'] or record['url']}"):
+                st.markdown(record['report'])
+        
+        if record and st.button("🔄 重新分析", key="reanalyze"):
+            st.session_state.active_job = get_job_queue().submit(
+                record['url'], include_consensus, include_bias, include_terms, include_advice,
+                long_document=long_document,
+            )
+            st.session_state.finished_job = None
+            st.rerun()
+
+@st.fragment(run_every=0.5)
+def job_progress(job_id):
+    """后台分析任务的进度和流式输出；任务完成后刷新整个页面显示结果"""
+    from job_queue import get_job_queue
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.session_state.active_job = None
+        st.warning("⚠️ 分析任务已过期，请重新分析")
+        return
+    if job.done:
+        st.session_state.active_job = None
+        st.session_state.finished_job = job_id
+        st.rerun()
+    
+    position = STAGE_NAMES.index(job.stage) if job.stage else 0
+    st.progress(int(position * 100 / len(STAGE_NAMES)))
+    st.text(STAGE_LABELS[job.stage] if job.stage else "⏳ 排队等待中...")
+    if job.submitted > 1:
+        st.caption(f"👥 另有 {job.submitted - 1} 个相同的分析请求共用此任务")
+    if job.partial:
+        st.markdown(job.partial + " ▌")
+
+def show_analysis_result(result):
+    """显示一次分析的结果"""
+    if result['success']:
+        st.session_state.last_analysis_id = result['record_id']
+        st.success(f"✅ 分析完成！记录ID: {result['record_id']}")
+        if result['duplicate_of']:
+            st.caption(f"🔁 内容与已分析的网页高度相似，复用了记录 {result['duplicate_of']} 的分析")
+        elif result['cached']:
+            st.caption("⚡ 相同内容已分析过，报告来自缓存")
+        
+        # 显示分析报告
+        st.markdown("### 📊 分析报告")
+        st.markdown(result['report'])
+        
+        # 各阶段耗时
+        with st.expander("⏱️ 阶段耗时"):
+            st.table([
+                {'阶段': STAGE_TITLES.get(name, name), '耗时(ms)': t['wall_ms'], 'CPU(ms)': t['cpu_ms']}
+                for name, t in result['timings'].items()
+            ])
+    else:
+        st.error(f"❌ 分析失败: {result['error']}")
+
+def batch_analysis_panel(include_consensus, include_bias, include_terms, include_advice, long_document=False):
+    """批量URL分析"""
+    import batch
+    
+    st.markdown("### 📦 批量分析")
+    
+    url_text = st.text_area(
+        "🌐 每行输入一个网页链接",
+        height=150,
+        placeholder="https://example.com/news/1\nhttps://example.com/news/2"
+    )
+    uploaded = st.file_uploader("📄 或上传CSV文件（包含 url 列）", type=["csv"])
+    workers = st.slider("⚙️ 并发抓取数", min_value=1, max_value=32, value=batch.DEFAULT_WORKERS)
+    
+    if st.button("📦 开始批量分析", type="primary", use_container_width=True):
+        urls = batch.parse_url_list(url_text)
+        if uploaded is not None:
+            try:
+                urls = list(dict.fromkeys(urls + batch.read_url_csv(uploaded)))
+            except Exception as e:
+                st.error(f"❌ CSV读取失败: {str(e)}")
+        
+        if not urls:
+            st.warning("⚠️ 请输入或上传至少一个网页URL")
+        else:
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            table = st.empty()
+            results = [{'url': url, 'status': batch.STATUS_QUEUED} for url in urls]
+            finished = set()
+            last_refresh = 0.0
+            
+            # URL状态变化时刷新状态表（限制刷新频率，避免大批量时反复重绘）
+            for index, row in batch.iter_analyze_urls(
+                urls, workers=workers,
+                include_consensus=include_consensus, include_bias=include_bias,
+                include_terms=include_terms, include_advice=include_advice,
+                long_document=long_document
+            ):
+                results[index] = row
+                if row['status'] in (batch.STATUS_DONE, batch.STATUS_FAILED):
+                    finished.add(index)
+                if time.time() - last_refresh >= 0.3 or len(finished) == len(urls):
+                    last_refresh = time.time()
+                    progress_bar.progress(len(finished) / len(urls))
+                    status_text.text(f"已完成 {len(finished)}/{len(urls)}")
+                    table.dataframe(
+                        batch.results_to_dataframe(results).drop(columns=['report']),
+                        use_container_width=True
+                    )
+            
+            st.session_state.batch_results = results
+    
+    # 导出结果
+    if st.session_state.batch_results:
+        frame = batch.results_to_dataframe(st.session_state.batch_results)
+        done = int((frame['status'] == batch.STATUS_DONE).sum())
+        st.success(f"✅ 批量分析完成：成功 {done} 个，失败 {len(frame) - done} 个")
+        st.download_button(
+            "📥 导出结果 (CSV)",
+            frame.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f"clarityai_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv"
+        )
+
+def feed_panel(include_consensus, include_bias, include_terms, include_advice):
+    """订阅源：定时采集 RSS/Atom 和站点地图，只把新发现的网页提交分析"""
+    from analysis_engine import select_sections
+    from feed_ingest import BACKFILL, get_feed_store, get_ingestor
+    
+    store = get_feed_store()
+    st.markdown("### 📡 订阅源")
+    st.caption("支持 RSS/Atom 订阅源和 XML 站点地图；只分析新发现或更新过的条目，分析结果保存在历史记录中")
+    
+    intervals = {"5 分钟": 300, "15 分钟": 900, "1 小时": 3600, "6 小时": 6 * 3600}
+    col_url, col_interval, col_backfill = st.columns([3, 1, 1])
+    with col_url:
+        url = st.text_input("🌐 订阅源或站点地图地址", placeholder="https://example.com/feed.xml", key="feed_url")
+    with col_interval:
+        interval = st.selectbox("⏱️ 采集间隔", list(intervals), index=1)
+    with col_backfill:
+        backfill = st.number_input("首次分析条数", min_value=0, max_value=500, value=BACKFILL,
+                                   help="第一次采集时只分析最新的这几条，其余记为已读")
+    if st.button("➕ 添加订阅源"):
+        if not url.startswith(('http://', 'https://')):
+            st.error("❌ 请输入完整的URL，包括 http:// 或 https://")
+        else:
+            sections = select_sections(include_consensus, include_bias, include_terms, include_advice)
+            store.add(url.strip(), intervals[interval], sections, backfill=int(backfill))
+            get_ingestor().wake()
+            st.success("✅ 已添加订阅源，稍后完成第一次采集")
+    
+    status_labels = {
+        'pending': '⏳ 等待采集',
+        'not_modified': '✅ 未修改 (304)',
+        'unchanged': '✅ 没有新条目',
+        'discovered': '🆕 发现新条目',
+        'error': '❌ 采集失败',
+    }
+    kind_labels = {'rss': 'RSS', 'atom': 'Atom', 'sitemap': '站点地图', 'sitemap_index': '站点地图索引'}
+    
+    def when(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else ''
+    
+    feeds = store.list_feeds()
+    if not feeds:
+        st.info("暂无订阅源")
+        return
+    st.dataframe(
+        [
+            {
+                'ID': feed['id'],
+                '地址': feed['url'],
+                '类型': kind_labels.get(feed['kind'], ''),
+                '间隔(分钟)': int(feed['interval'] // 60),
+                '状态': status_labels.get(feed['status'], feed['status']),
+                '上次采集': when(feed['last_checked']),
+                '最新条目时间': when(feed['high_water']),
+                '已提交分析': feed['discovered'],
+            }
+            for feed in feeds
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    selected = st.selectbox("📌 查看订阅源", feeds, format_func=lambda feed: f"#{feed['id']} {feed['url']}")
+    if selected['error']:
+        st.caption(f"上次错误: {selected['error']}")
+    col_check, col_remove = st.columns(2)
+    with col_check:
+        if st.button("🔄 立即采集"):
+            store.check_now(selected['id'])
+            get_ingestor().wake()
+            st.success("✅ 已安排采集")
+    with col_remove:
+        if st.button("🗑️ 移除订阅源"):
+            store.remove(selected['id'])
+            st.rerun()
+    
+    items = store.recent_items(selected['id'])
+    if items:
+        st.dataframe(
+            [
+                {
+                    '标题': item['title'],
+                    'URL': item['url'],
+                    '发布/更新时间': when(item['updated']),
+                    '发现时间': when(item['discovered_at']),
+                    '已提交分析': '✅' if item['enqueued'] else '',
+                }
+                for item in items
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.caption("尚未采集到条目")
+
+def watch_panel(include_consensus, include_bias, include_terms, include_advice):
+    """网页监控：按间隔检查网页，内容变化时重新分析并记录结论的变化"""
+    from analysis_engine import SECTION_TITLES, select_sections
+    from watchlist import DEFAULT_INTERVAL, get_monitor, get_watch_store
+    
+    store = get_watch_store()
+    st.markdown("### 👁️ 网页监控")
+    st.caption("未变化的网页只发送一次条件请求；正文变化时才重新分析，报告部分使用侧边栏中选中的选项")
+    
+    intervals = {"15 分钟": 900, "1 小时": 3600, "6 小时": 6 * 3600, "1 天": 24 * 3600}
+    col_url, col_interval = st.columns([3, 1])
+    with col_url:
+        url = st.text_input("🌐 要监控的网页", placeholder="https://example.com", key="watch_url")
+    with col_interval:
+        default = next((name for name, seconds in intervals.items() if seconds == DEFAULT_INTERVAL), "1 小时")
+        interval = st.selectbox("⏱️ 检查间隔", list(intervals), index=list(intervals).index(default))
+    if st.button("➕ 添加监控"):
+        if not url.startswith(('http://', 'https://')):
+            st.error("❌ 请输入完整的URL，包括 http:// 或 https://")
+        else:
+            sections = select_sections(include_consensus, include_bias, include_terms, include_advice)
+            store.add(url.strip(), intervals[interval], sections)
+            get_monitor().wake()
+            st.success("✅ 已添加监控，稍后完成第一次检查")
+    
+    status_labels = {
+        'pending': '⏳ 等待检查',
+        'baseline': '📄 已建立基线',
+        'not_modified': '✅ 未修改 (304)',
+        'unchanged': '✅ 正文未变',
+        'changed': '🔔 内容已变化',
+        'error': '❌ 检查失败',
+    }
+    
+    def when(timestamp):
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else ''
+    
+    watches = store.list_watches()
+    if not watches:
+        st.info("暂无监控的网页")
+        return
+    st.dataframe(
+        [
+            {
+                'ID': watch['id'],
+                'URL': watch['url'],
+                '间隔(分钟)': int(watch['interval'] // 60),
+                '状态': status_labels.get(watch['status'], watch['status']),
+                '上次检查': when(watch['last_checked']),
+                '上次变化': when(watch['last_changed']),
+                '检查次数': watch['checks'],
+                '变化次数': watch['changes'],
+            }
+            for watch in watches
+        ],
+        hide_index=True,
+        use_container_width=True
+    )
+    
+    selected = st.selectbox("📌 查看监控", watches, format_func=lambda watch: f"#{watch['id']} {watch['url']}")
+    if selected['error']:
+        st.caption(f"上次错误: {selected['error']}")
+    col_check, col_remove = st.columns(2)
+    with col_check:
+        if st.button("🔍 立即检查"):
+            store.check_now(selected['id'])
+            get_monitor().wake()
+            st.success("✅ 已安排检查")
+    with col_remove:
+        if st.button("🗑️ 移除监控"):
+            store.remove(selected['id'])
+            st.rerun()
+    
+    changes = store.list_changes(selected['id'])
+    if changes:
+        st.dataframe(
+            [
+                {
+                    '发现时间': when(change['detected_at']),
+                    '结论变化的部分': '、'.join(SECTION_TITLES[name] for name in change['changed_sections']) or '无',
+                    '新增句子': change['added'],
+                    '删除句子': change['removed'],
+                    '记录ID': change['record_id'],
+                }
+                for change in changes
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        st.caption("尚未发现内容变化")
+    if selected['record_id']:
+        st.caption(f"最新分析记录: {selected['record_id']}（可在历史记录中查询）")
+
+def history_panel():
+    """历史分析记录"""
+    from analysis_store import get_store
+    
+    store = get_store()
+    st.markdown("### 🗂️ 历史记录")
+    
+    # 按记录ID查询
+    record_id = st.text_input("🔎 按记录ID查询", placeholder="ANALYSIS_...")
+    if record_id:
+        record = store.get(record_id.strip())
+        if record:
+            analyzed_at = datetime.fromtimestamp(record['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+            st.success(f"✅ {record['title'] or record['url']}（{analyzed_at}）")
+            st.markdown(record['report'])
+        else:
+            st.warning("⚠️ 未找到该记录")
+    
+    # 分页列表（游标保存在 session 中，翻页只查询当前页）
+    page_size = 20
+    cursors = st.session_state.history_cursors
+    rows = store.list_recent(limit=page_size, before=cursors[-1])
+    st.caption(f"共 {store.count()} 条记录，第 {len(cursors)} 页")
+    if rows:
+        st.dataframe(
+            [
+                {
+                    '记录ID': row['id'],
+                    '标题': row['title'],
+                    'URL': row['url'],
+                    '分析时间': datetime.fromtimestamp(row['created_at']).strftime('%Y-%m-%d %H:%M:%S'),
+                    '复用自': row['duplicate_of'] or '',
+                }
+                for row in rows
+            ],
+            use_container_width=True
+        )
+    else:
+        st.info("暂无分析记录")
+    
+    col_prev, col_next, col_export = st.columns(3)
+    with col_prev:
+        if st.button("⬅️ 上一页", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col_next:
+        if st.button("下一页 ➡️", disabled=len(rows) < page_size):
+            cursors.append((rows[-1]['created_at'], rows[-1]['id']))
             st.rerun()
+    with col_export:
+        if st.button("📥 准备导出"):
+            import pandas as pd
+            frames = [pd.DataFrame(page) for page in store.iter_pages(page_size=500)]
+            export = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            st.download_button(
+                "💾 下载全部记录 (CSV)",
+                export.to_csv(index=False).encode('utf-8-sig'),
+                file_name=f"clarityai_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv"
+            )
 
 def main():
     if not st.session_state.logged_in:
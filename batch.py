@@ -0,0 +1,126 @@
+"""ClarityAI 批量分析
+
+并发抓取一批 URL，抓取完成一个就分析一个，并实时回报每个 URL 的状态。
+既供界面的批量模式使用，也可以直接在 Python 中调用：
+
+    from batch import analyze_urls, results_to_dataframe
+    results = analyze_urls(urls, workers=16)
+    results_to_dataframe(results).to_csv('results.csv')
+"""
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from analysis_engine import analyze_webpage_data, scrape_webpage_simple
+from fetch_scheduler import interleave_by_host
+from instrumentation import StageTimer
+
+DEFAULT_WORKERS = 8
+
+# 每个 URL 的状态
+STATUS_QUEUED = '⏳ 排队中'
+STATUS_FETCHING = '📡 抓取中'
+STATUS_ANALYZING = '🤖 分析中'
+STATUS_DONE = '✅ 完成'
+STATUS_FAILED = '❌ 失败'
+
+# 导出时的列顺序
+RESULT_COLUMNS = ['url', 'status', 'title', 'record_id', 'duplicate_of', 'elapsed', 'error', 'report']
+
+
+def parse_url_list(text):
+    """从多行文本中解析 URL（每行一个，忽略空行、注释和重复项）"""
+    urls = []
+    for line in text.splitlines():
+        url = line.strip().strip(',')
+        if url and not url.startswith('#'):
+            urls.append(url)
+    return list(dict.fromkeys(urls))
+
+
+def read_url_csv(file):
+    """从 CSV 中读取 URL（优先使用 url 列，否则使用第一列）"""
+    import pandas as pd
+    frame = pd.read_csv(file)
+    column = next((c for c in frame.columns if str(c).strip().lower() == 'url'), frame.columns[0])
+    return parse_url_list('\n'.join(frame[column].dropna().astype(str)))
+
+
+def _fetch(index, url, timer, events, long_document=False):
+    events.put((index, time.perf_counter()))
+    return scrape_webpage_simple(url, timer=timer, long_document=long_document, polite=True)
+
+
+def iter_analyze_urls(urls, workers=DEFAULT_WORKERS, include_consensus=True, include_bias=True,
+                      include_terms=True, include_advice=True, long_document=False):
+    """并发抓取并逐个分析，每次状态变化产出 (序号, 当前结果)"""
+    results = [
+        {'url': url, 'status': STATUS_QUEUED, 'title': '', 'record_id': '', 'duplicate_of': '', 'elapsed': None,
+         'error': '', 'report': ''}
+        for url in urls
+    ]
+    for index, row in enumerate(results):
+        if not row['url'].startswith(('http://', 'https://')):
+            row.update(status=STATUS_FAILED, error='URL必须以 http:// 或 https:// 开头')
+            yield index, row
+
+    started = {}
+    timers = [StageTimer() for _ in results]
+    events = queue.Queue()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='clarity-fetch') as pool:
+        # 按主机交错提交：同一站点受限速排队时，其他站点的 URL 照常抓取
+        pending = {
+            pool.submit(_fetch, index, results[index]['url'], timers[index], events, long_document): index
+            for index in interleave_by_host(urls)
+            if results[index]['status'] == STATUS_QUEUED
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            # 抓取开始的通知
+            while True:
+                try:
+                    index, start = events.get_nowait()
+                except queue.Empty:
+                    break
+                started[index] = start
+                results[index]['status'] = STATUS_FETCHING
+                yield index, results[index]
+            # 抓取完成的立即分析
+            for future in done:
+                index = pending.pop(future)
+                row = results[index]
+                try:
+                    webpage_data = future.result()
+                except Exception as e:
+                    webpage_data = {'url': row['url'], 'title': '抓取失败', 'content': '', 'error': str(e)}
+                row['title'] = webpage_data['title']
+                if webpage_data.get('error'):
+                    row.update(status=STATUS_FAILED, error=webpage_data['error'])
+                else:
+                    row['status'] = STATUS_ANALYZING
+                    yield index, row
+                    result = analyze_webpage_data(webpage_data, include_consensus, include_bias,
+                                                  include_terms, include_advice, timer=timers[index])
+                    if result['success']:
+                        row.update(status=STATUS_DONE, record_id=result['record_id'], report=result['report'],
+                                   duplicate_of=result['duplicate_of'] or '')
+                    else:
+                        row.update(status=STATUS_FAILED, error=result['error'])
+                row['elapsed'] = round(time.perf_counter() - started.get(index, time.perf_counter()), 3)
+                yield index, row
+
+
+def analyze_urls(urls, workers=DEFAULT_WORKERS, on_update=None, **options):
+    """批量分析 URL，返回与输入顺序一致的结果列表"""
+    results = [None] * len(urls)
+    for index, row in iter_analyze_urls(urls, workers=workers, **options):
+        results[index] = row
+        if on_update is not None:
+            on_update(index, row)
+    return results
+
+
+def results_to_dataframe(results):
+    """把批量结果转换成 pandas DataFrame，便于导出"""
+    import pandas as pd
+    return pd.DataFrame(results, columns=RESULT_COLUMNS)
@@ -0,0 +1 @@
+"""ClarityAI 离线基准测试（本地桩网站 + 合成语料）"""
@@ -0,0 +1,116 @@
+"""基准测试语料
+
+按固定随机种子生成中英文 HTML 页面，覆盖不同大小和结构：
+新闻文章（导航 + 正文 + 页脚 + 评论）、扁平 div 布局、脚本/样式很多的页面、表格页面。
+"""
+import random
+
+ZH_WORDS = [
+    "技术", "经济", "研究", "数据", "专家", "报告", "调查", "最新", "发展", "创新", "市场", "企业",
+    "政策", "政府", "风险", "挑战", "机遇", "人工智能", "机器学习", "数据分析", "影响", "推动",
+    "我们", "认为", "表明", "显示", "社会", "环境", "教育", "文化", "增长", "下降", "支持", "质疑",
+    "客观", "平衡", "利益", "投资", "合作", "碳中和", "供应链", "芯片", "的", "了", "和", "在", "是",
+]
+EN_WORDS = [
+    "technology", "economy", "research", "data", "expert", "report", "survey", "latest", "growth",
+    "market", "company", "policy", "government", "risk", "challenge", "opportunity", "AI", "GDP",
+    "the", "of", "and", "to", "in", "is", "that", "for", "on", "with", "as", "analysts", "said",
+]
+NUMBERS = ["12%", "3.5%", "40万", "7亿", "85%", "2024", "1.2%", "300万"]
+
+# 页面大小（目标字节数）
+SIZES = {
+    'small': 8 * 1024,
+    'medium': 128 * 1024,
+    'large': 2 * 1024 * 1024,
+}
+LANGUAGES = ('zh', 'en')
+LAYOUTS = ('article', 'flat', 'script_heavy', 'table')
+
+
+def _sentence(rng, lang):
+    words = ZH_WORDS if lang == 'zh' else EN_WORDS
+    count = rng.randint(8, 30)
+    parts = [rng.choice(words) for _ in range(count)]
+    if rng.random() < 0.3:
+        parts.insert(rng.randrange(len(parts)), rng.choice(NUMBERS))
+    if lang == 'zh':
+        return ''.join(parts) + '。'
+    return ' '.join(parts).capitalize() + '.'
+
+
+def _paragraph(rng, lang):
+    return ' '.join(_sentence(rng, lang) for _ in range(rng.randint(2, 6)))
+
+
+def _nav(rng, lang):
+    label = '首页' if lang == 'zh' else 'Home'
+    links = ''.join(f'<li><a href="/s/{i}">{label} {i}</a></li>' for i in range(rng.randint(10, 40)))
+    return f'<nav class="site-nav"><ul>{links}</ul></nav>'
+
+
+def _footer(lang):
+    text = '版权所有 · 隐私政策 · 联系我们 · 本站使用Cookie' if lang == 'zh' else 'Copyright · Privacy · Contact · This site uses cookies'
+    return f'<footer class="site-footer"><p>{text}</p></footer>'
+
+
+def _script(rng):
+    body = ';'.join(f'var v{i}={rng.randint(0, 99999)}' for i in range(rng.randint(50, 400)))
+    return f'<script>{body}</script>'
+
+
+def _style(rng):
+    body = ''.join(f'.c{i}{{margin:{rng.randint(0, 20)}px;color:#{rng.randint(0, 0xffffff):06x}}}' for i in range(rng.randint(50, 300)))
+    return f'<style>{body}</style>'
+
+
+def generate_page(lang, size, layout, seed=0):
+    """生成一个 HTML 页面，返回 (标题, HTML 字节)"""
+    rng = random.Random(f'{lang}-{size}-{layout}-{seed}')
+    target = SIZES[size]
+    title = _sentence(rng, lang)[:40]
+    head = f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+    if layout == 'script_heavy':
+        head += ''.join(_style(rng) for _ in range(3))
+    head += '</head><body>'
+
+    body = []
+    length = len(head.encode('utf-8'))
+    if layout == 'article':
+        body.append(_nav(rng, lang))
+        body.append(f'<main><article><h1>{title}</h1>')
+    elif layout == 'table':
+        body.append('<table>')
+
+    while length < target:
+        if layout == 'table':
+            block = '<tr>' + ''.join(f'<td>{_sentence(rng, lang)}</td>' for _ in range(4)) + '</tr>'
+        elif layout == 'flat':
+            block = f'<div class="block"><span>{_paragraph(rng, lang)}</span></div>\n'
+        elif layout == 'script_heavy':
+            block = _script(rng) + f'<p>{_paragraph(rng, lang)}</p>'
+        else:
+            block = f'<p>{_paragraph(rng, lang)}</p>\n'
+        body.append(block)
+        length += len(block.encode('utf-8'))
+
+    if layout == 'article':
+        body.append('</article></main>')
+        comments = ''.join(f'<div class="comment">{_sentence(rng, lang)}</div>' for _ in range(20))
+        body.append(f'<section class="comments">{comments}</section>')
+        body.append(_footer(lang))
+    elif layout == 'table':
+        body.append('</table>')
+
+    html = head + ''.join(body) + '</body></html>'
+    return title, html.encode('utf-8')
+
+
+def build_corpus(sizes=tuple(SIZES), languages=LANGUAGES, layouts=LAYOUTS, seed=0):
+    """生成语料：{路径: (标题, HTML 字节)}"""
+    corpus = {}
+    for size in sizes:
+        for lang in languages:
+            for layout in layouts:
+                corpus[f'/{size}/{lang}/{layout}.html'] = generate_page(lang, size, layout, seed)
+    return corpus
@@ -0,0 +1,628 @@
+"""ClarityAI 并发压测
+
+模拟多个用户同时提交分析，逐级增加并发，测量每一级的吞吐量、延迟分位数、错误率和进程内存/CPU，
+用于估算单个实例能承受的并发量、发现扩展性退化：
+
+    python -m benchmarks.load                                     # 进程内分析引擎，并发 1,2,4,8,16
+    python -m benchmarks.load --target jobs --concurrency 4,16,64  # 界面使用的后台任务队列
+    python -m benchmarks.load --target api                        # 在本进程中启动 API 服务，通过 HTTP 压测
+    python -m benchmarks.load --target api --api-url http://127.0.0.1:8000   # 压测本机已启动的 API 服务
+    python -m benchmarks.load --save load                         # 保存为基线
+    python -m benchmarks.load --compare load                      # 与基线比较，吞吐下降或 p95 变慢超过阈值时返回非零退出码
+
+网页由本地桩网站提供：每个新请求是合成语料中某个页面的一个变体（正文各不相同，不命中缓存），
+页面大小按 --sizes 的比例抽取，响应延迟为 --delay 加 0 到 --jitter 之间的随机秒数。--repeat 为重复提交最近网址的比例
+（命中响应缓存，报告选项相同时命中报告缓存），--options 为报告选项组合及其比例。
+
+压测对象：
+    engine  analysis_engine.analyze_content_with_ai（一次分析的完整流程）
+    jobs    job_queue.JobQueue（界面提交的后台任务；延迟为提交到完成的时间，包含排队）
+    api     POST /analyze
+
+进程内压测时缓存和分析记录写到临时目录（缓存保持开启），不按主机限速（桩网站只有一个主机），
+关闭近似重复复用（合成页面彼此相似），不启动网页监控和订阅源采集。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+
+from benchmarks.corpus import SIZES, build_corpus  # noqa: E402
+from benchmarks.mock_llm import MockLLMServer  # noqa: E402
+from benchmarks.run import baseline_path, percentile  # noqa: E402
+from benchmarks.stub_server import StubSite  # noqa: E402
+
+import analysis_engine  # noqa: E402
+import analysis_store  # noqa: E402
+import feed_ingest  # noqa: E402
+import fetch_scheduler  # noqa: E402
+import http_cache  # noqa: E402
+import job_queue  # noqa: E402
+import llm_backend  # noqa: E402
+import report_cache  # noqa: E402
+import watchlist  # noqa: E402
+from metrics import ANALYSES, process_snapshot  # noqa: E402
+
+TARGETS = ('engine', 'jobs', 'api')
+DEFAULT_CONCURRENCY = '1,2,4,8,16'
+DEFAULT_SIZES = 'small:6,medium:3,large:1'
+DEFAULT_OPTIONS = 'all:3,summary:1,bias+terms:1'
+# 报告选项组合中可用的名称（summary 表示只输出内容摘要，long 表示长文档模式）
+OPTION_NAMES = ('consensus', 'bias', 'terms', 'advice', 'long')
+# 重复提交时从最近的这么多个网址中抽取
+RECENT_URLS = 200
+# 比较基线时允许的吞吐下降和 p95 变慢比例
+DEFAULT_THRESHOLD = 0.2
+# 吞吐增长低于此比例时认为已经饱和
+SATURATION_GAIN = 0.1
+
+
+def parse_weights(spec):
+    """解析 'a:3,b:1' 形式的比例，返回 [(名称, 权重)]（省略权重时为 1）"""
+    weights = []
+    for item in spec.split(','):
+        name, _, weight = item.strip().partition(':')
+        weights.append((name, float(weight) if weight else 1.0))
+    return weights
+
+
+def parse_options(name):
+    """把 'all'、'summary' 或 'bias+terms+long' 形式的组合转换为分析参数"""
+    if name == 'all':
+        names = {'consensus', 'bias', 'terms', 'advice'}
+    elif name == 'summary':
+        names = set()
+    else:
+        names = set(name.split('+'))
+        unknown = names - set(OPTION_NAMES)
+        if unknown:
+            raise ValueError(f"未知的报告选项: {'、'.join(sorted(unknown))}")
+    return {
+        'include_consensus': 'consensus' in names,
+        'include_bias': 'bias' in names,
+        'include_terms': 'terms' in names,
+        'include_advice': 'advice' in names,
+        'long_document': 'long' in names,
+    }
+
+
+class Workload:
+    """按比例生成请求：没有分析过的新页面，或最近网址的重复提交；报告选项按比例抽取"""
+
+    def __init__(self, site, sizes, repeat=0.3, options=(('all', 1.0),), seed=0):
+        # sizes: [(页面大小, 比例)]，同一大小的页面从桩网站语料中随机抽取
+        self.site = site
+        self.sizes = [size for size, _ in sizes]
+        self.size_weights = [weight for _, weight in sizes]
+        self.paths = {size: [path for path in site.pages if path.split('/')[1] == size] for size in self.sizes}
+        self.repeat = repeat
+        self.options = [parse_options(name) for name, _ in options]
+        self.option_weights = [weight for _, weight in options]
+        self.fresh = 0
+        self.repeated = 0
+        self._rng = random.Random(seed)
+        self._recent = deque(maxlen=RECENT_URLS)
+        self._lock = threading.Lock()
+
+    def next_request(self):
+        """返回 (网址, 分析参数)"""
+        with self._lock:
+            options = self._rng.choices(self.options, self.option_weights)[0]
+            if self._recent and self._rng.random() < self.repeat:
+                self.repeated += 1
+                return self._rng.choice(self._recent), options
+            size = self._rng.choices(self.sizes, self.size_weights)[0]
+            url = f'{self.site.url(self._rng.choice(self.paths[size]))}?v={self.fresh}'
+            self.fresh += 1
+            self._recent.append(url)
+            return url, options
+
+    def stats(self):
+        with self._lock:
+            return {'fresh': self.fresh, 'repeated': self.repeated}
+
+
+class EngineTarget:
+    """直接调用分析引擎"""
+
+    name = 'engine'
+
+    def request(self, url, options):
+        result = analysis_engine.analyze_content_with_ai(
+            url, options['include_consensus'], options['include_bias'], options['include_terms'],
+            options['include_advice'], long_document=options['long_document'],
+        )
+        return result['success'], result.get('error')
+
+    def snapshot(self):
+        snapshot = process_snapshot()
+        if snapshot is not None:
+            snapshot['analyses'] = {outcome: count for (outcome,), count in ANALYSES.values().items()}
+        return snapshot
+
+    def close(self):
+        pass
+
+
+class JobsTarget(EngineTarget):
+    """提交到后台任务队列并等待完成（与界面相同：相同的分析仍在进行时合并到同一个任务）"""
+
+    name = 'jobs'
+
+    def __init__(self, workers=job_queue.JOB_WORKERS, poll_interval=0.01):
+        self.queue = job_queue.JobQueue(workers=workers)
+        self.poll_interval = poll_interval
+
+    def request(self, url, options):
+        job = self.queue.get(self.queue.submit(url, **options))
+        while not job.done:
+            time.sleep(self.poll_interval)
+        return job.result['success'], job.result.get('error')
+
+    def close(self):
+        self.queue.shutdown(wait=False)
+
+
+class ApiTarget:
+    """通过 HTTP 调用 POST /analyze；内存和 CPU 从服务的 /metrics 读取"""
+
+    name = 'api'
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # 每个用户线程一个连接池
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request(self, url, options):
+        response = self._session().post(self.base_url + '/analyze', json=dict(options, url=url), timeout=self.timeout)
+        if response.status_code != 200:
+            return False, f'HTTP {response.status_code}'
+        data = response.json()
+        return data['success'], data.get('error')
+
+    def snapshot(self):
+        try:
+            text = requests.get(self.base_url + '/metrics', timeout=5).text
+        except requests.RequestException:
+            return None
+        values = {}
+        analyses = {}
+        for line in text.splitlines():
+            name, _, value = line.rpartition(' ')
+            if name in ('process_resident_memory_bytes', 'process_cpu_seconds_total', 'process_threads'):
+                values[name] = float(value)
+            elif name.startswith('clarity_analyses_total{outcome="'):
+                analyses[name.split('"')[1]] = int(float(value))
+        if 'process_resident_memory_bytes' not in values:
+            return None
+        return {
+            'rss_bytes': values['process_resident_memory_bytes'],
+            'cpu_seconds': values.get('process_cpu_seconds_total', 0.0),
+            'threads': int(values.get('process_threads', 0)),
+            'analyses': analyses,
+        }
+
+    def close(self):
+        pass
+
+
+class LocalApiServer:
+    """在后台线程中运行 API 服务（uvicorn），监听随机端口"""
+
+    def __init__(self, host='127.0.0.1'):
+        import uvicorn
+
+        import api
+        self.server = uvicorn.Server(uvicorn.Config(api.app, host=host, port=0, log_level='warning'))
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    def start(self, timeout=30):
+        self._thread = threading.Thread(target=self.server.run, name='load-api', daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError('API 服务启动失败')
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+
+
+def isolate_state(tmpdir, dedup=False, polite=False):
+    """缓存和分析记录写到临时目录（缓存保持开启，重复提交照常命中），不启动后台监控和订阅源采集"""
+    http_cache._cache = http_cache.HttpCache(directory=os.path.join(tmpdir, 'http'))
+    report_cache._cache = report_cache.ReportCache(disk_dir=os.path.join(tmpdir, 'reports'))
+    analysis_store._store = analysis_store.AnalysisStore(os.path.join(tmpdir, 'analyses.db'))
+    analysis_engine.DEDUP_ENABLED = dedup
+    robots = fetch_scheduler.RobotsCache(directory=None)
+    if polite:
+        fetch_scheduler._scheduler = fetch_scheduler.FetchScheduler(robots=robots)
+    else:
+        fetch_scheduler._scheduler = fetch_scheduler.FetchScheduler(rate=0, max_in_flight=0, robots=robots)
+    watchlist.WATCH_ENABLED = False
+    feed_ingest.FEEDS_ENABLED = False
+
+
+def latency_stats(records):
+    """records 为 [(完成时间, 耗时秒, 是否成功, 错误)]"""
+    latencies = [latency for _, latency, _, _ in records]
+    errors = [error for _, _, ok, error in records if not ok]
+    return {
+        'requests': len(records),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies, default=0.0) * 1000, 1),
+        'error_rate': round(len(errors) / len(records), 4) if records else 0.0,
+        'errors': Counter(str(error)[:120] for error in errors).most_common(3),
+    }
+
+
+class LoadRunner:
+    """固定数量的虚拟用户循环提交请求（收到结果后等待思考时间再提交下一个）"""
+
+    def __init__(self, target, workload, think=0.0, sample_interval=1.0, drain_timeout=120):
+        self.target = target
+        self.workload = workload
+        self.think = think
+        self.sample_interval = sample_interval
+        self.drain_timeout = drain_timeout
+        self.records = []
+        self.timeline = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last_snapshot = (self._started, target.snapshot())
+
+    def _user(self, stop, rng):
+        while not stop.is_set():
+            url, options = self.workload.next_request()
+            started = time.perf_counter()
+            try:
+                ok, error = self.target.request(url, options)
+            except Exception as e:
+                ok, error = False, f'{type(e).__name__}: {e}'
+            finished = time.perf_counter()
+            with self._lock:
+                self.records.append((finished, finished - started, ok, error))
+            if self.think:
+                stop.wait(rng.expovariate(1 / self.think))
+
+    def _sample(self, users, since):
+        # 记录一个时间线采样点：本区间完成的请求、p95、错误数、内存和 CPU 占用
+        now = time.perf_counter()
+        with self._lock:
+            recent = [record for record in self.records if record[0] > since]
+        snapshot = self.target.snapshot()
+        previous_time, previous = self._last_snapshot
+        self._last_snapshot = (now, snapshot)
+        cpu_percent = None
+        if snapshot and previous:
+            cpu_percent = round((snapshot['cpu_seconds'] - previous['cpu_seconds']) / (now - previous_time) * 100, 1)
+        self.timeline.append({
+            't': round(now - self._started, 2),
+            'users': users,
+            'completed': len(recent),
+            'errors': sum(1 for record in recent if not record[2]),
+            'p95_ms': round(percentile([record[1] for record in recent], 95) * 1000, 1),
+            'rss_mb': round(snapshot['rss_bytes'] / 1024 / 1024, 1) if snapshot else None,
+            'cpu_percent': cpu_percent,
+            'threads': snapshot['threads'] if snapshot else None,
+        })
+        return now
+
+    def run_step(self, users, duration, seed=0):
+        """以 users 个并发用户运行 duration 秒，返回这一级的统计
+
+        吞吐量只计窗口内完成的请求；延迟和错误率还包括窗口结束时仍在进行、随后完成的请求。
+        """
+        first_sample = len(self.timeline)
+        first_record = len(self.records)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._user, args=(stop, random.Random(f'{seed}-{users}-{index}')),
+                             name=f'load-user-{index}', daemon=True)
+            for index in range(users)
+        ]
+        started = time.perf_counter()
+        self._last_snapshot = (started, self.target.snapshot())
+        for thread in threads:
+            thread.start()
+        deadline = started + duration
+        last = started
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.sample_interval, remaining))
+            last = self._sample(users, last)
+        window_end = time.perf_counter()
+        stop.set()
+        drain_deadline = time.monotonic() + self.drain_timeout
+        for thread in threads:
+            thread.join(max(0.0, drain_deadline - time.monotonic()))
+        with self._lock:
+            records = self.records[first_record:]
+        step = {'users': users, 'duration_s': round(window_end - started, 2)}
+        step.update(latency_stats(records))
+        completed = sum(1 for record in records if record[0] <= window_end)
+        step['throughput_per_s'] = round(completed / (window_end - started), 2)
+        step['unfinished'] = sum(1 for thread in threads if thread.is_alive())
+        samples = [sample for sample in self.timeline[first_sample:] if sample['rss_mb'] is not None]
+        if samples:
+            step['rss_start_mb'] = samples[0]['rss_mb']
+            step['rss_end_mb'] = samples[-1]['rss_mb']
+            step['rss_max_mb'] = max(sample['rss_mb'] for sample in samples)
+        cpu = [sample['cpu_percent'] for sample in samples[1:] if sample['cpu_percent'] is not None]
+        if cpu:
+            step['cpu_percent'] = round(sum(cpu) / len(cpu), 1)
+        return step
+
+
+def summarize_steps(steps, slo_p95_ms=None, max_error_rate=0.01):
+    """找出吞吐最高的一级、吞吐不再随并发增长的一级，以及满足 p95 目标的最大并发"""
+    summary = {}
+    if not steps:
+        return summary
+    peak = max(steps, key=lambda step: step['throughput_per_s'])
+    summary['peak_users'] = peak['users']
+    summary['peak_throughput_per_s'] = peak['throughput_per_s']
+    for previous, step in zip(steps, steps[1:]):
+        if step['throughput_per_s'] < previous['throughput_per_s'] * (1 + SATURATION_GAIN):
+            summary['saturated_users'] = step['users']
+            break
+    if slo_p95_ms is not None:
+        passing = [step['users'] for step in steps
+                   if step['p95_ms'] <= slo_p95_ms and step['error_rate'] <= max_error_rate]
+        summary['slo_p95_ms'] = slo_p95_ms
+        summary['max_users_within_slo'] = max(passing, default=0)
+    return summary
+
+
+def analysis_outcomes(before, after):
+    """两次采样之间各分析结果（computed/cached/duplicate/failed）的次数"""
+    if not before or not after:
+        return {}
+    previous = before.get('analyses', {})
+    return {outcome: count - previous.get(outcome, 0) for outcome, count in after.get('analyses', {}).items()
+            if count > previous.get(outcome, 0)}
+
+
+def run_load(target='engine', concurrency=(1, 2, 4, 8, 16), duration=20.0, warmup=3.0, sizes=DEFAULT_SIZES, repeat=0.3, options=DEFAULT_OPTIONS, delay=0.05, jitter=0.05, think=0.0,
+             sample_interval=1.0, api_url=None, job_workers=job_queue.JOB_WORKERS, llm='rule',
+             llm_first_token=0.2, llm_token_delay=0.01, dedup=False, polite=False, slo_p95_ms=None, seed=0):
+    """运行压测，返回结果字典"""
+    size_weights = parse_weights(sizes)
+    option_weights = parse_weights(options)
+    unknown = [name for name, _ in size_weights if name not in SIZES]
+    if unknown:
+        raise ValueError(f"未知的页面大小: {'、'.join(unknown)}")
+    corpus = build_corpus(tuple(size for size, _ in size_weights), seed=seed)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'target': target,
+            'api_url': api_url,
+            'llm': llm,
+            'pages': len(corpus),
+            'corpus_bytes': sum(len(body) for _, body in corpus.values()),
+            'sizes': sizes,
+            'repeat': repeat,
+            'options': options,
+            'delay': delay,
+            'jitter': jitter,
+            'think': think,
+            'duration': duration,
+            'seed': seed,
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmpdir, StubSite(corpus, delay=delay, jitter=jitter, vary=True) as site:
+        isolate_state(tmpdir, dedup=dedup, polite=polite)
+        mock = server = None
+        try:
+            if llm == 'rule':
+                llm_backend._backend = llm_backend.get_rule_backend()
+            elif llm == 'mock':
+                mock = MockLLMServer(first_token_delay=llm_first_token, token_delay=llm_token_delay).start()
+                llm_backend._backend = llm_backend.OpenAICompatibleBackend(base_url=mock.base_url)
+            if target == 'engine':
+                load_target = EngineTarget()
+            elif target == 'jobs':
+                load_target = JobsTarget(workers=job_workers)
+            elif api_url:
+                load_target = ApiTarget(api_url)
+            else:
+                server = LocalApiServer().start()
+                load_target = ApiTarget(server.base_url)
+            try:
+                workload = Workload(site, size_weights, repeat, option_weights, seed)
+                runner = LoadRunner(load_target, workload, think=think, sample_interval=sample_interval)
+                if warmup:
+                    # 预热：加载关键词自动机、建立连接，结果不计入统计
+                    runner.run_step(1, warmup, seed)
+                    runner.timeline.clear()
+                before = load_target.snapshot()
+                results['steps'] = [runner.run_step(users, duration, seed) for users in concurrency]
+                results['timeline'] = runner.timeline
+                results['workload'] = workload.stats()
+                results['analyses'] = analysis_outcomes(before, load_target.snapshot())
+                results['stub_requests'] = site.requests
+            finally:
+                load_target.close()
+        finally:
+            if server is not None:
+                server.stop()
+            if mock is not None:
+                mock.stop()
+    results['summary'] = summarize_steps(results['steps'], slo_p95_ms)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """按并发数与基线比较吞吐和 p95，返回 [(并发, 指标, 基线, 当前, 变化比例, 是否退化)]"""
+    base_steps = {step['users']: step for step in baseline.get('steps', [])}
+    rows = []
+    for step in results['steps']:
+        base = base_steps.get(step['users'])
+        if not base:
+            continue
+        if base['throughput_per_s']:
+            change = step['throughput_per_s'] / base['throughput_per_s'] - 1
+            rows.append((step['users'], 'throughput', base['throughput_per_s'], step['throughput_per_s'], change,
+                         change < -threshold))
+        if base['p95_ms']:
+            change = step['p95_ms'] / base['p95_ms'] - 1
+            rows.append((step['users'], 'p95_ms', base['p95_ms'], step['p95_ms'], change, change > threshold))
+    return rows
+
+
+def print_results(results, timeline=False):
+    meta = results['meta']
+    workload = results['workload']
+    print(f"压测对象：{meta['target']}；语料 {meta['pages']} 个页面，共 {meta['corpus_bytes'] / 1024 / 1024:.1f} MB；"
+          f"重复比例 {meta['repeat']:.0%}；桩网站延迟 {meta['delay'] * 1000:.0f}+{meta['jitter'] * 1000:.0f} ms")
+    print(f"请求：新页面 {workload['fresh']}，重复提交 {workload['repeated']}")
+    if results['analyses']:
+        print('分析结果：' + '，'.join(f'{outcome} {count}' for outcome, count in sorted(results['analyses'].items())))
+    print(f"\n{'并发':>6}{'请求数':>8}{'次/秒':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'错误率':>8}"
+          f"{'RSS(MB)':>10}{'CPU%':>8}")
+    summary = results['summary']
+    for step in results['steps']:
+        rss = f"{step['rss_max_mb']:.0f}" if 'rss_max_mb' in step else '-'
+        cpu = f"{step['cpu_percent']:.0f}" if 'cpu_percent' in step else '-'
+        flag = '  ← 饱和' if step['users'] == summary.get('saturated_users') else ''
+        print(f"{step['users']:>6}{step['requests']:>8}{step['throughput_per_s']:>9.1f}{step['p50_ms']:>10.1f}"
+              f"{step['p95_ms']:>10.1f}{step['p99_ms']:>10.1f}{step['error_rate']:>8.1%}{rss:>10}{cpu:>8}{flag}")
+        for error, count in step['errors']:
+            print(f"{'':>6}  {count} 次：{error}")
+        if step['unfinished']:
+            print(f"{'':>6}  {step['unfinished']} 个用户的请求在等待时间内没有完成")
+    print(f"\n最高吞吐：{summary['peak_throughput_per_s']:.1f} 次/秒（并发 {summary['peak_users']}）")
+    if 'saturated_users' in summary:
+        print(f"并发增加到 {summary['saturated_users']} 时吞吐增长不足 {SATURATION_GAIN:.0%}")
+    if 'slo_p95_ms' in summary:
+        print(f"p95 不超过 {summary['slo_p95_ms']:.0f} ms 且错误率不超过 1% 的最大并发：{summary['max_users_within_slo']}")
+    if timeline:
+        print(f"\n{'时间(秒)':>10}{'并发':>6}{'完成':>6}{'错误':>6}{'p95(ms)':>10}{'RSS(MB)':>10}{'CPU%':>8}{'线程':>6}")
+        for sample in results['timeline']:
+            rss = f"{sample['rss_mb']:.0f}" if sample['rss_mb'] is not None else '-'
+            cpu = f"{sample['cpu_percent']:.0f}" if sample['cpu_percent'] is not None else '-'
+            threads = sample['threads'] if sample['threads'] is not None else '-'
+            print(f"{sample['t']:>10.1f}{sample['users']:>6}{sample['completed']:>6}{sample['errors']:>6}"
+                  f"{sample['p95_ms']:>10.1f}{rss:>10}{cpu:>8}{threads:>6}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n与基线比较（吞吐下降或 p95 变慢超过 {threshold:.0%} 视为退化）")
+    for users, metric, base, current, change, regressed in rows:
+        flag = '  ← 退化' if regressed else ''
+        print(f"{users:>6}  {metric:<12}{base:>12.1f}{current:>12.1f}{change:>+10.1%}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClarityAI 并发压测')
+    parser.add_argument('--target', choices=TARGETS, default='engine', help='压测对象')
+    parser.add_argument('--api-url', help='压测本机已启动的 API 服务（不指定时在本进程中启动）')
+    parser.add_argument('--concurrency', default=DEFAULT_CONCURRENCY, help='逐级增加的并发用户数，逗号分隔')
+    parser.add_argument('--duration', type=float, default=20, help='每一级的持续时间（秒）')
+    parser.add_argument('--warmup', type=float, default=3, help='预热时间（秒），不计入统计')
+    parser.add_argument('--think', type=float, default=0, help='用户两次提交之间的平均思考时间（秒）')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='页面大小及比例，如 small:6,medium:3,large:1')
+    parser.add_argument('--repeat', type=float, default=0.3, help='重复提交最近网址的比例')
+    parser.add_argument('--options', default=DEFAULT_OPTIONS,
+                        help='报告选项组合及比例：all、summary 或 consensus/bias/terms/advice/long 用 + 连接')
+    parser.add_argument('--delay', type=float, default=0.05, help='桩网站固定响应延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.05, help='桩网站随机附加延迟的上限（秒）')
+    parser.add_argument('--job-workers', type=int, default=job_queue.JOB_WORKERS, help='jobs 压测的工作线程数')
+    parser.add_argument('--llm', choices=('rule', 'mock', 'env'), default='rule',
+                        help='分析后端：规则分析、本地模拟模型服务或按环境变量配置（进程内压测有效）')
+    parser.add_argument('--llm-first-token', type=float, default=0.2, help='模拟模型服务的首字延迟（秒）')
+    parser.add_argument('--llm-token-delay', type=float, default=0.01, help='模拟模型服务的逐字延迟（秒）')
+    parser.add_argument('--dedup', action='store_true', help='开启近似重复复用')
+    parser.add_argument('--polite', action='store_true', help='按主机限速（默认关闭，桩网站只有一个主机）')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='时间线采样间隔（秒）')
+    parser.add_argument('--slo-p95', type=float, help='p95 目标（毫秒），报告满足目标的最大并发')
+    parser.add_argument('--seed', type=int, default=0, help='语料和请求序列的随机种子')
+    parser.add_argument('--timeline', action='store_true', help='打印时间线（吞吐、p95、内存和 CPU 随时间的变化）')
+    parser.add_argument('--save', metavar='NAME', help='把结果保存为基线')
+    parser.add_argument('--compare', metavar='NAME', help='与已保存的基线比较')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许的吞吐下降和 p95 变慢比例')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args(argv)
+
+    results = run_load(
+        target=args.target,
+        concurrency=[int(users) for users in args.concurrency.split(',')],
+        duration=args.duration,
+        warmup=args.warmup,
+        sizes=args.sizes,
+        repeat=args.repeat,
+        options=args.options,
+        delay=args.delay,
+        jitter=args.jitter,
+        think=args.think,
+        sample_interval=args.sample_interval,
+        api_url=args.api_url,
+        job_workers=args.job_workers,
+        llm=args.llm,
+        llm_first_token=args.llm_first_token,
+        llm_token_delay=args.llm_token_delay,
+        dedup=args.dedup,
+        polite=args.polite,
+        slo_p95_ms=args.slo_p95,
+        seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results, timeline=args.timeline)
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存：{path}")
+
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[5] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""本地模拟模型服务
+
+实现 OpenAI 兼容的 /v1/chat/completions 流式接口，按设定的首字延迟和逐字延迟输出，
+用于在没有真实模型服务时测试 llm_backend：
+
+    python -m benchmarks.mock_llm --port 9000
+    CLARITY_LLM_BASE_URL=http://127.0.0.1:9000/v1 streamlit run app_cloud.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+from benchmarks.stub_server import _QuietServer
+
+_TITLE = re.compile(r'网页标题：(.*)')
+_SECTIONS = re.compile(r'本次只需输出以下部分：(.*)。')
+
+
+def mock_reply(prompt):
+    """根据提示词生成固定格式的模拟分析"""
+    title = _TITLE.search(prompt)
+    sections = _SECTIONS.search(prompt)
+    names = sections.group(1).split('、') if sections else ['内容摘要员']
+    parts = []
+    for name in names:
+        parts.append(f"## {name}分析\n\n"
+                     f"- 针对《{title.group(1).strip() if title else '未知标题'}》的{name}观点（模拟模型输出）\n"
+                     f"- 这是一段用于测试流式输出的示例文本。\n")
+    return '\n'.join(parts)
+
+
+class MockLLMServer:
+    """模拟模型服务（可用作上下文管理器）"""
+
+    def __init__(self, host='127.0.0.1', port=0, first_token_delay=0.2, token_delay=0.01, chunk_chars=4,
+                 fail_status=None):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.chunk_chars = chunk_chars
+        self.fail_status = fail_status
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = _QuietServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                with mock._lock:
+                    mock.requests += 1
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path.rstrip('/') != '/v1/chat/completions' or mock.fail_status:
+                    self.send_response(mock.fail_status or 404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                prompt = payload['messages'][-1]['content']
+                reply = mock_reply(prompt)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                time.sleep(mock.first_token_delay)
+                try:
+                    for start in range(0, len(reply), mock.chunk_chars):
+                        delta = {'choices': [{'index': 0, 'delta': {'content': reply[start:start + mock.chunk_chars]}}]}
+                        self._send_event(json.dumps(delta, ensure_ascii=False))
+                        time.sleep(mock.token_delay)
+                    self._send_event('[DONE]')
+                    self.wfile.write(b'0\r\n\r\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def _send_event(self, data):
+                body = f'data: {data}\n\n'.encode('utf-8')
+                self.wfile.write(f'{len(body):x}\r\n'.encode('ascii') + body + b'\r\n')
+                self.wfile.flush()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='mock-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClarityAI 模拟模型服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help='首段输出前的延迟（秒）')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='每段输出之间的延迟（秒）')
+    args = parser.parse_args(argv)
+    server = MockLLMServer(args.host, args.port, args.first_token_delay, args.token_delay)
+    print(f"模拟模型服务：{server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
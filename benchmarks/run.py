@@ -0,0 +1,274 @@
+"""ClarityAI 离线基准测试
+
+用本地桩网站和合成语料测量各阶段及端到端性能，不访问外网，结果可重复：
+
+    python -m benchmarks.run                      # 运行并打印结果
+    python -m benchmarks.run --save baseline      # 保存为基线 benchmarks/baselines/baseline.json
+    python -m benchmarks.run --compare baseline   # 与基线比较，p50 变慢超过阈值时返回非零退出码
+
+测量的阶段：
+    fetch    网络抓取（http_client.http_fetch，绕过响应缓存）
+    parse    HTML 文本提取（html_extract.extract_main_content）
+    analyze  规则分析（analysis_engine.generate_ai_analysis，关键词扫描缓存每次清空）
+    e2e      端到端分析（analysis_engine.analyze_content_with_ai，响应缓存、报告缓存和近似重复复用关闭），
+             并从流水线自身的计时中汇总 connect/download/parse/features/render 各阶段
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import LANGUAGES, LAYOUTS, SIZES, build_corpus  # noqa: E402
+from benchmarks.stub_server import StubSite  # noqa: E402
+
+import analysis_engine  # noqa: E402
+import analysis_store  # noqa: E402
+import fetch_scheduler  # noqa: E402
+import http_cache  # noqa: E402
+import keyword_engine  # noqa: E402
+import report_cache  # noqa: E402
+from html_extract import extract_main_content  # noqa: E402
+from http_client import MAX_FETCH_BYTES, http_fetch  # noqa: E402
+from instrumentation import STAGE_NAMES  # noqa: E402
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+STAGES = ('fetch', 'parse', 'analyze', 'e2e')
+# analyze 阶段生成报告的全部部分
+SECTIONS = tuple(name for name, _ in analysis_engine.REPORT_SECTIONS)
+# 比较基线时 p50 允许变慢的比例
+DEFAULT_THRESHOLD = 0.2
+
+
+def percentile(values, pct):
+    """最近秩百分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.4999)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples, total_bytes):
+    """samples 为每次调用的耗时（秒）"""
+    elapsed = sum(samples)
+    return {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'mean_ms': round(elapsed / len(samples) * 1000, 3),
+        'throughput_per_s': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'mb_per_s': round(total_bytes / elapsed / 1024 / 1024, 2) if elapsed else 0.0,
+    }
+
+
+def isolate_caches(tmpdir):
+    """关闭响应缓存、报告缓存和近似重复复用，分析记录写入内存数据库，保证每次测量都走完整路径"""
+    http_cache._cache = http_cache.HttpCache(directory=os.path.join(tmpdir, 'http'), ttl=0, max_bytes=0)
+    report_cache._cache = report_cache.ReportCache(memory_entries=0, disk_dir=None)
+    analysis_store._store = analysis_store.AnalysisStore(':memory:')
+    analysis_engine.DEDUP_ENABLED = False
+    # 桩网站只有一个主机，不按主机限速；robots.txt 只缓存在内存中
+    fetch_scheduler._scheduler = fetch_scheduler.FetchScheduler(
+        rate=0, max_in_flight=0, robots=fetch_scheduler.RobotsCache(directory=None))
+
+
+class Bench:
+    """对语料中每个页面执行各阶段，收集耗时和内存峰值"""
+
+    def __init__(self, site, corpus, iterations):
+        self.site = site
+        self.corpus = corpus
+        self.iterations = iterations
+        self.bodies = {}
+        self.texts = {}
+
+    def _fetch(self, path):
+        response = http_fetch(self.site.url(path), timeout=10, max_bytes=MAX_FETCH_BYTES)
+        return response.content
+
+    def _parse(self, path):
+        return extract_main_content(self.bodies[path], 'text/html; charset=utf-8',
+                                    limit=analysis_engine.CONTENT_LIMIT).text
+
+    def _analyze(self, path):
+        keyword_engine.scan_document.cache_clear()
+        return analysis_engine.generate_ai_analysis('', self.texts[path], SECTIONS)
+
+    def _e2e(self, path):
+        keyword_engine.scan_document.cache_clear()
+        result = analysis_engine.analyze_content_with_ai(self.site.url(path), True, True, True, True)
+        if not result['success']:
+            raise RuntimeError(f"{path}: {result['error']}")
+        return result
+
+    def _input_bytes(self, stage, path):
+        if stage == 'analyze':
+            return len(self.texts[path].encode('utf-8'))
+        return len(self.corpus[path][1])
+
+    def prepare(self):
+        for path in self.corpus:
+            self.bodies[path] = self._fetch(path)
+            self.texts[path] = self._parse(path)
+
+    def run_stage(self, stage):
+        """返回 {分组: 统计}，分组为 all 和各页面大小；e2e 另外返回流水线阶段明细"""
+        call = getattr(self, '_' + stage)
+        samples = {}
+        breakdown = {}
+        for _ in range(self.iterations):
+            for path in self.corpus:
+                size = path.split('/')[1]
+                started = time.perf_counter()
+                result = call(path)
+                elapsed = time.perf_counter() - started
+                for group in ('all', size):
+                    samples.setdefault(group, []).append((elapsed, self._input_bytes(stage, path)))
+                if stage == 'e2e':
+                    for name, values in result['timings'].items():
+                        breakdown.setdefault(name, []).append(values['wall_ms'] / 1000)
+
+        stats = {
+            group: summarize([s for s, _ in items], sum(b for _, b in items))
+            for group, items in samples.items()
+        }
+        stats['all']['peak_kb'] = self.peak_memory(call)
+        if breakdown:
+            stats['all']['stages'] = {
+                name: {
+                    'p50_ms': round(percentile(values, 50) * 1000, 3),
+                    'p99_ms': round(percentile(values, 99) * 1000, 3),
+                }
+                for name, values in breakdown.items()
+            }
+        return stats
+
+    def peak_memory(self, call):
+        """单独跑一遍并用 tracemalloc 记录单个页面的最大内存峰值（KB）"""
+        peak = 0
+        tracemalloc.start()
+        try:
+            for path in self.corpus:
+                tracemalloc.reset_peak()
+                call(path)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        return round(peak / 1024, 1)
+
+
+def run_benchmarks(stages=STAGES, sizes=tuple(SIZES), languages=LANGUAGES, layouts=LAYOUTS,
+                   iterations=5, seed=0):
+    """运行基准测试，返回结果字典"""
+    corpus = build_corpus(sizes, languages, layouts, seed)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'seed': seed,
+            'pages': len(corpus),
+            'corpus_bytes': sum(len(body) for _, body in corpus.values()),
+        },
+        'stages': {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir, StubSite(corpus) as site:
+        isolate_caches(tmpdir)
+        bench = Bench(site, corpus, iterations)
+        bench.prepare()
+        # 预热：加载关键词自动机、建立连接
+        for path in corpus:
+            bench._analyze(path)
+        for stage in stages:
+            for group, stats in bench.run_stage(stage).items():
+                results['stages'][f'{stage}/{group}'] = stats
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线比较 p50，返回 [(项目, 基线, 当前, 变化比例, 是否退化)]"""
+    rows = []
+    for key, stats in results['stages'].items():
+        base = baseline['stages'].get(key)
+        if not base or not base['p50_ms']:
+            continue
+        change = stats['p50_ms'] / base['p50_ms'] - 1
+        rows.append((key, base['p50_ms'], stats['p50_ms'], change, change > threshold))
+    return rows
+
+
+def print_results(results):
+    print(f"语料：{results['meta']['pages']} 个页面，共 {results['meta']['corpus_bytes'] / 1024 / 1024:.1f} MB；"
+          f"每个页面 {results['meta']['iterations']} 次")
+    print(f"{'项目':<20}{'次数':>6}{'p50(ms)':>12}{'p99(ms)':>12}{'次/秒':>10}{'MB/秒':>10}{'峰值(KB)':>12}")
+    for key, stats in results['stages'].items():
+        peak = stats.get('peak_kb', '')
+        print(f"{key:<20}{stats['count']:>6}{stats['p50_ms']:>12.3f}{stats['p99_ms']:>12.3f}"
+              f"{stats['throughput_per_s']:>10.1f}{stats['mb_per_s']:>10.2f}{peak:>12}")
+        for name, values in stats.get('stages', {}).items():
+            if name in STAGE_NAMES or name == 'total':
+                print(f"  {name:<18}{'':>6}{values['p50_ms']:>12.3f}{values['p99_ms']:>12.3f}")
+
+
+def print_comparison(rows, threshold):
+    print(f"\n与基线比较（p50 变慢超过 {threshold:.0%} 视为退化）")
+    for key, base, current, change, regressed in rows:
+        flag = '  ← 退化' if regressed else ''
+        print(f"{key:<20}{base:>12.3f}{current:>12.3f}{change:>+10.1%}{flag}")
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClarityAI 离线基准测试')
+    parser.add_argument('--stages', default=','.join(STAGES), help='要测量的阶段，逗号分隔')
+    parser.add_argument('--sizes', default=','.join(SIZES), help='页面大小，逗号分隔')
+    parser.add_argument('--iterations', type=int, default=5, help='每个页面的测量次数')
+    parser.add_argument('--seed', type=int, default=0, help='语料随机种子')
+    parser.add_argument('--save', metavar='NAME', help='把结果保存为基线')
+    parser.add_argument('--compare', metavar='NAME', help='与已保存的基线比较')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许的 p50 变慢比例')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        stages=tuple(args.stages.split(',')),
+        sizes=tuple(args.sizes.split(',')),
+        iterations=args.iterations,
+        seed=args.seed,
+    )
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存：{path}")
+
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""本地桩网站
+
+在后台线程中用 ThreadingHTTPServer 提供基准测试语料，不访问外网。
+支持 ETag/If-None-Match 条件请求，可设置固定响应延迟和随机抖动。
+开启 vary 后，带查询字符串的请求返回页面的变体：正文开头插入查询字符串，结构和大小不变，
+但正文各不相同（不命中报告缓存），压测时用来模拟大量没有分析过的网页。
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 变体标记插入在第一个正文元素中；页面没有正文元素时插入在 <body> 之后
+_FIRST_TEXT = re.compile(rb'<(?:p|td|span)>')
+
+
+def vary_page(body, tag):
+    """在正文开头插入标记，返回页面的变体"""
+    match = _FIRST_TEXT.search(body)
+    if match:
+        at = match.end()
+    else:
+        at = body.find(b'<body>') + len(b'<body>') if b'<body>' in body else 0
+    return body[:at] + f'[{tag}] '.encode('utf-8') + body[at:]
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端读够字节预算后会提前断开连接，这是正常情况
+        pass
+
+
+class StubSite:
+    """本地桩网站（可用作上下文管理器）"""
+
+    def __init__(self, pages, host='127.0.0.1', port=0, delay=0.0, jitter=0.0, vary=False):
+        # pages: {路径: (标题, HTML 字节)}；每个响应延迟 delay 加 0 到 jitter 之间的随机秒数
+        self.pages = pages
+        self.delay = delay
+        self.jitter = jitter
+        self.vary = vary
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._etags = {path: '"%s"' % hashlib.md5(body).hexdigest() for path, (_, body) in pages.items()}
+        self.server = _QuietServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, path):
+        return self.base_url + path
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和正文分两次写出，关闭 Nagle 避免与延迟确认叠加出 40ms 的停顿
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                if site.delay or site.jitter:
+                    time.sleep(site.delay + random.uniform(0, site.jitter))
+                path, _, query = self.path.partition('?')
+                page = site.pages.get(path)
+                if page is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = site._etags[path]
+                body = page[1]
+                if site.vary and query:
+                    body = vary_page(body, query)
+                    etag = '%s-%s"' % (etag[:-1], hashlib.md5(query.encode('utf-8')).hexdigest()[:8])
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='stub-site', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
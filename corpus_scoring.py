@@ -0,0 +1,163 @@
+"""ClarityAI 语料批量评分
+
+离线研究时对成千上万篇已抓取的文档（DataFrame：url、title、content）计算特征表：
+每篇文档一行，每个分析器的输出一列，另有正文长度、关键数据条数、各关键词表的命中次数。
+每篇文档只用共享的关键词自动机扫描一遍，内容相同的文档只扫描一次，
+不渲染 Markdown、不经过报告缓存和分析记录；命中次数汇总为矩阵后按列向量化统计。
+大部分分析器的输出只取决于某个关键词表中出现了哪些关键词（或正文长度），
+按命中矩阵去重后每种取值只执行一次分析器，只有需要原文的字段逐篇计算。
+
+    import pandas as pd
+    from corpus_scoring import export_features, score_documents
+    features = score_documents(pd.read_csv('pages.csv'))
+    export_features(features, 'features.parquet')
+
+也可以在命令行中运行：
+
+    python -m corpus_scoring pages.csv features.csv
+"""
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from analysis_engine import REPORT_SECTIONS, SECTION_ANALYZERS
+from keyword_engine import KEYWORD_GROUPS, NUMBER_PATTERN, HitTable, get_matcher
+
+# 原样带入特征表的文档列
+ID_COLUMNS = ('url', 'title')
+# 文档数少于此值时直接在当前进程中扫描，不值得分发到进程池
+PARALLEL_MIN_DOCUMENTS = 64
+# 每次分发给工作进程的文档数
+SCAN_CHUNKSIZE = 32
+
+
+def scan_text(text):
+    """扫描一篇文档，返回 (关键词位置, 关键数据)"""
+    return get_matcher().scan(text), NUMBER_PATTERN.findall(text)
+
+
+def _scan_all(texts, workers):
+    if workers > 1 and len(texts) >= PARALLEL_MIN_DOCUMENTS:
+        try:
+            # 进程数由 workers 决定，评分结束后关闭
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                return list(pool.map(scan_text, texts, chunksize=SCAN_CHUNKSIZE))
+        except BrokenProcessPool:
+            # 工作进程异常退出时改为在当前进程中扫描
+            pass
+    return [scan_text(text) for text in texts]
+
+
+def _by_pattern(analyze, patterns, make_hits):
+    """patterns 每行为一篇文档的分析器输入；相同的行只执行一次分析器，返回每篇文档的输出"""
+    unique, inverse = np.unique(patterns, axis=0, return_inverse=True)
+    values = np.empty(len(unique), dtype=object)
+    values[:] = [analyze('', make_hits(row)) for row in unique]
+    return values[inverse.reshape(-1)]
+
+
+def _section_signals(fields, texts, scans, counts, position):
+    """计算各分析器字段的输出（每个内容不同的文档一个值）"""
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    signals = {}
+    for field, analyze in fields.items():
+        # 分析器在定义处声明的依赖（见 analysis_engine.depends_on_group 等），未声明的需要原文
+        dependency = getattr(analyze, 'depends_on', ('text',))
+        if dependency[0] == 'constant':
+            values = np.empty(len(texts), dtype=object)
+            values[:] = [analyze('', HitTable('', {}, [], 0))] * len(texts)
+        elif dependency[0] == 'group':
+            words = KEYWORD_GROUPS[dependency[1]]
+            presence = counts[:, [position[keyword] for keyword in words]] > 0
+            values = _by_pattern(analyze, presence, lambda row, words=words: HitTable(
+                '', {keyword: (0,) for keyword, present in zip(words, row) if present}, [], 0))
+        elif dependency[0] == 'length':
+            values = _by_pattern(analyze, lengths[:, None], lambda row: HitTable('', {}, [], int(row[0])))
+        else:
+            values = np.empty(len(texts), dtype=object)
+            values[:] = [analyze(text, HitTable(text, offsets, numbers))
+                         for text, (offsets, numbers) in zip(texts, scans)]
+        signals[field] = values
+    return signals
+
+
+def score_documents(frame, sections=None, keyword_columns=False, workers=1):
+    """计算特征表（与 frame 同索引）
+
+    sections 为要计算的报告部分（默认全部）；keyword_columns 为 True 时
+    每个关键词的命中次数单独成列（列名 kw_<关键词>）；workers 大于 1 时用 workers 个进程并行扫描。
+    """
+    wanted = [name for name, _ in REPORT_SECTIONS if sections is None or name in sections]
+    contents = frame['content'].fillna('').astype(str)
+    # 内容相同的文档只扫描和分析一次，结果按 codes 展开回每一行
+    codes, texts = pd.factorize(contents)
+    texts = list(texts)
+    scans = _scan_all(texts, workers)
+
+    keywords = get_matcher().keywords
+    position = {keyword: index for index, keyword in enumerate(keywords)}
+    counts = np.zeros((len(texts), len(keywords)), dtype=np.int32)
+    number_counts = np.zeros(len(texts), dtype=np.int32)
+    for row, (offsets, numbers) in enumerate(scans):
+        for keyword, positions in offsets.items():
+            counts[row, position[keyword]] = len(positions)
+        number_counts[row] = len(numbers)
+    fields = {field: analyze for name in wanted for field, analyze in SECTION_ANALYZERS[name].items()}
+    signals = _section_signals(fields, texts, scans, counts, position)
+
+    columns = {column: frame[column].to_numpy() for column in ID_COLUMNS if column in frame}
+    columns['length'] = contents.str.len().to_numpy()
+    columns['numbers'] = number_counts[codes]
+    for group, words in KEYWORD_GROUPS.items():
+        group_counts = counts[:, [position[keyword] for keyword in words]]
+        columns[f'{group}_hits'] = group_counts.sum(axis=1)[codes]
+        columns[f'{group}_found'] = np.count_nonzero(group_counts, axis=1)[codes]
+    if keyword_columns:
+        for keyword, index in position.items():
+            columns[f'kw_{keyword}'] = counts[codes, index]
+    for field, values in signals.items():
+        columns[field] = values[codes]
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def export_features(features, path):
+    """导出特征表：.parquet 后缀导出为 Parquet（需要安装 pyarrow），其他后缀导出为 CSV"""
+    path = str(path)
+    if path.endswith('.parquet'):
+        features.to_parquet(path, index=False)
+    else:
+        features.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def read_documents(path):
+    """读取文档表（CSV 或 Parquet，需包含 content 列）"""
+    path = str(path)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClarityAI 语料批量评分')
+    parser.add_argument('source', help='文档表（CSV 或 Parquet，包含 url、title、content 列）')
+    parser.add_argument('output', help='特征表输出路径（.parquet 或 .csv）')
+    parser.add_argument('--sections', help='要计算的报告部分，逗号分隔（默认全部）')
+    parser.add_argument('--keywords', action='store_true', help='每个关键词的命中次数单独成列')
+    parser.add_argument('--workers', type=int, default=1, help='并行扫描的进程数')
+    args = parser.parse_args(argv)
+
+    frame = read_documents(args.source)
+    sections = tuple(args.sections.split(',')) if args.sections else None
+    features = score_documents(frame, sections=sections, keyword_columns=args.keywords, workers=args.workers)
+    print(f"已评分 {len(features)} 篇文档，特征表已导出：{export_features(features, args.output)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""ClarityAI 磁盘缓存
+
+按字节预算做 LRU 淘汰的键值缓存：值存为 .bin 文件，元数据存为 .json 文件，
+文件修改时间记录最近访问时间，进程重启后可以恢复访问顺序。
+"""
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class DiskCache:
+    """按字节预算 LRU 淘汰的磁盘缓存（线程安全）"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None  # key -> 字节数，按访问顺序排列
+        self._total = 0
+
+    def _paths(self, key):
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, key + '.bin'), os.path.join(folder, key + '.json')
+
+    def _load_index(self):
+        # 首次使用时扫描目录，按最近访问时间恢复 LRU 顺序
+        if self._index is not None:
+            return
+        entries = []
+        if os.path.isdir(self.directory):
+            for folder, _, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith('.bin'):
+                        continue
+                    path = os.path.join(folder, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._index.values())
+
+    def get(self, key):
+        """读取缓存，返回 (值, 元数据)；不存在时返回 None"""
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+            value_path, meta_path = self._paths(key)
+            try:
+                with open(value_path, 'rb') as f:
+                    value = f.read()
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                os.utime(value_path)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return value, meta
+
+    def set(self, key, value, meta=None):
+        """写入缓存并按字节预算淘汰最久未访问的条目"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._load_index()
+            value_path, meta_path = self._paths(key)
+            os.makedirs(os.path.dirname(value_path), exist_ok=True)
+            self._write(meta_path, json.dumps(meta or {}, ensure_ascii=False).encode('utf-8'))
+            self._write(value_path, value)
+            self._total += len(value) - self._index.pop(key, 0)
+            self._index[key] = len(value)
+            self._evict()
+
+    def update_meta(self, key, meta):
+        """只更新元数据（例如重新验证后刷新时间戳）"""
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                return
+            value_path, meta_path = self._paths(key)
+            self._write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+            self._index.move_to_end(key)
+            try:
+                os.utime(value_path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        with self._lock:
+            self._load_index()
+            self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            return {
+                'entries': len(self._index),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _write(self, path, data):
+        # 先写临时文件再替换，避免并发读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _drop(self, key):
+        self._total -= self._index.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            oldest = next(iter(self._index))
+            self._drop(oldest)
+
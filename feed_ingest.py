@@ -0,0 +1,498 @@
+"""ClarityAI 订阅源采集
+
+登记 RSS/Atom 订阅源或 XML 站点地图（含站点地图索引、.xml.gz），后台线程按间隔检查，
+把新发现的网页提交到后台分析任务（抓取 → 分析），不必逐个手动输入网址：
+
+- 订阅源本身用 ETag/Last-Modified 做条件请求，304 时不解析；
+- 边下载边增量解析（gzip 边下载边解压），每个条目解析完就从树上移除，几万条的站点地图也只占用很少的内存；
+- 每个订阅源记录见过的条目（GUID/链接）及其更新时间（lastmod）作为高水位，
+  只有没见过的条目、或更新时间晚于上次记录的条目才会提交分析，旧条目不会重复处理；
+- 站点地图索引只重新读取 lastmod 有变化的子站点地图；
+- 第一次采集只提交最新的几条（CLARITY_FEED_BACKFILL），其余只记录为已见过。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from analysis_store import DB_PATH
+from fetch_scheduler import get_scheduler
+from http_cache import normalize_url
+from metrics import FETCHES, REGISTRY
+from watchlist import ERROR, MIN_INTERVAL, NOT_MODIFIED, UNCHANGED, USER_AGENT, Poller
+
+# 采集配置（可通过环境变量调整）
+FEEDS_ENABLED = os.environ.get('CLARITY_FEEDS', '1') not in ('0', 'false', 'no', '')
+FEED_WORKERS = int(os.environ.get('CLARITY_FEED_WORKERS', 4))
+DEFAULT_INTERVAL = float(os.environ.get('CLARITY_FEED_DEFAULT_INTERVAL', 900))
+# 第一次采集时提交分析的最新条目数
+BACKFILL = int(os.environ.get('CLARITY_FEED_BACKFILL', 20))
+MAX_FEED_BYTES = int(os.environ.get('CLARITY_FEED_MAX_BYTES', 50 * 1024 * 1024))
+# 站点地图索引每次最多读取的子站点地图数
+MAX_SITEMAPS = int(os.environ.get('CLARITY_FEED_MAX_SITEMAPS', 50))
+FEED_TIMEOUT = 30
+# 每次查询已见条目的条目数
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feeds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    normalized_url TEXT NOT NULL UNIQUE,
+    interval REAL NOT NULL,
+    sections TEXT NOT NULL DEFAULT '[]',
+    backfill INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    next_check REAL NOT NULL,
+    last_checked REAL,
+    kind TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    high_water REAL,
+    checks INTEGER NOT NULL DEFAULT 0,
+    discovered INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_feeds_due ON feeds (next_check);
+CREATE TABLE IF NOT EXISTS feed_items (
+    feed_id INTEGER NOT NULL,
+    item_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    updated REAL,
+    discovered_at REAL NOT NULL,
+    enqueued INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (feed_id, item_key)
+);
+CREATE INDEX IF NOT EXISTS idx_feed_items_recent ON feed_items (feed_id, discovered_at DESC);
+"""
+
+# 检查结果（另有 NOT_MODIFIED、UNCHANGED、ERROR）
+DISCOVERED = 'discovered'
+# 检查后可以更新的列
+CHECK_FIELDS = ('kind', 'etag', 'last_modified', 'high_water')
+
+# 订阅源根元素 -> 类型
+FEED_KINDS = {'rss': 'rss', 'RDF': 'rss', 'feed': 'atom', 'urlset': 'sitemap', 'sitemapindex': 'sitemap_index'}
+# 各类型的条目元素
+ENTRY_TAGS = {'rss': 'item', 'atom': 'entry', 'sitemap': 'url', 'sitemap_index': 'sitemap'}
+
+
+def _local(tag):
+    # 去掉命名空间：{http://www.sitemaps.org/schemas/sitemap/0.9}url -> url
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def parse_time(value):
+    """RFC 822（RSS）或 ISO 8601（Atom、站点地图）时间转为时间戳，无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class FeedEntry:
+    """订阅源中的一个条目；kind 为 sitemap 时是站点地图索引中的子站点地图"""
+
+    __slots__ = ('kind', 'key', 'url', 'title', 'updated')
+
+    def __init__(self, kind, key, url, title='', updated=None):
+        self.kind = kind
+        self.key = key
+        self.url = url
+        self.title = title
+        self.updated = updated
+
+
+def _entry(elem):
+    name = _local(elem.tag)
+    texts = {}
+    link = None
+    for child in elem:
+        child_name = _local(child.tag)
+        if child_name == 'link' and child.get('href'):
+            # Atom 的链接在 href 属性中，优先取 rel="alternate"（或没有 rel）的链接
+            if link is None or child.get('rel', 'alternate') == 'alternate':
+                link = child.get('href')
+        elif child.text and child.text.strip():
+            texts.setdefault(child_name, child.text.strip())
+    if name in ('url', 'sitemap'):
+        url = texts.get('loc')
+        key = url
+        updated = texts.get('lastmod')
+    else:
+        url = link or texts.get('link')
+        key = texts.get('guid') or texts.get('id') or url
+        updated = texts.get('updated') or texts.get('pubDate') or texts.get('published') or texts.get('date')
+    if not url or not url.startswith(('http://', 'https://')):
+        return None
+    return FeedEntry('sitemap' if name == 'sitemap' else 'page', key, url, texts.get('title', ''),
+                     parse_time(updated))
+
+
+class EntryParser:
+    """增量解析订阅源或站点地图：依次传入下载到的数据块，返回其中已解析完的条目；
+    gzip 压缩的站点地图边传入边解压。kind 为根元素确定的订阅源类型"""
+
+    def __init__(self):
+        self.kind = None
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack = []
+        self._head = b''
+        self._inflate = None  # 收到前两个字节后确定：解压器，或 False 表示未压缩
+
+    def feed(self, chunk):
+        """传入一块数据，返回其中已解析完的条目列表"""
+        if self._inflate is None:
+            self._head += chunk
+            if len(self._head) < 2:
+                return []
+            chunk, self._head = self._head, b''
+            self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+        self._parser.feed(self._inflate.decompress(chunk) if self._inflate else chunk)
+        return list(self._read())
+
+    def close(self):
+        """数据传完后调用，返回剩余的条目；文档不完整时抛出 ET.ParseError"""
+        if self._head:
+            self._parser.feed(self._head)
+        elif self._inflate:
+            self._parser.feed(self._inflate.flush())
+        self._parser.close()
+        return list(self._read())
+
+    def _read(self):
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self.kind is None:
+                    self.kind = FEED_KINDS.get(_local(elem.tag))
+                    if self.kind is None:
+                        raise ValueError(f'不是 RSS/Atom 订阅源或站点地图: <{_local(elem.tag)}>')
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            if _local(elem.tag) == ENTRY_TAGS[self.kind] and self._stack:
+                entry = _entry(elem)
+                # 解析完的条目从树上移除，内存占用不随条目数增长
+                self._stack[-1].remove(elem)
+                if entry is not None:
+                    yield entry
+
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class FeedStore:
+    """订阅源列表和已见条目（线程安全）"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+
+    def add(self, url, interval=DEFAULT_INTERVAL, sections=(), backfill=BACKFILL):
+        """登记订阅源（已登记时更新间隔、报告部分和回填条数），返回订阅源ID；登记后尽快做第一次采集"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO feeds (url, normalized_url, interval, sections, backfill, created_at, next_check) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (normalized_url) DO UPDATE SET '
+                'url = excluded.url, interval = excluded.interval, sections = excluded.sections, '
+                'backfill = excluded.backfill',
+                (url, normalize_url(url), max(MIN_INTERVAL, interval), json.dumps(list(sections)), max(0, backfill),
+                 now, now),
+            )
+            return self._conn.execute(
+                'SELECT id FROM feeds WHERE normalized_url = ?', (normalize_url(url),)
+            ).fetchone()[0]
+
+    def remove(self, feed_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM feed_items WHERE feed_id = ?', (feed_id,))
+            return self._conn.execute('DELETE FROM feeds WHERE id = ?', (feed_id,)).rowcount > 0
+
+    def get(self, feed_id):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM feeds WHERE id = ?', (feed_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list_feeds(self):
+        """全部订阅源（按登记时间倒序）"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM feeds ORDER BY created_at DESC').fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def claim_due(self, now, limit):
+        """抢占到期的订阅源：把下次检查时间推后一个间隔，返回抢占成功的订阅源"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT * FROM feeds WHERE next_check <= ? ORDER BY next_check LIMIT ?', (now, limit)
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                updated = self._conn.execute(
+                    'UPDATE feeds SET next_check = ? WHERE id = ? AND next_check <= ?',
+                    (now + row['interval'], row['id'], now),
+                ).rowcount
+                if updated:
+                    claimed.append(_row_to_dict(row))
+        return claimed
+
+    def next_due(self):
+        with self._lock:
+            return self._conn.execute('SELECT MIN(next_check) FROM feeds').fetchone()[0]
+
+    def check_now(self, feed_id):
+        with self._lock, self._conn:
+            return self._conn.execute('UPDATE feeds SET next_check = 0 WHERE id = ?', (feed_id,)).rowcount > 0
+
+    def record_check(self, feed_id, status, error=None, retry_after=None, discovered=0, **fields):
+        """记录一次采集的结果；fields 为 CHECK_FIELDS 中需要更新的列，discovered 为本次提交分析的条目数"""
+        now = time.time()
+        assignments = ['status = ?', 'error = ?', 'last_checked = ?', 'checks = checks + 1',
+                       'discovered = discovered + ?']
+        values = [status, error, now, discovered]
+        if retry_after is not None:
+            assignments.append('next_check = MIN(next_check, ?)')
+            values.append(now + retry_after)
+        for name in CHECK_FIELDS:
+            if name in fields:
+                assignments.append(f'{name} = ?')
+                values.append(fields[name])
+        with self._lock, self._conn:
+            self._conn.execute(f'UPDATE feeds SET {", ".join(assignments)} WHERE id = ?', values + [feed_id])
+
+    def seen(self, feed_id, keys):
+        """已见过的条目：{条目键: 记录的更新时间}"""
+        placeholders = ', '.join('?' * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT item_key, updated FROM feed_items WHERE feed_id = ? AND item_key IN ({placeholders})',
+                [feed_id, *keys],
+            ).fetchall()
+        return {row['item_key']: row['updated'] for row in rows}
+
+    def has_items(self, feed_id):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM feed_items WHERE feed_id = ? LIMIT 1', (feed_id,)).fetchone() \
+                is not None
+
+    def record_items(self, feed_id, entries, enqueued=()):
+        """记录见过的条目（更新时间取较新的一次）；enqueued 为本次提交分析的条目键"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO feed_items (feed_id, item_key, url, title, updated, discovered_at, enqueued) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (feed_id, item_key) DO UPDATE SET '
+                'url = excluded.url, title = excluded.title, updated = excluded.updated, '
+                'discovered_at = excluded.discovered_at, enqueued = excluded.enqueued',
+                [(feed_id, entry.key, entry.url, entry.title, entry.updated, now, int(entry.key in enqueued))
+                 for entry in entries],
+            )
+
+    def recent_items(self, feed_id, limit=50):
+        """最近发现的条目（按发现时间倒序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT item_key, url, title, updated, discovered_at, enqueued FROM feed_items WHERE feed_id = ? '
+                'ORDER BY discovered_at DESC LIMIT ?',
+                (feed_id, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def _row_to_dict(row):
+    feed = dict(row)
+    feed['sections'] = json.loads(feed['sections'])
+    return feed
+
+
+def _fetch(url, headers, on_entry):
+    # 边下载边解析，每个条目交给 on_entry，正文不在内存中保留；返回响应和订阅源类型
+    headers = dict(headers, **{'User-Agent': USER_AGENT})
+    parser = EntryParser()
+
+    def parse(step, *args):
+        try:
+            for entry in step(*args):
+                on_entry(entry)
+        except (ET.ParseError, ValueError) as e:
+            raise RuntimeError(f'订阅源解析失败: {e}')
+
+    response = get_scheduler().fetch(url, headers=headers, timeout=FEED_TIMEOUT, max_bytes=MAX_FEED_BYTES,
+                                     sink=lambda chunk: parse(parser.feed, chunk))
+    if response.status_code != 304:
+        parse(parser.close)
+    return response, parser.kind
+
+
+def _new_entries(store, feed_id, entries):
+    # 没见过的条目，以及更新时间晚于上次记录的条目
+    for batch in _batched(entries, LOOKUP_BATCH):
+        seen = store.seen(feed_id, list({entry.key for entry in batch}))
+        for entry in batch:
+            if entry.key not in seen:
+                yield entry
+            elif entry.updated is not None and (seen[entry.key] is None or entry.updated > seen[entry.key]):
+                yield entry
+
+
+def enqueue_analysis(url, sections):
+    """把网页提交到后台分析任务（与界面共用任务队列，相同的网页不会同时分析两次）"""
+    from job_queue import get_job_queue
+    return get_job_queue().submit(url, 'consensus' in sections, 'bias' in sections, 'terms' in sections,
+                                  'advice' in sections, polite=True)
+
+
+def ingest_feed(store, feed, enqueue=enqueue_analysis):
+    """采集一个订阅源，返回检查结果（NOT_MODIFIED/UNCHANGED/DISCOVERED）；失败时抛出异常"""
+    headers = {}
+    if feed['checks']:
+        if feed['etag']:
+            headers['If-None-Match'] = feed['etag']
+        if feed['last_modified']:
+            headers['If-Modified-Since'] = feed['last_modified']
+    found = {}
+    sitemaps = []
+
+    def collect(entry):
+        if entry.kind == 'sitemap':
+            sitemaps.append(entry)
+        else:
+            found.setdefault(entry.key, entry)
+
+    response, kind = _fetch(feed['url'], headers, collect)
+    if response.status_code == 304:
+        FETCHES.inc(outcome='not_modified')
+        store.record_check(feed['id'], NOT_MODIFIED)
+        return NOT_MODIFIED
+    FETCHES.inc(outcome='ok')
+
+    first_run = not store.has_items(feed['id'])
+    new = list(_new_entries(store, feed['id'], found.values()))
+
+    # 站点地图索引：只读取新出现或 lastmod 有变化的子站点地图，读取成功后才记录为已见过
+    read_sitemaps = []
+    for sitemap in list(_new_entries(store, feed['id'], sitemaps))[:MAX_SITEMAPS]:
+        child_entries = {}
+        try:
+            _fetch(sitemap.url, {},
+                   lambda entry: child_entries.setdefault(entry.key, entry) if entry.kind == 'page' else None)
+        except Exception:
+            continue
+        read_sitemaps.append(sitemap)
+        new.extend(entry for entry in _new_entries(store, feed['id'], child_entries.values())
+                   if entry.key not in found)
+        found.update(child_entries)
+
+    # 第一次采集只提交最新的几条（有时间的按时间倒序，没有时间的按文档顺序排在后面）
+    if first_run:
+        ranked = sorted(range(len(new)), key=lambda index: (new[index].updated is None, -(new[index].updated or 0),
+                                                            index))
+        to_enqueue = [new[index] for index in ranked[:feed['backfill']]]
+    else:
+        to_enqueue = new
+    enqueued = set()
+    try:
+        for entry in to_enqueue:
+            enqueue(entry.url, feed['sections'])
+            enqueued.add(entry.key)
+    finally:
+        # 提交成功后才记录为已见过：提交失败的条目（以及包含它们的子站点地图）下次采集时重试
+        failed = {entry.key for entry in to_enqueue} - enqueued
+        store.record_items(feed['id'], [entry for entry in new if entry.key not in failed]
+                           + ([] if failed else read_sitemaps), enqueued)
+
+    times = [entry.updated for entry in found.values() if entry.updated is not None]
+    high_water = max([feed['high_water'] or 0.0] + times) or None
+    status = DISCOVERED if to_enqueue else UNCHANGED
+    # 订阅源类型只在解析出根元素时更新
+    fields = {'kind': kind} if kind is not None else {}
+    store.record_check(feed['id'], status, discovered=len(to_enqueue), high_water=high_water,
+                       etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'), **fields)
+    return status
+
+
+class FeedIngestor(Poller):
+    """后台采集到期的订阅源"""
+
+    RESULTS = (NOT_MODIFIED, UNCHANGED, DISCOVERED)
+    thread_name = 'clarity-feed'
+
+    def __init__(self, store=None, workers=FEED_WORKERS, enqueue=enqueue_analysis):
+        super().__init__(store if store is not None else get_feed_store(), workers)
+        self.enqueue = enqueue
+
+    def process(self, feed):
+        return ingest_feed(self.store, feed, self.enqueue)
+
+
+_store = None
+_ingestor = None
+_lock = threading.Lock()
+
+
+def get_feed_store():
+    """进程内共享的订阅源列表"""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = FeedStore()
+    return _store
+
+
+def get_ingestor():
+    """进程内共享的采集线程（需调用 start() 启动）"""
+    global _ingestor
+    if _ingestor is None:
+        store = get_feed_store()
+        with _lock:
+            if _ingestor is None:
+                _ingestor = FeedIngestor(store)
+    return _ingestor
+
+
+def start_ingestor():
+    """按配置启动后台采集（CLARITY_FEEDS=0 时不启动），返回采集线程或 None"""
+    return get_ingestor().start() if FEEDS_ENABLED else None
+
+
+@REGISTRY.collector
+def _feed_metrics():
+    if _ingestor is None:
+        return []
+    stats = _ingestor.stats()
+    return [
+        ('clarity_feed_checks_total', 'counter', '订阅源采集次数（按结果）',
+         [((('result', result),), stats[result]) for result in FeedIngestor.RESULTS + (ERROR,)]),
+    ]
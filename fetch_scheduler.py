@@ -0,0 +1,380 @@
+"""ClarityAI 抓取调度
+
+批量抓取时按主机限速，避免集中请求同一个站点而被限流或封禁：
+每个主机一个令牌桶和同时请求数上限，遵守 robots.txt（含 Crawl-delay），
+收到 429/503 时按 Retry-After 暂停整个主机，暂停结束后再重试。
+robots.txt 解析结果缓存在内存中，原文缓存在磁盘上，进程重启后不必重新下载。
+
+吞吐量来自把请求分散到多个主机：批量任务按主机交错提交（interleave_by_host），
+同一主机的请求排队时，其他主机的请求不受影响。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from disk_cache import DiskCache
+from http_client import MAX_FETCH_BYTES, http_fetch
+from metrics import REGISTRY
+
+# 调度配置（可通过环境变量调整）
+HOST_RATE = float(os.environ.get('CLARITY_HOST_RATE', 2))
+HOST_BURST = int(os.environ.get('CLARITY_HOST_BURST', 4))
+HOST_MAX_IN_FLIGHT = int(os.environ.get('CLARITY_HOST_MAX_IN_FLIGHT', 2))
+THROTTLE_RETRIES = int(os.environ.get('CLARITY_THROTTLE_RETRIES', 2))
+# Retry-After 超过此秒数时不再等待，直接报告失败
+MAX_RETRY_AFTER = float(os.environ.get('CLARITY_MAX_RETRY_AFTER', 60))
+RESPECT_ROBOTS = os.environ.get('CLARITY_RESPECT_ROBOTS', '1') not in ('0', 'false', 'no', '')
+ROBOTS_USER_AGENT = os.environ.get('CLARITY_ROBOTS_USER_AGENT', 'ClarityAI')
+ROBOTS_CACHE_DIR = os.environ.get(
+    'CLARITY_ROBOTS_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'robots'),
+)
+ROBOTS_TTL = float(os.environ.get('CLARITY_ROBOTS_TTL', 24 * 3600))
+# robots.txt 下载失败（超时、5xx）时暂按允许处理，过一段时间再重新下载
+ROBOTS_ERROR_TTL = 300
+ROBOTS_MAX_BYTES = 512 * 1024
+ROBOTS_CACHE_MAX_BYTES = 16 * 1024 * 1024
+ROBOTS_TIMEOUT = 5
+# 内存中最多保留的站点数
+MAX_TRACKED_HOSTS = 4096
+# 未给出 Retry-After 时的暂停秒数（每次重试加倍）
+DEFAULT_PAUSE = 2.0
+# Crawl-delay 的上限（秒）
+MAX_CRAWL_DELAY = 30.0
+
+
+class RobotsDisallowed(Exception):
+    """robots.txt 不允许抓取该页面"""
+
+
+class HostThrottled(Exception):
+    """站点要求暂停的时间过长（Retry-After 超过上限），放弃本次抓取"""
+
+
+def fetch_error_type(error):
+    """抓取异常的分类（用作指标标签）"""
+    if isinstance(error, RobotsDisallowed):
+        return 'robots'
+    if isinstance(error, HostThrottled):
+        return 'throttled'
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return f'http_{error.response.status_code // 100}xx'
+    # 连接超时同时是 ConnectionError，先判断超时
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.RequestException):
+        return 'request'
+    return 'other'
+
+
+def host_key(url):
+    """限速的单位：小写的主机名加端口"""
+    return urlsplit(url).netloc.lower()
+
+
+def interleave_by_host(urls):
+    """按主机轮流排列，返回 URL 的下标顺序（同一主机的 URL 不会扎堆提交）"""
+    queues = defaultdict(list)
+    for index, url in enumerate(urls):
+        queues[host_key(url)].append(index)
+    order = []
+    for round_ in range(max((len(indexes) for indexes in queues.values()), default=0)):
+        order.extend(indexes[round_] for indexes in queues.values() if round_ < len(indexes))
+    return order
+
+
+def parse_retry_after(value):
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    """单个主机的令牌桶、同时请求数和暂停状态"""
+
+    def __init__(self, rate, burst, max_in_flight):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_in_flight = max_in_flight
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.configured = False
+        self._condition = threading.Condition()
+
+    def apply_crawl_delay(self, delay):
+        """robots.txt 的 Crawl-delay：降低速率，不允许突发"""
+        with self._condition:
+            self.configured = True
+            if delay:
+                delay_rate = 1.0 / min(float(delay), MAX_CRAWL_DELAY)
+                self.rate = min(self.rate, delay_rate) if self.rate > 0 else delay_rate
+                self.burst = 1
+                self.tokens = min(self.tokens, 1.0)
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """等待令牌和空闲名额，返回等待的秒数"""
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.paused_until - now > MAX_RETRY_AFTER:
+                    raise HostThrottled(f'站点要求暂停 {self.paused_until - now:.0f} 秒')
+                if self.paused_until > now:
+                    timeout = self.paused_until - now
+                elif self.max_in_flight and self.in_flight >= self.max_in_flight:
+                    # 等待其他请求结束时唤醒
+                    timeout = None
+                elif self.rate > 0 and self.tokens < 1:
+                    timeout = (1 - self.tokens) / self.rate
+                else:
+                    if self.rate > 0:
+                        self.tokens -= 1
+                    self.in_flight += 1
+                    return now - started
+                self._condition.wait(timeout)
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def idle(self):
+        """没有进行中的请求、没有暂停且令牌已补满（丢弃后重新创建的状态与之等价）"""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return (not self.in_flight and self.paused_until <= now
+                    and (self.rate <= 0 or self.tokens >= self.burst))
+
+    def pause(self, seconds):
+        """暂停整个主机（排队中的请求一起等待）"""
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+class RobotsCache:
+    """robots.txt 缓存：解析结果在内存中，原文在磁盘上（directory 为 None 时只用内存）"""
+
+    def __init__(self, directory=ROBOTS_CACHE_DIR, ttl=ROBOTS_TTL, user_agent=ROBOTS_USER_AGENT):
+        self.ttl = ttl
+        self.user_agent = user_agent
+        self.store = DiskCache(directory, ROBOTS_CACHE_MAX_BYTES) if directory else None
+        self.downloads = 0
+        self._parsers = OrderedDict()  # 站点 -> (解析结果, 过期时间)
+        self._origin_locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def _download(self, origin):
+        """下载 robots.txt，返回 (原文, 状态码)；网络错误或 5xx 时状态码为 None"""
+        self.downloads += 1
+        try:
+            response = http_fetch(origin + '/robots.txt', headers={'User-Agent': self.user_agent},
+                                  timeout=ROBOTS_TIMEOUT, max_bytes=ROBOTS_MAX_BYTES)
+            return response.content, response.status_code
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            # 4xx（429 除外）表示站点没有 robots.txt，按全部允许处理
+            if status is not None and 400 <= status < 500 and status != 429:
+                return b'', status
+            return b'', None
+        except requests.RequestException:
+            return b'', None
+
+    @staticmethod
+    def _parse(body, status):
+        parser = RobotFileParser()
+        if status == 200:
+            parser.parse(body.decode('utf-8', errors='replace').splitlines())
+        else:
+            parser.allow_all = True
+        return parser
+
+    def _load(self, origin):
+        key = hashlib.sha256(origin.encode('utf-8')).hexdigest()
+        cached = self.store.get(key) if self.store is not None else None
+        if cached is not None:
+            body, meta = cached
+            fetched_at = meta.get('fetched_at', 0)
+            if time.time() - fetched_at < self.ttl:
+                return self._parse(body, meta.get('status')), fetched_at + self.ttl
+        body, status = self._download(origin)
+        if status is None:
+            return self._parse(b'', None), time.time() + ROBOTS_ERROR_TTL
+        if self.store is not None:
+            self.store.set(key, body, {'origin': origin, 'fetched_at': time.time(), 'status': status})
+        return self._parse(body, status), time.time() + self.ttl
+
+    def parser(self, url):
+        """取得站点的 robots.txt 解析结果（同一站点同时只下载一次）"""
+        parts = urlsplit(url)
+        origin = f'{parts.scheme.lower()}://{parts.netloc.lower()}'
+        with self._lock:
+            entry = self._parsers.get(origin)
+            if entry is not None and entry[1] > time.time():
+                self._parsers.move_to_end(origin)
+                return entry[0]
+            origin_lock = self._origin_locks[origin]
+        with origin_lock:
+            with self._lock:
+                entry = self._parsers.get(origin)
+            if entry is None or entry[1] <= time.time():
+                entry = self._load(origin)
+            with self._lock:
+                self._parsers[origin] = entry
+                self._parsers.move_to_end(origin)
+                while len(self._parsers) > MAX_TRACKED_HOSTS:
+                    stale, _ = self._parsers.popitem(last=False)
+                    self._origin_locks.pop(stale, None)
+        return entry[0]
+
+    def allowed(self, url):
+        return self.parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        return self.parser(url).crawl_delay(self.user_agent)
+
+
+class FetchScheduler:
+    """按主机限速的抓取调度器（线程安全）
+
+    rate 为每个主机每秒的请求数（0 表示不限速），max_in_flight 为每个主机同时进行的请求数（0 表示不限），
+    robots 为 None 时不检查 robots.txt。
+    """
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST, max_in_flight=HOST_MAX_IN_FLIGHT,
+                 robots=None, throttle_retries=THROTTLE_RETRIES):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.robots = robots
+        self.throttle_retries = throttle_retries
+        self.requests = 0
+        self.throttled = 0
+        self.disallowed = 0
+        self.waited = 0.0
+        self._hosts = OrderedDict()  # 主机 -> 状态，按最近使用排列
+        self._lock = threading.Lock()
+
+    def host(self, url):
+        key = host_key(url)
+        with self._lock:
+            state = self._hosts.get(key)
+            if state is not None:
+                self._hosts.move_to_end(key)
+                return state
+            if len(self._hosts) >= MAX_TRACKED_HOSTS:
+                # 从最久未使用的主机开始丢弃已空闲的状态；令牌未补满、暂停中或有请求在进行的主机保留，
+                # 否则下一次请求会拿到满的令牌桶，绕过限速和 Retry-After/Crawl-delay 暂停
+                for stale in [k for k, s in self._hosts.items() if s.idle()]:
+                    del self._hosts[stale]
+                    if len(self._hosts) < MAX_TRACKED_HOSTS:
+                        break
+            state = self._hosts[key] = HostState(self.rate, self.burst, self.max_in_flight)
+            return state
+
+    def fetch(self, url, headers=None, timeout=10, max_bytes=MAX_FETCH_BYTES, timer=None, sink=None):
+        """按主机的限速规则下载网页（参数同 http_client.http_fetch）"""
+        state = self.host(url)
+        if self.robots is not None:
+            if not self.robots.allowed(url):
+                with self._lock:
+                    self.disallowed += 1
+                raise RobotsDisallowed(f'robots.txt 不允许抓取: {url}')
+            if not state.configured:
+                state.apply_crawl_delay(self.robots.crawl_delay(url))
+        attempt = 0
+        while True:
+            waited = state.acquire()
+            with self._lock:
+                self.requests += 1
+                self.waited += waited
+            if timer is not None and waited >= 0.001:
+                timer.add('wait', waited)
+            try:
+                return http_fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, timer=timer,
+                                  sink=sink)
+            except requests.HTTPError as e:
+                response = e.response
+                if response is None or response.status_code not in (429, 503) or attempt >= self.throttle_retries:
+                    raise
+                with self._lock:
+                    self.throttled += 1
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = DEFAULT_PAUSE * 2 ** attempt
+                state.pause(delay)
+                if delay > MAX_RETRY_AFTER:
+                    raise HostThrottled(f'站点要求暂停 {delay:.0f} 秒: {url}') from e
+                attempt += 1
+            finally:
+                state.release()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'hosts': len(self._hosts),
+                'in_flight': sum(state.in_flight for state in self._hosts.values()),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'robots_disallowed': self.disallowed,
+                'waited_s': round(self.waited, 3),
+            }
+        if self.robots is not None:
+            stats['robots_downloads'] = self.robots.downloads
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """进程内共享的抓取调度器"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FetchScheduler(robots=RobotsCache() if RESPECT_ROBOTS else None)
+    return _scheduler
+
+
+
+@REGISTRY.collector
+def _scheduler_metrics():
+    if _scheduler is None:
+        return []
+    stats = _scheduler.stats()
+    return [
+        ('clarity_scheduler_requests_total', 'counter', '经调度器发出的请求数', [((), stats['requests'])]),
+        ('clarity_scheduler_throttled_total', 'counter', '收到 429/503 后暂停主机的次数', [((), stats['throttled'])]),
+        ('clarity_scheduler_robots_disallowed_total', 'counter', 'robots.txt 不允许抓取的次数',
+         [((), stats['robots_disallowed'])]),
+        ('clarity_scheduler_wait_seconds_total', 'counter', '按主机限速累计等待的秒数', [((), stats['waited_s'])]),
+        ('clarity_scheduler_in_flight', 'gauge', '正在进行的请求数', [((), stats['in_flight'])]),
+        ('clarity_scheduler_hosts', 'gauge', '跟踪限速状态的主机数', [((), stats['hosts'])]),
+    ]
@@ -0,0 +1,381 @@
+"""ClarityAI 网页文本提取
+
+增量解析 HTML：先从响应头或前几 KB 的 meta 标签确定字符集，
+再按块解码并喂给解析器，收集到足够的可见文本后立即停止，
+不再为整篇文档构建完整的 DOM 树。
+
+正文提取只保留 <article>/<main> 区域的文本；页面没有这些区域时，
+按文本块的长度和链接密度挑选正文块。导航、页脚、评论、Cookie 提示等
+模板区域在解析时直接跳过。
+"""
+import codecs
+import re
+from html.parser import HTMLParser
+
+# 每次喂给解析器的字节数
+FEED_CHUNK_SIZE = 16 * 1024
+# 嗅探 meta 字符集时检查的字节数
+SNIFF_BYTES = 4096
+
+# 正文区域至少要有这么多字符，否则改用文本密度挑选正文块
+MIN_MAIN_CHARS = 200
+# 文本密度：正文块的最少字符数和最大链接文字占比
+MIN_BLOCK_CHARS = 10
+MAX_LINK_DENSITY = 0.5
+# 兜底的全页文本最多保留的原始字符数（相对 limit 的倍数）
+FALLBACK_FACTOR = 4
+
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def _lookup(name):
+    try:
+        return codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+
+
+def resolve_charset(content_type, head):
+    """确定字符集：BOM > 响应头 > meta 标签 > UTF-8"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = _HEADER_CHARSET.search(content_type or '')
+    if match and _lookup(match.group(1)):
+        return _lookup(match.group(1))
+    match = _META_CHARSET.search(head[:SNIFF_BYTES])
+    if match and _lookup(match.group(1).decode('ascii', 'ignore')):
+        encoding = _lookup(match.group(1).decode('ascii', 'ignore'))
+        # 浏览器把声明为 gb2312 的页面按 gbk 解码
+        return 'gbk' if encoding == 'gb2312' else encoding
+    return 'utf-8'
+
+
+def clean_text(text):
+    """清理文本：去掉每行首尾空白，按双空格断句后用单个空格连接"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+class VisibleTextParser(HTMLParser):
+    """收集标题和可见文本（跳过 script/style），文本足够时标记完成"""
+
+    SKIP_TAGS = ('script', 'style')
+
+    def __init__(self, limit):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.title = None
+        self.done = False
+        self._parts = []
+        self._size = 0
+        self._checked_size = 0
+        self._skip_depth = 0
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == 'title' and self.title is None:
+            self._title_parts = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        self._parts.append(data)
+        self._size += len(data)
+
+    def text(self):
+        return clean_text(''.join(self._parts))
+
+    def page_title(self):
+        # 提前停止时 <title> 可能还没闭合
+        if self.title is None and self._title_parts is not None:
+            return ''.join(self._title_parts)
+        return self.title
+
+    def check_done(self):
+        # 清理只会缩短文本，原始文本不足 limit 时无需检查；
+        # 前缀清理后的结果总是全文清理结果的前缀，所以够长即可停止
+        if self._size < self.limit or self._size == self._checked_size:
+            return self.done
+        self._checked_size = self._size
+        self.done = len(self.text()) >= self.limit
+        return self.done
+
+
+class MainContentParser(HTMLParser):
+    """只收集正文：优先 <article>/<main> 区域，否则按文本密度挑选正文块"""
+
+    SKIP_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'iframe', 'title')
+    BOILERPLATE_TAGS = ('nav', 'footer', 'aside', 'form', 'button', 'select', 'dialog')
+    MAIN_TAGS = ('article', 'main')
+    BLOCK_TAGS = frozenset((
+        'p', 'div', 'section', 'article', 'main', 'header', 'li', 'ul', 'ol', 'dl', 'dt', 'dd',
+        'table', 'tr', 'td', 'th', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre',
+        'figure', 'figcaption', 'br', 'hr', 'body',
+    ))
+    VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'))
+    # 这些标签本身不按 class/id 判断为模板区域（例如 <body class="has-sidebar">）
+    CONTAINER_TAGS = frozenset(('html', 'body', 'article', 'main'))
+    # 可以省略结束标签的元素 -> 隐式结束它的开始标签（HTML 规范的简化版）
+    _P_CLOSERS = frozenset((
+        'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figcaption', 'figure',
+        'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'menu', 'nav', 'ol', 'p',
+        'pre', 'section', 'table', 'ul',
+    ))
+    IMPLIED_END = {
+        'p': _P_CLOSERS,
+        'li': frozenset(('li',)),
+        'dt': frozenset(('dt', 'dd')),
+        'dd': frozenset(('dt', 'dd')),
+        'tr': frozenset(('tr', 'thead', 'tbody', 'tfoot')),
+        'td': frozenset(('td', 'th', 'tr', 'thead', 'tbody', 'tfoot')),
+        'th': frozenset(('td', 'th', 'tr', 'thead', 'tbody', 'tfoot')),
+        'option': frozenset(('option', 'optgroup')),
+    }
+    # 嵌套在这些元素中的开始标签不会隐式结束外层元素（例如 <li> 中嵌套的列表）
+    NESTING_TAGS = frozenset(('ul', 'ol', 'dl', 'table', 'select'))
+    BOILERPLATE_PATTERN = re.compile(
+        r'(?:^|[\s_-])(?:comments?|cookies?|consent|banner|footer|nav|navbar|menu|sidebar|share|social|'
+        r'related|recommend|advert|ads?|breadcrumbs?|subscribe|newsletter|popup|modal|disqus)(?:[\s_-]|$)',
+        re.I,
+    )
+
+    def __init__(self, limit):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.title = None
+        self.done = False
+        self._title_parts = None
+        self._skip_depth = 0
+        # 正在跳过的模板区域 / 正在收集的正文区域：(标签, 同名嵌套深度)
+        self._boilerplate = None
+        # 模板区域可以省略结束标签时，区域内已打开、尚未结束的其他元素
+        self._boilerplate_open = []
+        self._main = None
+        self._main_seen = False
+        self._link_depth = 0
+        # 当前文本块
+        self._block = []
+        self._block_links = 0
+        # 正文区域文本、文本密度挑出的正文块、兜底的全页文本
+        self._main_parts = []
+        self._main_size = 0
+        self._checked_size = 0
+        self._dense_blocks = []
+        self._dense_size = 0
+        self._all_parts = []
+        self._all_size = 0
+
+    def _is_boilerplate(self, tag, attrs):
+        if tag in self.BOILERPLATE_TAGS:
+            return True
+        if tag in self.CONTAINER_TAGS:
+            return False
+        values = dict(attrs)
+        if 'hidden' in values or values.get('aria-hidden') == 'true':
+            return True
+        if 'display:none' in (values.get('style') or '').replace(' ', ''):
+            return True
+        marker = f"{values.get('class') or ''} {values.get('id') or ''}"
+        return bool(self.BOILERPLATE_PATTERN.search(marker))
+
+    @staticmethod
+    def _is_main(tag, attrs):
+        if tag in MainContentParser.MAIN_TAGS:
+            return True
+        values = dict(attrs)
+        return values.get('role') == 'main' or values.get('itemprop') == 'articleBody'
+
+    def _implied_end(self, tag):
+        # 可以省略结束标签的模板区域（例如 <p class="share">）遇到隐式结束它的开始标签
+        closers = self.IMPLIED_END.get(self._boilerplate[0])
+        return closers is not None and tag in closers and not self.NESTING_TAGS.intersection(self._boilerplate_open)
+
+    def _end_boilerplate(self):
+        self._boilerplate = None
+        self._boilerplate_open = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            if tag == 'title' and self.title is None:
+                self._title_parts = []
+            self._skip_depth += 1
+            return
+        if self._boilerplate is not None and self._implied_end(tag):
+            self._end_boilerplate()
+        if tag in self.BLOCK_TAGS:
+            self._flush_block()
+            if self._main is not None:
+                self._main_parts.append('\n')
+        if tag in self.VOID_TAGS:
+            return
+        if self._boilerplate is not None:
+            if tag == self._boilerplate[0]:
+                self._boilerplate = (tag, self._boilerplate[1] + 1)
+            elif self._boilerplate[0] in self.IMPLIED_END:
+                self._boilerplate_open.append(tag)
+            return
+        if self._is_boilerplate(tag, attrs):
+            self._boilerplate = (tag, 1)
+            return
+        if self._main is not None:
+            if tag == self._main[0]:
+                self._main = (tag, self._main[1] + 1)
+        elif self._is_main(tag, attrs):
+            self._main = (tag, 1)
+            self._main_seen = True
+        if tag == 'a':
+            self._link_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            if tag == 'title' and self._title_parts is not None:
+                self.title = ''.join(self._title_parts)
+                self._title_parts = None
+            return
+        if tag in self.BLOCK_TAGS:
+            self._flush_block()
+            if self._main is not None:
+                self._main_parts.append('\n')
+        if self._boilerplate is not None:
+            if tag == self._boilerplate[0]:
+                depth = self._boilerplate[1] - 1
+                if depth:
+                    self._boilerplate = (tag, depth)
+                else:
+                    self._end_boilerplate()
+                return
+            if self._boilerplate[0] not in self.IMPLIED_END:
+                return
+            if tag in self._boilerplate_open:
+                # 结束区域内的元素（连同其中未闭合的元素）
+                index = len(self._boilerplate_open) - 1 - self._boilerplate_open[::-1].index(tag)
+                del self._boilerplate_open[index:]
+                return
+            # 父元素的结束标签隐式结束了模板区域，照常处理这个结束标签
+            self._end_boilerplate()
+        if self._main is not None and tag == self._main[0]:
+            depth = self._main[1] - 1
+            self._main = (tag, depth) if depth else None
+        if tag == 'a':
+            self._link_depth = max(0, self._link_depth - 1)
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            if self._title_parts is not None:
+                self._title_parts.append(data)
+            return
+        if self._all_size < self.limit * FALLBACK_FACTOR:
+            self._all_parts.append(data)
+            self._all_size += len(data)
+        if self._boilerplate is not None:
+            return
+        self._block.append(data)
+        if self._link_depth:
+            self._block_links += len(data)
+        if self._main is not None:
+            self._main_parts.append(data)
+            self._main_size += len(data)
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        text = clean_text(''.join(self._block))
+        links = self._block_links
+        self._block = []
+        self._block_links = 0
+        if len(text) >= MIN_BLOCK_CHARS and links <= len(text) * MAX_LINK_DENSITY:
+            self._dense_blocks.append(text)
+            self._dense_size += len(text) + 1
+
+    def main_text(self):
+        return clean_text(''.join(self._main_parts))
+
+    def text(self):
+        self._flush_block()
+        main = self.main_text()
+        if len(main) >= MIN_MAIN_CHARS:
+            return main
+        if self._dense_blocks:
+            return ' '.join(self._dense_blocks)
+        return clean_text(''.join(self._all_parts))
+
+    def source(self):
+        """正文来源：main（正文区域）、density（文本密度）或 full（全页文本）"""
+        if len(self.main_text()) >= MIN_MAIN_CHARS:
+            return 'main'
+        return 'density' if self._dense_blocks else 'full'
+
+    def page_title(self):
+        if self.title is None and self._title_parts is not None:
+            return ''.join(self._title_parts)
+        return self.title
+
+    def check_done(self):
+        # 正文区域已经够长；或者还没遇到正文区域、文本密度挑出的正文块已经够长
+        if self._main_size >= self.limit and self._main_size != self._checked_size:
+            self._checked_size = self._main_size
+            self.done = len(self.main_text()) >= self.limit
+        if not self.done and not self._main_seen:
+            self.done = self._dense_size >= self.limit
+        return self.done
+
+
+class ExtractedPage:
+    """提取结果"""
+
+    def __init__(self, title, text, encoding, complete, source='full'):
+        self.title = title
+        self.text = text
+        self.encoding = encoding
+        self.complete = complete  # False 表示解析提前结束
+        self.source = source
+
+
+def _feed(parser, body, content_type):
+    """按块解码并喂给解析器，解析器标记完成时停止；返回 (字符集, 是否解析完整篇文档)
+
+    body 可以是 bytes 或 memoryview（例如共享内存中的响应正文），按块解码时不复制整篇正文。
+    """
+    encoding = resolve_charset(content_type, bytes(body[:SNIFF_BYTES]))
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for start in range(0, len(body), FEED_CHUNK_SIZE):
+        parser.feed(decoder.decode(body[start:start + FEED_CHUNK_SIZE]))
+        if parser.check_done():
+            return encoding, False
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return encoding, True
+
+
+def extract_visible_text(body, content_type='', limit=5000):
+    """增量解析 HTML，收集到 limit 个字符的可见文本后停止"""
+    parser = VisibleTextParser(limit)
+    encoding, complete = _feed(parser, body, content_type)
+    return ExtractedPage(parser.page_title(), parser.text()[:limit], encoding, complete)
+
+
+def extract_main_content(body, content_type='', limit=5000):
+    """增量解析 HTML，只提取正文，正文够 limit 个字符后停止"""
+    parser = MainContentParser(limit)
+    encoding, complete = _feed(parser, body, content_type)
+    return ExtractedPage(parser.page_title(), parser.text()[:limit], encoding, complete, parser.source())
@@ -0,0 +1,167 @@
+"""ClarityAI 网页响应缓存
+
+按规范化 URL 持久化网页响应（正文 + ETag/Last-Modified），
+TTL 内直接命中，过期后用 If-None-Match/If-Modified-Since 条件请求重新验证，
+磁盘占用超过字节预算时按 LRU 淘汰。
+"""
+import hashlib
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from disk_cache import DiskCache
+from fetch_scheduler import get_scheduler
+from http_client import MAX_FETCH_BYTES, http_fetch
+from metrics import REGISTRY
+
+# 缓存配置（可通过环境变量调整）
+CACHE_DIR = os.environ.get(
+    'CLARITY_HTTP_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http'),
+)
+CACHE_TTL = float(os.environ.get('CLARITY_HTTP_CACHE_TTL', 300))
+CACHE_MAX_BYTES = int(os.environ.get('CLARITY_HTTP_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# 不影响页面内容的跟踪参数
+TRACKING_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'spm')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """规范化 URL：小写协议和主机、去掉默认端口/片段/跟踪参数、排序查询参数"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+class CachedResponse:
+    """缓存层返回的响应（只包含分析需要的字段）"""
+
+    def __init__(self, url, status_code, headers, content, from_cache=False, revalidated=False, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.from_cache = from_cache
+        self.revalidated = revalidated
+        self.truncated = truncated
+
+
+class HttpCache:
+    """带条件重新验证的网页响应缓存"""
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.store = DiskCache(directory, max_bytes)
+        self.revalidations = 0
+        self.not_modified = 0
+
+    def fetch(self, url, headers=None, timeout=10, max_bytes=MAX_FETCH_BYTES, timer=None, polite=False):
+        """获取网页：新鲜则直接返回缓存，过期则条件请求，未缓存则正常请求（polite 为 True 时经过调度器）"""
+        key = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        cached = self.store.get(key)
+        request_headers = dict(headers or {})
+        if cached is not None and cached[1].get('truncated') and cached[1].get('max_bytes', 0) < max_bytes:
+            # 缓存的正文是按更小的字节预算截断的，不能满足本次请求
+            cached = None
+        if cached is not None:
+            body, meta = cached
+            truncated = meta.get('truncated', False)
+            if time.time() - meta.get('stored_at', 0) < self.ttl:
+                return CachedResponse(url, 200, meta.get('headers', {}), body, from_cache=True, truncated=truncated)
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+            self.revalidations += 1
+
+        # 批量、订阅源等抓取经过按主机限速的调度器（robots.txt、令牌桶、Retry-After）；
+        # 用户单次提交的网页直接请求，不等待 robots.txt 和限速
+        fetch = get_scheduler().fetch if polite else http_fetch
+        response = fetch(url, headers=request_headers, timeout=timeout, max_bytes=max_bytes, timer=timer)
+
+        if cached is not None and response.status_code == 304:
+            self.not_modified += 1
+            meta['stored_at'] = time.time()
+            try:
+                self.store.update_meta(key, meta)
+            except OSError:
+                # 缓存目录不可写（磁盘已满、只读）时照常返回，下次再重新验证
+                pass
+            return CachedResponse(url, 200, meta.get('headers', {}), body, from_cache=True, revalidated=True,
+                                  truncated=truncated)
+
+        if 'no-store' not in response.headers.get('Cache-Control', '').lower():
+            kept_headers = {
+                name: response.headers[name]
+                for name in ('Content-Type', 'Content-Language')
+                if name in response.headers
+            }
+            try:
+                self.store.set(key, response.content, {
+                    'url': url,
+                    'stored_at': time.time(),
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'headers': kept_headers,
+                    'truncated': response.truncated,
+                    'max_bytes': max_bytes,
+                })
+            except OSError:
+                # 缓存写入失败不影响本次抓取，返回未缓存的响应
+                pass
+        return CachedResponse(url, response.status_code, response.headers, response.content,
+                              truncated=response.truncated)
+
+    def stats(self):
+        stats = self.store.stats()
+        stats.update(revalidations=self.revalidations, not_modified=self.not_modified)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache():
+    """进程内共享的网页缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
+
+
+def fetch_cached(url, headers=None, timeout=10, max_bytes=MAX_FETCH_BYTES, timer=None, polite=False):
+    """通过共享缓存获取网页"""
+    return get_http_cache().fetch(url, headers=headers, timeout=timeout, max_bytes=max_bytes, timer=timer,
+                                  polite=polite)
+
+
+
+@REGISTRY.collector
+def _cache_metrics():
+    if _cache is None:
+        return []
+    stats = _cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    labels = (('cache', 'http'),)
+    return [
+        ('clarity_cache_hits_total', 'counter', '缓存命中次数', [(labels, stats['hits'])]),
+        ('clarity_cache_misses_total', 'counter', '缓存未命中次数', [(labels, stats['misses'])]),
+        ('clarity_cache_hit_ratio', 'gauge', '缓存命中率', [(labels, stats['hits'] / lookups if lookups else 0.0)]),
+        ('clarity_cache_bytes', 'gauge', '缓存占用的磁盘字节数', [(labels, stats['bytes'])]),
+        ('clarity_http_revalidations_total', 'counter', '过期缓存的条件请求次数', [((), stats['revalidations'])]),
+        ('clarity_http_not_modified_total', 'counter', '条件请求返回 304 的次数', [((), stats['not_modified'])]),
+    ]
@@ -0,0 +1,127 @@
+"""ClarityAI HTTP 客户端
+
+进程内共享一个长连接会话：按主机复用连接池、限制总连接数、
+对临时错误做指数退避重试，并透明解压 gzip/brotli。
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from instrumentation import timed_stage
+
+# 连接池配置（可通过环境变量调整）
+POOL_HOSTS = int(os.environ.get('CLARITY_HTTP_POOL_HOSTS', 32))
+POOL_SIZE_PER_HOST = int(os.environ.get('CLARITY_HTTP_POOL_SIZE', 8))
+MAX_CONNECTIONS = int(os.environ.get('CLARITY_HTTP_MAX_CONNECTIONS', 64))
+MAX_RETRIES = int(os.environ.get('CLARITY_HTTP_RETRIES', 3))
+RETRY_BACKOFF = float(os.environ.get('CLARITY_HTTP_BACKOFF', 0.5))
+# 单个页面最多下载的字节数（解压后）
+MAX_FETCH_BYTES = int(os.environ.get('CLARITY_FETCH_MAX_BYTES', 2 * 1024 * 1024))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 安装了 brotli 时 urllib3 会自动解压 br 编码
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+_session = None
+_session_lock = threading.Lock()
+# 限制整个进程同时占用的连接数
+_connection_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        # 429/503 由抓取调度器按 Retry-After 暂停整个主机后重试（fetch_scheduler），
+        # 不在单个请求的线程里等待
+        status_forcelist=(500, 502, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_SIZE_PER_HOST,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    return session
+
+
+def get_session():
+    """进程内共享的会话（只创建一次，Streamlit 重跑脚本时不会重建）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def http_get(url, headers=None, timeout=10, **kwargs):
+    """通过共享会话发起 GET 请求"""
+    with _connection_slots:
+        return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+
+class FetchResult:
+    """流式下载的结果（正文最多 max_bytes 字节）"""
+
+    def __init__(self, url, status_code, headers, content, truncated):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+
+
+def http_fetch(url, headers=None, timeout=10, max_bytes=MAX_FETCH_BYTES, timer=None, sink=None):
+    """流式下载网页正文，超过字节预算后停止读取；4xx/5xx 会抛出异常
+    （sink 不为 None 时把数据块依次交给 sink，不在内存中保留正文）"""
+    with _connection_slots:
+        # 连接阶段包括 DNS、TCP/TLS 握手和等待响应头
+        with timed_stage(timer, 'connect'):
+            response = get_session().get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            size = 0
+            truncated = False
+            with timed_stage(timer, 'download'):
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    if sink is None:
+                        chunks.append(chunk)
+                    elif size < max_bytes:
+                        sink(chunk[:max_bytes - size])
+                    size += len(chunk)
+                    # 多读到超过预算才能确定后面还有没有内容
+                    if size > max_bytes:
+                        truncated = True
+                        break
+            return FetchResult(
+                response.url,
+                response.status_code,
+                response.headers,
+                b''.join(chunks)[:max_bytes],
+                truncated,
+            )
+        finally:
+            response.close()
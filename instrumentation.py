@@ -0,0 +1,106 @@
+"""ClarityAI 阶段计时
+
+一次分析分为 连接 → 下载 → 解析 → 特征提取 → 报告生成 五个阶段，
+StageTimer 记录每个阶段的墙钟时间和 CPU 时间，并在阶段开始/结束时发出事件，
+界面的进度条跟随这些事件更新。
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import observe_timings
+
+# 阶段名称及界面显示文字（按执行顺序）
+STAGES = (
+    ('connect', '📡 正在连接网页...'),
+    ('download', '🌐 正在下载网页内容...'),
+    ('parse', '🧩 正在解析网页结构...'),
+    ('features', '🤖 正在提取特征并分析...'),
+    ('render', '📊 正在生成分析报告...'),
+)
+STAGE_LABELS = dict(STAGES)
+STAGE_NAMES = tuple(name for name, _ in STAGES)
+# 耗时表中的阶段名称
+STAGE_TITLES = {
+    'connect': '连接（DNS/握手/首字节）',
+    'download': '下载',
+    'parse': '解析',
+    'features': '特征提取',
+    'render': '报告生成',
+    'first_token': '首段输出等待',
+    'wait': '按主机限速等待',
+    'total': '总计',
+}
+
+# 最近若干次分析的计时记录（进程内共享）
+RECENT_TIMINGS = deque(maxlen=500)
+_recent_lock = threading.Lock()
+
+
+class StageTimer:
+    """记录各阶段耗时，并在阶段开始/结束时回调 on_event"""
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.stages = {}
+        self._started = time.perf_counter()
+
+    def _emit(self, stage, event, **values):
+        if self.on_event is not None:
+            self.on_event(dict(stage=stage, event=event, **values))
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段（CPU 时间按当前线程统计）"""
+        self._emit(name, 'start')
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+    def add(self, name, wall, cpu=0.0):
+        """登记一个已完成阶段的耗时（同名阶段累加）"""
+        entry = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+        entry['wall'] += wall
+        entry['cpu'] += cpu
+        self._emit(name, 'end', wall=wall, cpu=cpu)
+
+    def total(self):
+        return time.perf_counter() - self._started
+
+    def as_dict(self):
+        """以毫秒为单位导出各阶段耗时"""
+        timings = {
+            name: {'wall_ms': round(entry['wall'] * 1000, 2), 'cpu_ms': round(entry['cpu'] * 1000, 2)}
+            for name, entry in self.stages.items()
+        }
+        timings['total'] = {
+            'wall_ms': round(self.total() * 1000, 2),
+            'cpu_ms': round(sum(entry['cpu'] for entry in self.stages.values()) * 1000, 2),
+        }
+        return timings
+
+
+@contextmanager
+def timed_stage(timer, name):
+    """timer 为 None 时不计时，便于在可选计时的函数里使用"""
+    if timer is None:
+        yield
+    else:
+        with timer.stage(name):
+            yield
+
+
+def record_timings(url, timings):
+    """保存一次分析的计时记录，并计入各阶段耗时直方图"""
+    with _recent_lock:
+        RECENT_TIMINGS.append({'url': url, 'time': time.time(), 'timings': timings})
+    observe_timings(timings)
+
+
+def recent_timings():
+    with _recent_lock:
+        return list(RECENT_TIMINGS)
@@ -0,0 +1,167 @@
+"""ClarityAI 后台分析任务
+
+界面提交的分析在进程内共享的工作线程池中执行，提交后立即返回任务ID，
+界面定时刷新读取任务的进度、流式输出和结果，慢站点不会阻塞页面。
+网址（规范化后）和分析选项都相同、且尚未完成的任务只执行一次：
+热门链接被多个用户同时提交时，后来的提交直接得到进行中任务的ID。
+已完成的任务保留一段时间供界面读取结果，之后清除。
+"""
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_engine import analyze_content_with_ai, select_sections
+from http_cache import normalize_url
+from metrics import REGISTRY
+
+# 任务配置（可通过环境变量调整）
+JOB_WORKERS = int(os.environ.get('CLARITY_JOB_WORKERS', 4))
+# 已完成任务的保留时间（秒）
+JOB_RETENTION = float(os.environ.get('CLARITY_JOB_RETENTION', 600))
+# 最多保留的任务数（超出时先清除最早完成的任务）
+MAX_JOBS = 1000
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+
+
+def new_job_id():
+    """生成任务ID（毫秒时间戳 + 随机后缀）"""
+    return f"JOB_{int(time.time() * 1000)}_{secrets.token_hex(4)}"
+
+
+def job_key(url, sections, long_document=False, polite=False):
+    """相同分析的判定键：规范化网址、报告部分、长文档模式和抓取方式（是否经过按主机限速的调度器）"""
+    return normalize_url(url), tuple(sections), bool(long_document), bool(polite)
+
+
+class Job:
+    """一次分析任务；stage 为正在执行的阶段，partial 为目前为止流式输出的分析文本"""
+
+    def __init__(self, job_id, key, url):
+        self.id = job_id
+        self.key = key
+        self.url = url
+        self.status = QUEUED
+        self.stage = None
+        self.partial = ''
+        self.result = None
+        self.submitted = 1
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status == DONE
+
+
+class JobQueue:
+    """进程内共享的分析任务队列（线程安全）"""
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION, max_jobs=MAX_JOBS, analyze=None):
+        self.retention = retention
+        self.max_jobs = max_jobs
+        # analyze 与 analyze_content_with_ai 的参数相同，基准测试可以替换
+        self._analyze = analyze or analyze_content_with_ai
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='clarity-job')
+        self._jobs = OrderedDict()  # 任务ID -> 任务（按提交顺序）
+        self._in_flight = {}  # 判定键 -> 未完成的任务
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    def submit(self, url, include_consensus=True, include_bias=True, include_terms=True, include_advice=True,
+               long_document=False, polite=False):
+        """提交分析，返回任务ID；相同的分析仍在进行时返回那个任务的ID（polite 为 True 时抓取经过调度器）"""
+        sections = select_sections(include_consensus, include_bias, include_terms, include_advice)
+        key = job_key(url, sections, long_document, polite)
+        with self._lock:
+            self._expire()
+            job = self._in_flight.get(key)
+            if job is not None:
+                job.submitted += 1
+                self.deduplicated += 1
+                return job.id
+            job = Job(new_job_id(), key, url)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+        options = (include_consensus, include_bias, include_terms, include_advice)
+        self._executor.submit(self._run, job, options, long_document, polite)
+        return job.id
+
+    def _run(self, job, options, long_document, polite):
+        job.status = RUNNING
+
+        def on_stage(event):
+            if event['event'] == 'start':
+                job.stage = event['stage']
+
+        def on_token(text):
+            job.partial = text
+
+        try:
+            result = self._analyze(job.url, *options, progress=on_stage, on_token=on_token,
+                                   long_document=long_document, polite=polite)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        with self._lock:
+            job.result = result
+            job.status = DONE
+            job.finished_at = time.time()
+            self._in_flight.pop(job.key, None)
+
+    def get(self, job_id):
+        """按任务ID读取任务，不存在或已清除时返回 None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        # 清除超过保留时间的已完成任务；任务过多时再清除最早完成的任务
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(self._jobs) - self.max_jobs
+        for job in sorted(finished, key=lambda job: job.finished_at):
+            if now - job.finished_at <= self.retention and excess <= 0:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+
+    def stats(self):
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return dict(counts, deduplicated=self.deduplicated)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """进程内共享的分析任务队列"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+@REGISTRY.collector
+def _job_metrics():
+    if _queue is None:
+        return []
+    stats = _queue.stats()
+    return [
+        ('clarity_jobs', 'gauge', '保留中的分析任务数',
+         [((('status', status),), stats[status]) for status in (QUEUED, RUNNING, DONE)]),
+        ('clarity_jobs_deduplicated_total', 'counter', '合并到进行中任务的重复提交次数',
+         [((), stats['deduplicated'])]),
+    ]
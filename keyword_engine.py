@@ -0,0 +1,199 @@
+"""ClarityAI 关键词引擎
+
+把所有分析器用到的关键词表编译成一个 Aho-Corasick 自动机，
+每篇文档只扫描一次，生成共享的命中表（次数 + 位置），
+各分析器从命中表读取结果，不再各自对全文做子串查找。
+"""
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+
+# 所有分析器的关键词表，顺序即输出顺序
+KEYWORD_GROUPS = {
+    'topics': ["技术", "经济", "政治", "社会", "环境", "健康", "教育", "文化"],
+    'conclusion': ["结论", "发现", "表明", "显示", "证明"],
+    'impact': ["影响", "改变", "推动", "促进", "阻碍"],
+    'credibility': ["研究", "数据", "专家", "报告", "调查"],
+    'timeliness': ["最新", "近期", "今年", "本月", "最近"],
+    'research_areas': ["人工智能", "机器学习", "数据分析", "社会科学", "自然科学"],
+    'controversy': ["争议", "分歧", "不同观点", "争论"],
+    'development': ["最新", "突破", "进展", "发展", "创新"],
+    'expert': ["专家", "学者", "教授", "研究员", "分析师"],
+    'industry': ["企业", "公司", "行业", "市场", "商业"],
+    'policy': ["政策", "政府", "法规", "规定", "制度"],
+    'position': ["支持", "反对", "赞成", "批评", "质疑"],
+    'bias': ["明显", "强烈", "绝对", "完全"],
+    'interest': ["利益", "投资", "合作", "赞助"],
+    'data': ["数据", "统计", "数字", "百分比", "图表"],
+    'diversity': ["不同", "多种", "各方", "各种"],
+    'balance': ["平衡", "客观", "中立", "全面"],
+    'risk': ["风险", "挑战", "问题", "困难", "威胁"],
+    'opportunity': ["机会", "机遇", "优势", "潜力", "前景"],
+    'challenge': ["挑战", "困难", "障碍", "问题"],
+}
+
+# 术语解释使用的词表：术语 -> 通俗解释
+TERM_GLOSSARY = {
+    "人工智能": "让计算机模拟人类感知、推理和决策能力的技术统称",
+    "机器学习": "让计算机从数据中自动学习规律、无需显式编程的人工智能方法",
+    "深度学习": "基于多层神经网络的机器学习方法，擅长处理图像、语音和文本",
+    "大模型": "参数规模巨大、经过海量数据预训练的通用人工智能模型",
+    "神经网络": "模仿生物神经元连接方式构建的计算模型",
+    "算法": "解决特定问题的一系列明确计算步骤",
+    "大数据": "规模大、增长快、类型多，需要专门技术处理的数据集合",
+    "云计算": "通过网络按需使用计算、存储等资源的服务模式",
+    "区块链": "以分布式账本记录交易、数据难以篡改的技术",
+    "物联网": "把各种设备通过网络连接起来、实现数据交换与远程控制的体系",
+    "半导体": "导电性介于导体与绝缘体之间的材料，是芯片制造的基础",
+    "芯片": "集成大量电子元件的微型电路，是电子设备的核心部件",
+    "量子计算": "利用量子叠加与纠缠进行运算的新型计算方式",
+    "自动驾驶": "车辆依靠传感器和算法在部分或全部场景下自主行驶的技术",
+    "数字化转型": "企业或机构利用数字技术重塑业务流程和商业模式的过程",
+    "供应链": "产品从原材料到送达消费者所经过的采购、生产、物流等环节",
+    "通货膨胀": "一般物价水平持续上涨、货币购买力下降的现象",
+    "利率": "借贷资金的价格，通常以一定期限内利息占本金的比例表示",
+    "碳中和": "通过减排和吸收使二氧化碳净排放量降为零",
+    "碳达峰": "二氧化碳排放量达到历史最高值后进入持续下降阶段",
+    "新能源": "太阳能、风能、氢能等区别于传统化石能源的能源形式",
+    "GDP": "国内生产总值，衡量一个地区一定时期内生产活动最终成果的指标",
+    "CPI": "居民消费价格指数，反映居民购买商品和服务价格变动的指标",
+    "PMI": "采购经理指数，判断制造业或服务业景气程度的先行指标",
+    "5G": "第五代移动通信技术，具有高速率、低时延、大连接的特点",
+}
+KEYWORD_GROUPS['terms'] = list(TERM_GLOSSARY)
+
+# 关键数据（百分比、万、亿）的匹配规则
+NUMBER_PATTERN = re.compile(r'\d+%|\d+\.\d+%|\d+万|\d+亿')
+
+
+class KeywordMatcher:
+    """多模式匹配器（Aho-Corasick），构建一次，逐字符扫描一遍文档"""
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(kw for kw in keywords if kw))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for keyword in self.keywords:
+            self._add(keyword)
+        self._link()
+
+    def _add(self, keyword):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._output[state] = self._output[state] + (keyword,)
+
+    def _link(self):
+        # 广度优先计算失败指针，并合并后缀状态的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def scan(self, text):
+        """扫描文本，返回 {关键词: [起始位置, ...]}"""
+        goto, fail, output = self._goto, self._fail, self._output
+        offsets = {}
+        state = 0
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for keyword in output[state]:
+                    offsets.setdefault(keyword, []).append(index - len(keyword) + 1)
+        return offsets
+
+
+class HitTable:
+    """单篇文档的命中表：关键词次数、位置以及关键数据"""
+
+    __slots__ = ('text', 'length', 'offsets', 'numbers')
+
+    def __init__(self, text, offsets, numbers, length=None):
+        self.text = text
+        self.length = len(text) if length is None else length
+        self.offsets = offsets
+        self.numbers = numbers
+
+    def has(self, keyword):
+        return keyword in self.offsets
+
+    def count(self, keyword):
+        return len(self.offsets.get(keyword, ()))
+
+    def found(self, group):
+        """按关键词表顺序返回文档中出现过的关键词"""
+        return [kw for kw in KEYWORD_GROUPS[group] if kw in self.offsets]
+
+    def any(self, group):
+        return any(kw in self.offsets for kw in KEYWORD_GROUPS[group])
+
+    def first(self, group):
+        for kw in KEYWORD_GROUPS[group]:
+            if kw in self.offsets:
+                return kw
+        return None
+
+    def snippet(self, keyword, width=30):
+        """引用关键词首次出现处的上下文片段"""
+        positions = self.offsets.get(keyword)
+        if not positions or not self.text:
+            return ""
+        start = max(0, positions[0] - width)
+        end = min(len(self.text), positions[0] + len(keyword) + width)
+        return self.text[start:end]
+
+    def evidence(self, group, width=30):
+        """返回关键词表中各命中词的证据片段"""
+        return {kw: self.snippet(kw, width) for kw in self.found(group)}
+
+
+@lru_cache(maxsize=1)
+def get_matcher():
+    """进程内共享的匹配器，只构建一次"""
+    return KeywordMatcher(kw for group in KEYWORD_GROUPS.values() for kw in group)
+
+
+# 其他进程已扫描好、等待放入 scan_document 缓存的结果：正文 -> (关键词位置, 关键数据)；
+# 只在持有 _prescanned_lock 时修改
+_prescanned = {}
+_prescanned_lock = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def scan_document(content):
+    """对文档做一次扫描，生成命中表（同一文档重复调用直接复用）"""
+    found = _prescanned.get(content)
+    if found is not None:
+        return HitTable(content, *found)
+    offsets = get_matcher().scan(content)
+    numbers = NUMBER_PATTERN.findall(content)
+    return HitTable(content, offsets, numbers)
+
+
+def prime_scan(content, offsets, numbers):
+    """放入在其他进程中扫描好的结果，之后 scan_document(content) 不再重新扫描"""
+    with _prescanned_lock:
+        _prescanned[content] = (offsets, numbers)
+        try:
+            return scan_document(content)
+        finally:
+            # 放入的结果只在这次调用中有效（已在缓存中时不会用到）
+            _prescanned.pop(content, None)
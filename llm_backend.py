@@ -0,0 +1,273 @@
+"""ClarityAI 分析后端
+
+报告的智能体分析部分由可替换的后端生成：
+默认是内置的规则分析；设置 CLARITY_LLM_BASE_URL 后改用 OpenAI 兼容的模型服务
+（vLLM、Ollama、LM Studio 等），逐段流式输出，模型服务不可用时回退到规则分析。
+
+模型请求在后台事件循环中用 httpx 异步客户端发送：连接复用、请求超时、并发上限，
+相同的进行中请求只向模型服务发送一次，所有调用方共享同一个输出流。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+import warnings
+
+from metrics import REGISTRY
+
+# 模型服务配置（可通过环境变量调整，CLARITY_LLM_BASE_URL 为空时使用规则分析）
+LLM_BASE_URL = os.environ.get('CLARITY_LLM_BASE_URL', '').rstrip('/')
+LLM_MODEL = os.environ.get('CLARITY_LLM_MODEL', 'qwen2.5:7b-instruct')
+LLM_API_KEY = os.environ.get('CLARITY_LLM_API_KEY', '')
+LLM_TIMEOUT = float(os.environ.get('CLARITY_LLM_TIMEOUT', 60))
+LLM_CONNECT_TIMEOUT = float(os.environ.get('CLARITY_LLM_CONNECT_TIMEOUT', 5))
+LLM_MAX_CONCURRENCY = int(os.environ.get('CLARITY_LLM_MAX_CONCURRENCY', 8))
+LLM_MAX_TOKENS = int(os.environ.get('CLARITY_LLM_MAX_TOKENS', 2048))
+
+_END = object()
+
+
+class LLMError(Exception):
+    """模型服务调用失败（连接失败、超时、错误状态码或输出中断）"""
+
+
+def collect(chunks, on_token=None):
+    """拼接流式输出；每收到一段就用目前为止的全文调用 on_token"""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        if on_token is not None:
+            on_token(''.join(parts))
+    return ''.join(parts)
+
+
+class RuleBasedBackend:
+    """内置规则分析（逐个报告部分输出）"""
+
+    name = 'rules'
+    # 规则分析的报告缓存键不包含后端信息，与之前生成的缓存保持兼容
+    cache_id = None
+
+    def stream(self, prompt, content, sections, long_document=False):
+        from analysis_engine import iter_ai_analysis
+        from long_document import analyze_long_document
+        # 长文档分块并行扫描后合并命中表，各分析器基于全文的命中生成报告
+        hits = analyze_long_document(content) if long_document else None
+        for index, part in enumerate(iter_ai_analysis(prompt, content, sections, hits)):
+            yield part if index == 0 else '\n' + part
+
+    @staticmethod
+    def render(section_results):
+        """按与 stream 相同的格式逐段输出已生成的各部分结构化结果"""
+        for index, section in enumerate(section_results):
+            part = section.to_markdown()
+            yield part if index == 0 else '\n' + part
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class _Flight:
+    """一次进行中的模型请求，相同请求的调用方共享同一个输出流"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """订阅输出：先补发已收到的部分，之后的部分实时推送"""
+        channel = queue.Queue()
+        with self._lock:
+            for chunk in self.chunks:
+                channel.put(chunk)
+            if self.done:
+                channel.put(_END)
+            else:
+                self._subscribers.append(channel)
+        return channel
+
+    def publish(self, chunk):
+        with self._lock:
+            self.chunks.append(chunk)
+            for channel in self._subscribers:
+                channel.put(chunk)
+
+    def close(self, error=None):
+        with self._lock:
+            self.done = True
+            self.error = error
+            for channel in self._subscribers:
+                channel.put(_END)
+            self._subscribers.clear()
+
+
+class OpenAICompatibleBackend:
+    """OpenAI 兼容的模型服务（/chat/completions 流式接口）"""
+
+    name = 'openai'
+
+    def __init__(self, base_url=LLM_BASE_URL, model=LLM_MODEL, api_key=LLM_API_KEY, timeout=LLM_TIMEOUT,
+                 connect_timeout=LLM_CONNECT_TIMEOUT, max_concurrency=LLM_MAX_CONCURRENCY,
+                 max_tokens=LLM_MAX_TOKENS):
+        import httpx
+        self._httpx = httpx
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.cache_id = f'{model}@{self.base_url}'
+        self.requests = 0
+        self.coalesced = 0
+        self.failures = 0
+        self._client = None
+        self._semaphore = None
+        self._flights = {}
+        self._lock = threading.Lock()
+        # 异步客户端运行在独立的事件循环线程中，调用方可以是任意同步线程
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='llm-backend', daemon=True)
+        self._thread.start()
+
+    def _ensure_client(self):
+        if self._client is None:
+            headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+            self._client = self._httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self._httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=self._httpx.Limits(max_connections=self.max_concurrency,
+                                          max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _payload(self, prompt):
+        return {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'stream': True,
+            'max_tokens': self.max_tokens,
+        }
+
+    async def _produce(self, key, flight, payload):
+        try:
+            client = self._ensure_client()
+            async with self._semaphore:
+                async with client.stream('POST', '/chat/completions', json=payload) as response:
+                    if response.status_code >= 400:
+                        raise LLMError(f'模型服务返回 {response.status_code}')
+                    async for line in response.aiter_lines():
+                        if not line.startswith('data:'):
+                            continue
+                        data = line[5:].strip()
+                        if data == '[DONE]':
+                            break
+                        choices = json.loads(data).get('choices') or [{}]
+                        chunk = (choices[0].get('delta') or {}).get('content')
+                        if chunk:
+                            flight.publish(chunk)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            flight.close(e)
+        else:
+            flight.close()
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def stream(self, prompt, content, sections, long_document=False):
+        """流式生成（prompt 中已包含正文开头的摘录和需要输出的部分）；失败时抛出 LLMError"""
+        if long_document:
+            from long_document import document_digest
+            # 长文档另附全文各分块中命中最多的句子（与规则分析共用分块扫描合并后的命中表）
+            prompt = f'{prompt}\n\n全文各部分摘录：\n{document_digest(content)}'
+        payload = self._payload(prompt)
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.requests += 1
+            else:
+                self.coalesced += 1
+        channel = flight.subscribe()
+        if leader:
+            asyncio.run_coroutine_threadsafe(self._produce(key, flight, payload), self._loop)
+        while True:
+            try:
+                chunk = channel.get(timeout=self.timeout)
+            except queue.Empty:
+                raise LLMError('模型服务响应超时') from None
+            if chunk is _END:
+                if flight.error is not None:
+                    if isinstance(flight.error, LLMError):
+                        raise flight.error
+                    raise LLMError(f'模型服务调用失败: {flight.error}') from flight.error
+                if not flight.chunks:
+                    raise LLMError('模型服务没有返回内容')
+                return
+            yield chunk
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': self.name,
+                'model': self.model,
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'failures': self.failures,
+                'in_flight': len(self._flights),
+            }
+
+
+_rule_backend = RuleBasedBackend()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_rule_backend():
+    return _rule_backend
+
+
+def _build_backend():
+    if not LLM_BASE_URL:
+        return _rule_backend
+    try:
+        return OpenAICompatibleBackend()
+    except ImportError:
+        warnings.warn('未安装 httpx，无法连接模型服务，改用规则分析')
+        return _rule_backend
+
+
+def get_backend():
+    """进程内共享的分析后端"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend()
+    return _backend
+
+
+
+@REGISTRY.collector
+def _backend_metrics():
+    if _backend is None or _backend is _rule_backend:
+        return []
+    stats = _backend.stats()
+    return [
+        ('clarity_llm_requests_total', 'counter', '发送到模型服务的请求数', [((), stats['requests'])]),
+        ('clarity_llm_coalesced_total', 'counter', '合并到进行中请求的调用次数', [((), stats['coalesced'])]),
+        ('clarity_llm_failures_total', 'counter', '模型服务调用失败次数', [((), stats['failures'])]),
+        ('clarity_llm_in_flight', 'gauge', '进行中的模型请求数', [((), stats['in_flight'])]),
+    ]
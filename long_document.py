@@ -0,0 +1,153 @@
+"""ClarityAI 长文档分析
+
+长报告、白皮书不再截断到前几千字：全文切分为带重叠的分块，
+各分块并行扫描关键词和数据（map），再按全文位置合并成一张命中表（reduce），
+报告中的各个分析器照常使用合并后的命中表；使用模型服务时，
+另从合并后的命中表中为每个分块挑出命中最多的句子，作为全文摘录附在提示词后。
+
+分块是按需切出并逐个提交的，在途分块数有上限，
+除全文本身外，内存占用不随分块数增长。
+"""
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import get_context
+
+from keyword_engine import NUMBER_PATTERN, HitTable, get_matcher
+
+# 长文档模式配置（可通过环境变量调整）
+MAX_CHARS = int(os.environ.get('CLARITY_LONGDOC_MAX_CHARS', 1000000))
+MAX_FETCH_BYTES = int(os.environ.get('CLARITY_LONGDOC_MAX_BYTES', 20 * 1024 * 1024))
+CHUNK_CHARS = int(os.environ.get('CLARITY_LONGDOC_CHUNK_CHARS', 20000))
+# 分块前后各多取的字符数，需大于最长的关键词和数据
+CHUNK_OVERLAP = 200
+WORKERS = int(os.environ.get('CLARITY_LONGDOC_WORKERS', os.cpu_count() or 1))
+# 分块数少于此值时直接在当前进程中扫描，不值得分发到进程池
+PARALLEL_MIN_CHUNKS = 4
+# 合并时最多保留的数据条数
+MAX_NUMBERS = 1000
+# 提供给模型服务的全文摘录的字符数上限
+DIGEST_CHARS = int(os.environ.get('CLARITY_LONGDOC_DIGEST_CHARS', 6000))
+# 摘录的单位：以句末标点或换行结束的句子
+SENTENCE_PATTERN = re.compile(r'[^。！？!?\n]+[。！？!?]?')
+
+
+def iter_chunks(text, size=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """切分全文，产出 (分块起点在全文中的位置, 负责的起止位置, 分块文本)"""
+    for start in range(0, len(text), size):
+        low = max(0, start - overlap)
+        yield low, (start, min(start + size, len(text))), text[low:start + size + overlap]
+
+
+def scan_chunk(low, owned, chunk):
+    """map：扫描一个分块，返回按全文位置计的 (关键词位置, 数据)
+
+    只保留起点落在本分块负责范围内的命中，重叠部分不会重复计数；
+    分块前面多取的文本让正则从数字中间开始时也能与整篇扫描得到相同的结果。
+    """
+    start, end = owned
+    offsets = {}
+    for keyword, positions in get_matcher().scan(chunk).items():
+        kept = [low + position for position in positions if start <= low + position < end]
+        if kept:
+            offsets[keyword] = kept
+    numbers = [match.group() for match in NUMBER_PATTERN.finditer(chunk) if start <= low + match.start() < end]
+    return offsets, numbers
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """进程内共享的分块扫描进程池（工作进程常驻，关键词自动机只构建一次）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # 界面和 API 进程中有其他线程在运行，用 spawn 启动工作进程更安全
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=get_context('spawn'))
+    return _pool
+
+
+def reset_pool(pool):
+    """丢弃异常的进程池（工作进程异常退出后调用，下次使用时重新创建）"""
+    global _pool
+    with _pool_lock:
+        # 其他线程可能已经换上了新的进程池
+        if _pool is pool:
+            _pool = None
+    # 取消还在排队的分块并释放管理线程，不等待已退出的工作进程
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _map_chunks(text, workers):
+    chunks = iter_chunks(text)
+    if workers <= 1 or len(text) < CHUNK_CHARS * PARALLEL_MIN_CHUNKS:
+        for chunk in chunks:
+            yield scan_chunk(*chunk)
+        return
+    # 按顺序取回结果，最多同时提交 workers * 2 个分块
+    pool = get_pool()
+    window = deque()
+    try:
+        for chunk in chunks:
+            window.append(pool.submit(scan_chunk, *chunk))
+            if len(window) >= workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+    except BrokenProcessPool:
+        reset_pool(pool)
+        raise
+
+
+def _reduce(results):
+    offsets = {}
+    numbers = []
+    for chunk_offsets, chunk_numbers in results:
+        for keyword, positions in chunk_offsets.items():
+            offsets.setdefault(keyword, []).extend(positions)
+        numbers.extend(chunk_numbers[:MAX_NUMBERS - len(numbers)])
+    return offsets, numbers
+
+
+@lru_cache(maxsize=4)
+def analyze_long_document(text, workers=WORKERS):
+    """reduce：按分块顺序合并各分块的命中，得到与整篇扫描相同的命中表"""
+    try:
+        offsets, numbers = _reduce(_map_chunks(text, workers))
+    except BrokenProcessPool:
+        # 工作进程异常退出时（进程池已丢弃）改为在当前进程中扫描
+        offsets, numbers = _reduce(_map_chunks(text, 1))
+    return HitTable(text, offsets, numbers)
+
+
+@lru_cache(maxsize=4)
+def document_digest(text, limit=DIGEST_CHARS):
+    """全文摘录：按合并后的命中表给句子计分（命中的关键词次数），
+    每个分块按得分取句子、各占相同的字数，按原文顺序拼接"""
+    positions = sorted(position for found in analyze_long_document(text).offsets.values() for position in found)
+    quota = max(1, min(limit, limit * CHUNK_CHARS // max(len(text), 1)))
+    candidates = {}  # 分块序号 -> [(得分, 起点, 句子)]
+    for match in SENTENCE_PATTERN.finditer(text):
+        score = bisect_left(positions, match.end()) - bisect_left(positions, match.start())
+        sentence = match.group().strip()
+        if score and sentence:
+            candidates.setdefault(match.start() // CHUNK_CHARS, []).append((-score, match.start(), sentence))
+    picked = []
+    for sentences in candidates.values():
+        used = 0
+        for _, start, sentence in sorted(sentences):
+            if used and used + len(sentence) > quota:
+                break
+            picked.append((start, sentence[:quota]))
+            used += len(sentence)
+    if not picked:
+        return text[:limit]
+    return '\n'.join(sentence for _, sentence in sorted(picked))[:limit]
@@ -0,0 +1,245 @@
+"""ClarityAI 运行指标
+
+进程内的指标注册表：各阶段耗时直方图、抓取结果计数（按错误类型）、分析结果计数，
+以及导出时才读取的缓存命中率和进程内存/CPU（psutil）。
+以 Prometheus 文本格式导出（API 的 /metrics），界面侧边栏的运维面板读取同一份数据。
+"""
+import bisect
+import math
+import os
+import threading
+
+# 阶段耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数（按标签分别计数）"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """{标签值元组: 计数}"""
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [(self.name, tuple(zip(self.labelnames, key)), value) for key, value in self.values().items()]
+
+
+class Histogram:
+    """分桶统计的分布（按标签分别统计），可估算分位数"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # 标签值元组 -> [各桶计数（不累计）, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def series(self):
+        """{标签值元组: (各桶计数, 总和, 次数)}"""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def quantile(self, q, counts, count):
+        """按桶内线性插值估算分位数（落在最后一个桶外时返回最大的桶上界）"""
+        if not count:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def samples(self):
+        result = []
+        for key, (counts, total, count) in self.series().items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                result.append((self.name + '_bucket', labels + (('le', _number(float(bound))),), cumulative))
+            result.append((self.name + '_sum', labels, total))
+            result.append((self.name + '_count', labels, count))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表；collector 为导出时调用的函数，返回 [(名称, 类型, 说明, [(标签, 值)])]"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        with self._lock:
+            self._collectors.append(collect)
+        return collect
+
+    def collect(self):
+        """所有指标族：[(名称, 类型, 说明, [(样本名, 标签, 值)])]；采集失败的 collector 跳过"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        families = {metric.name: (metric.name, metric.type, metric.help, metric.samples()) for metric in metrics}
+        for collect in collectors:
+            try:
+                collected = collect()
+            except Exception:
+                continue
+            # 不同 collector 的同名指标（标签不同）合并为一个指标族
+            for name, kind, help, samples in collected:
+                family = families.setdefault(name, (name, kind, help, []))
+                family[3].extend((name, tuple(labels), value) for labels, value in samples)
+        return list(families.values())
+
+    def render(self):
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for name, kind, help, samples in self.collect():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in samples:
+                lines.append(f'{sample_name}{_label_text(labels)} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram('clarity_stage_seconds', '分析各阶段耗时（秒）', ('stage',))
+FETCHES = REGISTRY.counter('clarity_fetch_total', '网页抓取次数（outcome 为 ok 或错误类型）', ('outcome',))
+ANALYSES = REGISTRY.counter('clarity_analyses_total', '分析次数（computed/cached/duplicate/failed）', ('outcome',))
+
+_process = None
+_process_lock = threading.Lock()
+
+
+def _get_process():
+    global _process
+    if _process is None:
+        with _process_lock:
+            if _process is None:
+                import psutil
+                _process = psutil.Process(os.getpid())
+                # 第一次调用只建立基准，之后返回两次调用之间的 CPU 占用
+                _process.cpu_percent(None)
+    return _process
+
+
+def process_snapshot():
+    """进程内存和 CPU；未安装 psutil 时返回 None"""
+    try:
+        process = _get_process()
+    except ImportError:
+        return None
+    with process.oneshot():
+        memory = process.memory_info()
+        cpu = process.cpu_times()
+        return {
+            'rss_bytes': memory.rss,
+            'vms_bytes': memory.vms,
+            'cpu_seconds': cpu.user + cpu.system,
+            'cpu_percent': process.cpu_percent(None),
+            'threads': process.num_threads(),
+            'start_time': process.create_time(),
+        }
+
+
+@REGISTRY.collector
+def _process_metrics():
+    snapshot = process_snapshot()
+    if snapshot is None:
+        return []
+    return [
+        ('process_resident_memory_bytes', 'gauge', '常驻内存（字节）', [((), snapshot['rss_bytes'])]),
+        ('process_virtual_memory_bytes', 'gauge', '虚拟内存（字节）', [((), snapshot['vms_bytes'])]),
+        ('process_cpu_seconds_total', 'counter', '用户态和内核态 CPU 时间（秒）', [((), snapshot['cpu_seconds'])]),
+        ('process_threads', 'gauge', '线程数', [((), snapshot['threads'])]),
+        ('process_start_time_seconds', 'gauge', '进程启动时间（Unix 时间戳）', [((), snapshot['start_time'])]),
+    ]
+
+
+def observe_timings(timings):
+    """登记一次分析的各阶段耗时（StageTimer.as_dict() 的结果，单位毫秒）"""
+    for stage, values in timings.items():
+        STAGE_SECONDS.observe(values['wall_ms'] / 1000, stage=stage)
+
+
+def stage_summary(quantiles=(0.5, 0.95)):
+    """各阶段的次数、平均耗时和分位数（毫秒），供运维面板显示"""
+    summary = {}
+    for (stage,), (counts, total, count) in sorted(STAGE_SECONDS.series().items()):
+        row = {'count': count, 'mean_ms': round(total / count * 1000, 2) if count else None}
+        for q in quantiles:
+            value = STAGE_SECONDS.quantile(q, counts, count)
+            row[f'p{int(q * 100)}_ms'] = round(value * 1000, 2) if value is not None else None
+        summary[stage] = row
+    return summary
+
+
+def render_prometheus():
+    return REGISTRY.render()
+
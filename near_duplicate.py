@@ -0,0 +1,126 @@
+"""ClarityAI 近似重复检测
+
+同一篇通稿常以几十个 URL 出现，只在页眉、页脚、来源说明等处略有差别。
+正文规范化后按字符 k-gram 计算两种指纹：
+
+- 64 位 SimHash：切成 阈值 + 1 段建立 LSH 索引，汉明距离不超过阈值的两篇文档至少有一段完全相同，
+  查找时只需比较至少一段相同的历史记录（索引见 analysis_store）；
+- MinHash 签名（单次哈希分桶）：估计 k-gram 集合的 Jaccard 相似度，用来确认候选记录，
+  避免用词相近但内容不同的文章被误判为重复。
+"""
+import os
+import re
+
+import numpy as np
+
+# 近似重复检测配置（可通过环境变量调整）
+DEDUP_ENABLED = os.environ.get('CLARITY_DEDUP', '1') not in ('0', 'false', 'no', '')
+MAX_DISTANCE = int(os.environ.get('CLARITY_DEDUP_MAX_DISTANCE', 3))
+# 规范化后少于此字符数的正文不做检测（短文本的指纹不可靠）
+MIN_CHARS = int(os.environ.get('CLARITY_DEDUP_MIN_CHARS', 200))
+MIN_SIMILARITY = float(os.environ.get('CLARITY_DEDUP_MIN_SIMILARITY', 0.8))
+
+FINGERPRINT_BITS = 64
+SHINGLE_CHARS = 5
+BANDS = MAX_DISTANCE + 1
+# MinHash 签名的桶数（2 的幂），k-gram 哈希的最高几位决定所在的桶
+MINHASH_BUCKETS = 64
+_BUCKET_SHIFT = np.uint64(FINGERPRINT_BITS - MINHASH_BUCKETS.bit_length() + 1)
+_EMPTY = np.uint32(0xFFFFFFFF)
+# 每次展开成位矩阵的 k-gram 数，长文档分块统计，内存占用固定
+_BLOCK = 1 << 16
+_NOISE = re.compile(r'[\W_]+')
+
+
+def normalize_text(text):
+    """去掉空白和标点并转为小写，排版差异不影响指纹"""
+    return _NOISE.sub('', text.lower())
+
+
+def _shingle_hashes(codes):
+    # k-gram 的多项式哈希（按 2^64 自然溢出），再用 splitmix64 混合，使每一位接近均匀分布
+    count = len(codes) - SHINGLE_CHARS + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for offset in range(SHINGLE_CHARS):
+            hashes = hashes * np.uint64(1000003) + codes[offset:offset + count]
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= np.uint64(0xbf58476d1ce4e5b9)
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= np.uint64(0x94d049bb133111eb)
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+class Fingerprint:
+    """正文指纹：SimHash（无符号整数）和 MinHash 签名（字节）"""
+
+    __slots__ = ('simhash', 'minhash')
+
+    def __init__(self, simhash, minhash):
+        self.simhash = simhash
+        self.minhash = minhash
+
+
+def _simhash(hashes):
+    # 每一位上统计置 1 的 k-gram 数，超过半数的位在指纹中置 1
+    ones = np.zeros(FINGERPRINT_BITS, dtype=np.int64)
+    for start in range(0, len(hashes), _BLOCK):
+        block = hashes[start:start + _BLOCK].astype('<u8').view(np.uint8).reshape(-1, 8)
+        ones += np.unpackbits(block, axis=1, bitorder='little').sum(axis=0, dtype=np.int64)
+    value = 0
+    for bit in np.flatnonzero(ones * 2 > len(hashes)):
+        value |= 1 << int(bit)
+    return value
+
+
+def _minhash(hashes):
+    # 每个桶保留哈希低 32 位的最小值（一次哈希代替多个哈希函数）
+    signature = np.full(MINHASH_BUCKETS, _EMPTY, dtype=np.uint32)
+    np.minimum.at(signature, (hashes >> _BUCKET_SHIFT).astype(np.intp),
+                  (hashes & np.uint64(0xFFFFFFFF)).astype(np.uint32))
+    return signature.astype('<u4').tobytes()
+
+
+def fingerprint(text):
+    """计算正文指纹；规范化后过短时返回 None"""
+    normalized = normalize_text(text)
+    if len(normalized) < max(MIN_CHARS, SHINGLE_CHARS):
+        return None
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    hashes = _shingle_hashes(codes)
+    return Fingerprint(_simhash(hashes), _minhash(hashes))
+
+
+def similarity(a, b):
+    """两个 MinHash 签名估计的 Jaccard 相似度（两边都为空的桶不计入）"""
+    a = np.frombuffer(a, dtype='<u4')
+    b = np.frombuffer(b, dtype='<u4')
+    used = (a != _EMPTY) | (b != _EMPTY)
+    if not used.any():
+        return 0.0
+    return float(np.count_nonzero((a == b) & used) / np.count_nonzero(used))
+
+
+def distance(a, b):
+    """两个 SimHash 的汉明距离"""
+    return (a ^ b).bit_count()
+
+
+def bands(fingerprint):
+    """把 SimHash 切成 BANDS 段，返回 [(段号, 段值)]（最后一段包含余下的位）"""
+    width = FINGERPRINT_BITS // BANDS
+    result = []
+    for band in range(BANDS):
+        bits = width if band < BANDS - 1 else FINGERPRINT_BITS - width * band
+        result.append((band, (fingerprint >> (band * width)) & ((1 << bits) - 1)))
+    return result
+
+
+def to_signed(value):
+    """SQLite 的整数是有符号 64 位，存储前转换"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def from_signed(value):
+    return value + (1 << 64) if value < 0 else value
@@ -0,0 +1,119 @@
+"""ClarityAI 多进程解析
+
+HTML 解析、文本清洗和关键词扫描都是纯 Python 的 CPU 运算，并发请求在同一进程中会互相争抢 GIL。
+开启后（CLARITY_PARSE_WORKERS 大于 0）这几步在常驻的工作进程中执行：
+
+- 响应正文写入一块共享内存，工作进程按名称映射后直接解析，不经过 pickle 复制正文；
+- 工作进程启动时预先构建关键词自动机并解析一次样例页面，第一个请求不承担初始化开销；
+- 工作进程返回提取结果和关键词扫描结果，当前进程把扫描结果放入 scan_document 的缓存，
+  分析阶段不再重复扫描。
+
+工作进程异常退出时丢弃进程池，本次改为在当前进程中解析。
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+from html_extract import extract_main_content
+from keyword_engine import NUMBER_PATTERN, get_matcher, prime_scan
+
+# 解析进程数，0 表示在当前进程中解析（可通过环境变量调整）
+WORKERS = int(os.environ.get('CLARITY_PARSE_WORKERS', 0))
+# 小于此字节数的正文直接在当前进程中解析，进程间通信的开销比解析本身还大
+MIN_BYTES = int(os.environ.get('CLARITY_PARSE_MIN_BYTES', 4096))
+
+# 工作进程预热时解析的样例页面
+_WARM_UP_PAGE = '<html><head><title>预热</title></head><body><article><p>研究数据表明 12%</p></article></body></html>'
+
+
+def _warm_worker():
+    # 工作进程启动时执行：构建关键词自动机，解析器用到的正则和解码器也在这里初始化
+    page = extract_main_content(_WARM_UP_PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+    get_matcher().scan(page.text)
+
+
+def _ping():
+    return os.getpid()
+
+
+def parse_shared(name, size, content_type, limit, scan):
+    """在工作进程中执行：从共享内存中解析正文，返回 (提取结果, 关键词位置, 关键数据)"""
+    shm = SharedMemory(name=name)
+    try:
+        body = shm.buf[:size]
+        try:
+            page = extract_main_content(body, content_type, limit=limit)
+        finally:
+            # 关闭共享内存前必须释放对它的引用
+            body.release()
+    finally:
+        shm.close()
+    if not scan:
+        return page, None, None
+    return page, get_matcher().scan(page.text), NUMBER_PATTERN.findall(page.text)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """进程内共享的解析进程池；未开启多进程解析时返回 None"""
+    global _pool
+    if _pool is None and WORKERS > 0:
+        with _pool_lock:
+            if _pool is None:
+                # 界面和 API 进程中有其他线程在运行，用 spawn 启动工作进程更安全
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=get_context('spawn'),
+                                            initializer=_warm_worker)
+    return _pool
+
+
+def reset_pool(pool):
+    """丢弃异常的进程池（工作进程异常退出后调用，下次使用时重新创建）"""
+    global _pool
+    with _pool_lock:
+        # 其他线程可能已经换上了新的进程池
+        if _pool is pool:
+            _pool = None
+    # 取消还在排队的任务并释放管理线程，不等待已退出的工作进程
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up():
+    """提前启动全部工作进程（进程池按需启动进程，每提交一个任务启动一个），返回进程数"""
+    pool = get_pool()
+    if pool is None:
+        return 0
+    for future in [pool.submit(_ping) for _ in range(WORKERS)]:
+        future.result()
+    return WORKERS
+
+
+def parse_page(body, content_type='', limit=5000, scan=True):
+    """提取正文，返回 ExtractedPage
+
+    开启多进程解析且正文足够大时在工作进程中解析；scan 为 True 时同时扫描关键词，
+    结果放入 scan_document 的缓存。
+    """
+    pool = get_pool()
+    if pool is None or len(body) < MIN_BYTES:
+        return extract_main_content(body, content_type, limit=limit)
+    shm = SharedMemory(create=True, size=len(body))
+    try:
+        shm.buf[:len(body)] = body
+        try:
+            page, offsets, numbers = pool.submit(parse_shared, shm.name, len(body), content_type, limit,
+                                                 scan).result()
+        except BrokenProcessPool:
+            reset_pool(pool)
+            return extract_main_content(body, content_type, limit=limit)
+    finally:
+        shm.close()
+        shm.unlink()
+    if scan:
+        prime_scan(page.text, offsets, numbers)
+    return page
@@ -0,0 +1,145 @@
+"""ClarityAI 报告缓存
+
+规则分析报告只取决于正文和分析选项，按两者的哈希缓存：
+进程内 LRU 为第一层，可选的磁盘缓存（按字节预算淘汰）为第二层，
+转载文章和重复分析可以直接复用已生成的报告。
+缓存内容是结构化结果的紧凑字节（分析后端的输出、各分析器的输出和文档特征），
+命中时不需要再执行任何分析器。
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from analysis_result import AnalysisResult
+from disk_cache import DiskCache
+from html_extract import clean_text
+from metrics import REGISTRY
+
+# 缓存配置（可通过环境变量调整，CLARITY_REPORT_CACHE_DIR 设为空字符串可关闭磁盘缓存）
+MEMORY_ENTRIES = int(os.environ.get('CLARITY_REPORT_CACHE_SIZE', 256))
+DISK_DIR = os.environ.get(
+    'CLARITY_REPORT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'reports'),
+)
+DISK_MAX_BYTES = int(os.environ.get('CLARITY_REPORT_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+
+# 报告格式变化时递增，使旧缓存失效（2：缓存结构化结果而不是报告文本）
+REPORT_VERSION = 2
+
+
+def normalize_content(content):
+    """规范化正文（与抓取时的清理规则一致，已清理的正文保持不变）"""
+    return clean_text(content)
+
+
+def report_key(content, options=None):
+    """按规范化正文和分析选项计算缓存键"""
+    payload = json.dumps(
+        {'version': REPORT_VERSION, 'options': options or {}},
+        sort_keys=True, ensure_ascii=False,
+    )
+    digest = hashlib.sha256(payload.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(content.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """两级报告缓存（线程安全）"""
+
+    def __init__(self, memory_entries=MEMORY_ENTRIES, disk_dir=DISK_DIR, disk_max_bytes=DISK_MAX_BYTES):
+        self.memory_entries = memory_entries
+        self.disk = DiskCache(disk_dir, disk_max_bytes) if disk_dir else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk is not None:
+            cached = self.disk.get(key)
+            if cached is not None:
+                data = cached[0]
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, data)
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        if self.disk is not None:
+            self.disk.set(key, data)
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    """进程内共享的报告缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache()
+    return _cache
+
+
+def cached_analysis(content, options, compute):
+    """返回 (结构化结果, 是否命中缓存)；未命中时用规范化正文调用 compute 生成 AnalysisResult
+
+    缓存的结果不含网址、标题和分析时间，由调用方补上。
+    """
+    content = normalize_content(content)
+    key = report_key(content, options)
+    cache = get_report_cache()
+    data = cache.get(key)
+    if data is not None:
+        return AnalysisResult.from_bytes(data), True
+    analysis = compute(content)
+    cache.set(key, analysis.to_bytes())
+    return analysis, False
+
+
+
+@REGISTRY.collector
+def _cache_metrics():
+    if _cache is None:
+        return []
+    stats = _cache.stats()
+    labels = (('cache', 'report'),)
+    return [
+        ('clarity_cache_hits_total', 'counter', '缓存命中次数', [(labels, stats['hits'] + stats['disk_hits'])]),
+        ('clarity_cache_misses_total', 'counter', '缓存未命中次数', [(labels, stats['misses'])]),
+        ('clarity_cache_hit_ratio', 'gauge', '缓存命中率', [(labels, stats['hit_ratio'])]),
+    ]
@@ -0,0 +1,420 @@
+"""ClarityAI 网页监控
+
+登记要监控的网页和检查间隔，后台线程按到期时间轮询：
+
+- 带上次响应的 ETag/Last-Modified 做条件请求，304 时只更新检查时间，不解析、不分析；
+- 返回新内容时比较清洗后的正文，正文没变（只是广告、时间戳等标记变化）也不分析；
+- 正文变化时重新分析，与上次的结论逐部分比较，记录结论有变化的部分和新增/删除的句子数。
+
+监控列表和变化记录与分析记录保存在同一个 SQLite 文件中。界面和 API 进程共用一个库时，
+每次检查前先抢占（把下次检查时间推后），同一网页不会被两个进程重复检查。
+"""
+import abc
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from analysis_engine import CONTENT_LIMIT, analyze_webpage_data
+from analysis_store import DB_PATH, content_hash
+from fetch_scheduler import fetch_error_type, get_scheduler
+from http_cache import normalize_url
+from http_client import MAX_FETCH_BYTES
+from metrics import FETCHES, REGISTRY
+from parse_pool import parse_page
+
+# 监控配置（可通过环境变量调整）
+WATCH_ENABLED = os.environ.get('CLARITY_WATCH', '1') not in ('0', 'false', 'no', '')
+WATCH_WORKERS = int(os.environ.get('CLARITY_WATCH_WORKERS', 8))
+DEFAULT_INTERVAL = float(os.environ.get('CLARITY_WATCH_DEFAULT_INTERVAL', 3600))
+MIN_INTERVAL = float(os.environ.get('CLARITY_WATCH_MIN_INTERVAL', 60))
+# 没有到期的网页时，后台线程最多等待这么多秒再查看一次（其他进程可能新增了监控）
+MAX_SLEEP = 30.0
+# 检查失败后最早多久重试（秒），不超过检查间隔
+ERROR_RETRY = 300.0
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    normalized_url TEXT NOT NULL UNIQUE,
+    interval REAL NOT NULL,
+    sections TEXT NOT NULL DEFAULT '[]',
+    created_at REAL NOT NULL,
+    next_check REAL NOT NULL,
+    last_checked REAL,
+    last_changed REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    error TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    snapshot BLOB,
+    verdicts TEXT,
+    record_id TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_watches_due ON watches (next_check);
+CREATE TABLE IF NOT EXISTS watch_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    watch_id INTEGER NOT NULL,
+    detected_at REAL NOT NULL,
+    record_id TEXT,
+    previous_record_id TEXT,
+    changed_sections TEXT NOT NULL DEFAULT '[]',
+    added INTEGER NOT NULL DEFAULT 0,
+    removed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_watch_changes ON watch_changes (watch_id, detected_at DESC);
+"""
+
+# 列表查询不读取正文快照和结论
+SUMMARY_COLUMNS = ('id, url, interval, sections, created_at, next_check, last_checked, last_changed, status, '
+                   'error, record_id, checks, changes')
+FULL_COLUMNS = SUMMARY_COLUMNS + ', etag, last_modified, content_hash, snapshot, verdicts'
+# 检查后可以更新的列
+CHECK_FIELDS = ('etag', 'last_modified', 'content_hash', 'snapshot', 'verdicts', 'record_id')
+
+# 检查结果
+NOT_MODIFIED = 'not_modified'
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+BASELINE = 'baseline'
+ERROR = 'error'
+
+# 句子边界（中英文句末标点和换行）
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;\n])')
+
+
+def split_sentences(text):
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def diff_sentences(old, new):
+    """按句子比较两版正文，返回 (新增句子数, 删除句子数)"""
+    matcher = difflib.SequenceMatcher(None, split_sentences(old), split_sentences(new), autojunk=False)
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            removed += i2 - i1
+        if tag in ('replace', 'insert'):
+            added += j2 - j1
+    return added, removed
+
+
+def changed_sections(old, new):
+    """结论有变化的报告部分（old、new 为 {部分: 各分析器输出}）"""
+    return [name for name in new if old.get(name) != new[name]]
+
+
+def _row_to_dict(row):
+    watch = dict(row)
+    watch['sections'] = json.loads(watch['sections'])
+    if watch.get('snapshot') is not None:
+        watch['snapshot'] = zlib.decompress(watch['snapshot']).decode('utf-8')
+    if watch.get('verdicts') is not None:
+        watch['verdicts'] = json.loads(watch['verdicts'])
+    return watch
+
+
+class WatchStore:
+    """监控列表和变化记录（线程安全）"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+
+    def add(self, url, interval=DEFAULT_INTERVAL, sections=()):
+        """登记监控（同一网页已登记时更新间隔和报告部分），返回监控ID；登记后尽快做第一次检查"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO watches (url, normalized_url, interval, sections, created_at, next_check) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (normalized_url) DO UPDATE SET '
+                'url = excluded.url, interval = excluded.interval, sections = excluded.sections',
+                (url, normalize_url(url), max(MIN_INTERVAL, interval), json.dumps(list(sections)), now, now),
+            )
+            return self._conn.execute(
+                'SELECT id FROM watches WHERE normalized_url = ?', (normalize_url(url),)
+            ).fetchone()[0]
+
+    def remove(self, watch_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM watch_changes WHERE watch_id = ?', (watch_id,))
+            return self._conn.execute('DELETE FROM watches WHERE id = ?', (watch_id,)).rowcount > 0
+
+    def get(self, watch_id):
+        with self._lock:
+            row = self._conn.execute(f'SELECT {FULL_COLUMNS} FROM watches WHERE id = ?', (watch_id,)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list_watches(self):
+        """全部监控（按登记时间倒序，不含正文快照）"""
+        with self._lock:
+            rows = self._conn.execute(f'SELECT {SUMMARY_COLUMNS} FROM watches ORDER BY created_at DESC').fetchall()
+        return [_row_to_dict(row) for row in rows]
+
+    def claim_due(self, now, limit):
+        """抢占到期的监控：把下次检查时间推后一个间隔，返回抢占成功的监控（含正文快照）"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f'SELECT {FULL_COLUMNS} FROM watches WHERE next_check <= ? ORDER BY next_check LIMIT ?',
+                (now, limit),
+            ).fetchall()
+            claimed = []
+            for row in rows:
+                # 其他进程已抢占的监控下次检查时间已经推后，更新不到
+                updated = self._conn.execute(
+                    'UPDATE watches SET next_check = ? WHERE id = ? AND next_check <= ?',
+                    (now + row['interval'], row['id'], now),
+                ).rowcount
+                if updated:
+                    claimed.append(_row_to_dict(row))
+        return claimed
+
+    def next_due(self):
+        """最早的下次检查时间，没有监控时返回 None"""
+        with self._lock:
+            return self._conn.execute('SELECT MIN(next_check) FROM watches').fetchone()[0]
+
+    def check_now(self, watch_id):
+        """让监控在下一轮立即检查"""
+        with self._lock, self._conn:
+            return self._conn.execute('UPDATE watches SET next_check = 0 WHERE id = ?', (watch_id,)).rowcount > 0
+
+    def record_check(self, watch_id, status, error=None, retry_after=None, **fields):
+        """记录一次检查的结果；fields 为 CHECK_FIELDS 中需要更新的列，retry_after 为失败后重试的秒数"""
+        now = time.time()
+        assignments = ['status = ?', 'error = ?', 'last_checked = ?', 'checks = checks + 1']
+        values = [status, error, now]
+        if status in (CHANGED, BASELINE):
+            assignments.append('last_changed = ?')
+            values.append(now)
+        if retry_after is not None:
+            assignments.append('next_check = MIN(next_check, ?)')
+            values.append(now + retry_after)
+        for name in CHECK_FIELDS:
+            if name in fields:
+                value = fields[name]
+                if name == 'snapshot' and value is not None:
+                    value = zlib.compress(value.encode('utf-8'), 6)
+                elif name == 'verdicts' and value is not None:
+                    value = json.dumps(value, ensure_ascii=False)
+                assignments.append(f'{name} = ?')
+                values.append(value)
+        with self._lock, self._conn:
+            self._conn.execute(f'UPDATE watches SET {", ".join(assignments)} WHERE id = ?', values + [watch_id])
+
+    def add_change(self, watch_id, record_id, previous_record_id, sections, added, removed):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO watch_changes (watch_id, detected_at, record_id, previous_record_id, changed_sections, '
+                'added, removed) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (watch_id, time.time(), record_id, previous_record_id, json.dumps(list(sections)), added, removed),
+            )
+            self._conn.execute('UPDATE watches SET changes = changes + 1 WHERE id = ?', (watch_id,))
+
+    def list_changes(self, watch_id, limit=50):
+        """某个监控最近的内容变化（按时间倒序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM watch_changes WHERE watch_id = ? ORDER BY detected_at DESC LIMIT ?',
+                (watch_id, limit),
+            ).fetchall()
+        changes = [dict(row) for row in rows]
+        for change in changes:
+            change['changed_sections'] = json.loads(change['changed_sections'])
+        return changes
+
+
+def check_watch(store, watch, timeout=10):
+    """检查一个监控的网页，返回检查结果（NOT_MODIFIED/UNCHANGED/BASELINE/CHANGED）；抓取或分析失败时抛出异常"""
+    headers = {'User-Agent': USER_AGENT}
+    # 没有快照时（第一次检查）必须取回完整正文
+    if watch['snapshot'] is not None:
+        if watch['etag']:
+            headers['If-None-Match'] = watch['etag']
+        if watch['last_modified']:
+            headers['If-Modified-Since'] = watch['last_modified']
+    response = get_scheduler().fetch(watch['url'], headers=headers, timeout=timeout, max_bytes=MAX_FETCH_BYTES)
+    if response.status_code == 304:
+        FETCHES.inc(outcome='not_modified')
+        store.record_check(watch['id'], NOT_MODIFIED)
+        return NOT_MODIFIED
+    FETCHES.inc(outcome='ok')
+
+    validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    page = parse_page(response.content, response.headers.get('Content-Type', ''), limit=CONTENT_LIMIT)
+    text = page.text[:CONTENT_LIMIT]
+    digest = content_hash(text)
+    if digest == watch['content_hash']:
+        store.record_check(watch['id'], UNCHANGED, **validators)
+        return UNCHANGED
+
+    # 正文有变化才重新分析；与上一版是近似重复也要重新分析，不能复用上一版的结论
+    webpage_data = {'title': page.title if page.title is not None else "无标题", 'content': text,
+                    'url': watch['url'], 'long_document': False}
+    sections = watch['sections']
+    result = analyze_webpage_data(webpage_data, 'consensus' in sections, 'bias' in sections, 'terms' in sections,
+                                  'advice' in sections, reuse_duplicates=False)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    verdicts = result['result'].to_dict()['sections']
+    status = BASELINE if watch['snapshot'] is None else CHANGED
+    if status == CHANGED:
+        added, removed = diff_sentences(watch['snapshot'], text)
+        store.add_change(watch['id'], result['record_id'], watch['record_id'],
+                         changed_sections(watch['verdicts'] or {}, verdicts), added, removed)
+    store.record_check(watch['id'], status, content_hash=digest, snapshot=text, verdicts=verdicts,
+                       record_id=result['record_id'], **validators)
+    return status
+
+
+class Poller(abc.ABC):
+    """按到期时间轮询的后台线程（每个进程一个线程，检查在线程池中并发执行）
+
+    store 提供 claim_due/next_due/record_check；子类实现 process(item)，返回 RESULTS 中的一项，
+    失败时抛出异常（记录为 ERROR，过一段时间后重试）。
+    """
+
+    RESULTS = ()
+    thread_name = 'clarity-poller'
+
+    def __init__(self, store, workers):
+        self.store = store
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.thread_name)
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.results = dict.fromkeys(self.RESULTS + (ERROR,), 0)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def wake(self):
+        """新增条目或要求立即检查后调用，不必等到下一轮"""
+        self._wake.set()
+
+    @abc.abstractmethod
+    def process(self, item):
+        """检查一个到期的条目，返回 RESULTS 中的一项；失败时抛出异常"""
+
+    def check(self, item):
+        try:
+            result = self.process(item)
+        except Exception as e:
+            if not isinstance(e, (sqlite3.Error, RuntimeError)):
+                FETCHES.inc(outcome=fetch_error_type(e))
+            result = ERROR
+            try:
+                self.store.record_check(item['id'], ERROR, error=str(e),
+                                        retry_after=min(ERROR_RETRY, item['interval']))
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            self.results[result] += 1
+        return result
+
+    def run_once(self, now=None):
+        """检查一批到期的条目并等待完成，返回本批检查的数量"""
+        due = self.store.claim_due(time.time() if now is None else now, self.workers * 2)
+        wait([self._executor.submit(self.check, item) for item in due])
+        return len(due)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.run_once():
+                    continue
+                next_due = self.store.next_due()
+            except sqlite3.Error:
+                next_due = None
+            delay = MAX_SLEEP if next_due is None else min(MAX_SLEEP, max(0.0, next_due - time.time()))
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.results, running=self._thread is not None and self._thread.is_alive())
+
+
+class WatchMonitor(Poller):
+    """后台检查到期的网页监控"""
+
+    RESULTS = (NOT_MODIFIED, UNCHANGED, BASELINE, CHANGED)
+    thread_name = 'clarity-watch'
+
+    def __init__(self, store=None, workers=WATCH_WORKERS):
+        super().__init__(store if store is not None else get_watch_store(), workers)
+
+    def process(self, watch):
+        return check_watch(self.store, watch)
+
+
+_store = None
+_monitor = None
+_lock = threading.Lock()
+
+
+def get_watch_store():
+    """进程内共享的监控列表"""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = WatchStore()
+    return _store
+
+
+def get_monitor():
+    """进程内共享的监控线程（需调用 start() 启动）"""
+    global _monitor
+    if _monitor is None:
+        store = get_watch_store()
+        with _lock:
+            if _monitor is None:
+                _monitor = WatchMonitor(store)
+    return _monitor
+
+
+def start_monitor():
+    """按配置启动后台监控（CLARITY_WATCH=0 时不启动），返回监控线程或 None"""
+    return get_monitor().start() if WATCH_ENABLED else None
+
+
+@REGISTRY.collector
+def _watch_metrics():
+    if _monitor is None:
+        return []
+    stats = _monitor.stats()
+    return [
+        ('clarity_watch_checks_total', 'counter', '网页监控检查次数（按结果）',
+         [((('result', result),), stats[result]) for result in WatchMonitor.RESULTS + (ERROR,)]),
+    ]